@@ -0,0 +1,56 @@
+# Provider calls and wall time for a translator-like workload (recurring SFX / phrases drawn
+# Zipf-style, many requests in flight) with the AI cache vs calling the provider every time.
+# The provider is a stand-in that sleeps --ai-ms per call.
+#   python bench/bench_ai_cache.py --requests 2000 --phrases 300 --concurrency 50
+import os, sys, json, time, random, asyncio, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", "sqlite://")
+from services import ai
+
+def workload(n: int, phrases: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    vocab = [f"SFX-{i} " + "ド" * (i % 5 + 1) for i in range(phrases)]
+    weights = [1 / (i + 1) for i in range(phrases)]
+    # same phrase, different whitespace: normalize() should fold these
+    return [rnd.choice(["", " ", "\n"]) + p for p in rnd.choices(vocab, weights, k=n)]
+
+async def run(prompts: list[str], concurrency: int, use_cache: bool) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    async def one(p):
+        async with sem:
+            if use_cache:
+                await ai.ai_chat(p, "ar")
+            else:
+                await ai._limited("local", ai._chat, "local", ai.normalize(p), "ar")
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in prompts))
+    return {"seconds": round(time.perf_counter() - start, 3)}
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--phrases", type=int, default=300)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--ai-ms", type=float, default=50)
+    args = p.parse_args()
+    calls = []
+    orig = ai._chat
+    async def provider(prov, prompt, lang):
+        calls.append(prompt)
+        await asyncio.sleep(args.ai_ms / 1000)
+        return await orig(prov, prompt, lang)
+    ai._chat = provider
+    prompts = workload(args.requests, args.phrases)
+    async def both():
+        # one loop for both runs: the provider limiter's semaphore binds to it
+        out = {}
+        for name, use_cache in (("uncached", False), ("cached", True)):
+            calls.clear()
+            out[name] = {**await run(prompts, args.concurrency, use_cache), "provider_calls": len(calls)}
+        out["stats"] = ai.stats()
+        return out
+    out = asyncio.run(both())
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Hot-path latency as finished history grows, with and without archival. For each history size a
+# fresh database gets the same live working set (bench/seed.py) plus N accepted/rejected tasks from
+# past years; the hot routes are timed with everything in `tasks`, then again after
+# services/archive.py has moved the old rows to tasks_archive.
+#   python bench/bench_archive.py --hot 5000 --history 0,50000,200000
+import os, sys, time, json, random, asyncio, tempfile, argparse, datetime as dt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+def add_history(session_maker, n: int, works: int, users: int, now: dt.datetime, rnd: random.Random):
+    from sqlalchemy import insert
+    from models import Task
+    import seed as seeder
+    with session_maker() as db:
+        for start in range(0, n, seeder.CHUNK):
+            db.execute(insert(Task), [{
+                "work_id": i % works + 1, "chapter_number": 100_000 + i // works,
+                "assignee_discord_id": seeder.user_id(rnd.randrange(users)),
+                "status": "accepted" if rnd.random() < .9 else "rejected", "type": "ترجمة",
+                "link": "https://example.com/ch", "created_at": created, "finished_at": created + dt.timedelta(days=2)}
+                for i, created in ((i, now - dt.timedelta(days=rnd.uniform(365, 4 * 365)))
+                                   for i in range(start, min(n, start + seeder.CHUNK)))])
+        db.commit()
+
+async def time_routes(app, session_maker, requests: int, rnd: random.Random) -> dict:
+    import httpx
+    from services import auth, scheduler
+    import seed as seeder
+    headers = {"Authorization": "Bearer " + auth.sign({"discord_id": seeder.ADMIN_ID, "role": "admin"})}
+    routes = {
+        "list_submitted": lambda: ("/api/tasks", {"status": "submitted", "limit": 50}),
+        "list_by_assignee": lambda: ("/api/tasks", {"assignee_discord_id": seeder.user_id(rnd.randrange(50)), "limit": 50}),
+        "list_by_work": lambda: ("/api/tasks", {"work_id": rnd.randrange(1, 20), "limit": 50}),
+        "review_queue": lambda: ("/api/review-queue", {"limit": 25}),
+    }
+    out = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", headers=headers) as c:
+        for name, make in routes.items():
+            lat = []
+            for i in range(requests + 5):
+                path, params = make()
+                t = time.perf_counter()
+                (await c.get(path, params=params)).raise_for_status()
+                if i >= 5:
+                    lat.append(time.perf_counter() - t)
+            out[name] = {"p50_ms": round(pct(lat, .5) * 1000, 2), "p95_ms": round(pct(lat, .95) * 1000, 2)}
+    lat = []
+    for _ in range(requests):
+        t = time.perf_counter()
+        scheduler.next_due(session_maker)
+        lat.append(time.perf_counter() - t)
+    out["next_due"] = {"p50_ms": round(pct(lat, .5) * 1000, 2), "p95_ms": round(pct(lat, .95) * 1000, 2)}
+    return out
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--hot", type=int, default=5000, help="live working set, seeded the same for every size")
+    p.add_argument("--history", default="0,50000,200000", help="comma-separated counts of old finished tasks")
+    p.add_argument("--requests", type=int, default=100, help="timed requests per route")
+    args = p.parse_args()
+    tmp = tempfile.mkdtemp(prefix="manga-archive-")
+    os.environ.setdefault("UPLOAD_TMP_DIR", tmp)
+    import db, migrations, main as api
+    import seed as seeder
+    from sqlalchemy import select, func
+    from models import Task, ArchivedTask
+    from services import archive
+    now = dt.datetime.utcnow()
+    report = {"hot": args.hot, "archive_after_days": archive.settings.get("archive_after_days"), "sizes": {}}
+    for n in [int(x) for x in args.history.split(",")]:
+        db.init(f"sqlite:///{tmp}/history-{n}.db")
+        migrations.migrate(db.engine)
+        sizes = seeder.seed(db.SessionLocal, args.hot, now=now)
+        add_history(db.SessionLocal, n, sizes["works"], sizes["users"], now, random.Random(n))
+        row = {"before": asyncio.run(time_routes(api.app, db.SessionLocal, args.requests, random.Random(1)))}
+        t = time.perf_counter()
+        moved = archive.run(db.SessionLocal, now=now, max_batches=10**9)
+        row["archive_seconds"] = round(time.perf_counter() - t, 2)
+        with db.SessionLocal() as s:
+            row["rows"] = {"tasks": s.scalar(select(func.count(Task.id))), "tasks_archive": s.scalar(select(func.count(ArchivedTask.id))),
+                           "moved": moved}
+        row["after"] = asyncio.run(time_routes(api.app, db.SessionLocal, args.requests, random.Random(1)))
+        report["sizes"][n] = row
+        asyncio.run(db.dispose())
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Per-request auth cost: the old base64+JSON decode vs HMAC verification, cold and cached.
+#   python bench/bench_auth.py --n 20000
+import os, sys, time, json, base64, asyncio, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+from fastapi.security import HTTPAuthorizationCredentials
+from models import Base, User
+from db import engine, SessionLocal
+from services import auth
+
+def timed(n: int, fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+async def atimed(n: int, fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(User(discord_id="42", username="bench", role="admin")); db.commit()
+    token = auth.sign({"discord_id": "42", "role": "member"})
+    legacy = base64.urlsafe_b64encode(json.dumps({"discord_id": "42", "role": "admin"}).encode()).decode()
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def cold_verify():
+        auth._tokens.clear()
+        auth.verify(token)
+
+    async def cold_principal():
+        auth._tokens.clear(); auth._roles.clear()
+        await auth.get_current_user(creds)
+
+    async def warm_principal():
+        await auth.get_current_user(creds)
+
+    out = {
+        "legacy_b64_json_us": round(timed(args.n, lambda: json.loads(base64.urlsafe_b64decode(legacy))), 2),
+        "hmac_verify_cold_us": round(timed(args.n, cold_verify), 2),
+        "hmac_verify_cached_us": round(timed(args.n, lambda: auth.verify(token)), 2),
+        "principal_cold_with_db_us": round(asyncio.run(atimed(max(args.n // 20, 1), cold_principal)), 2),
+        "principal_cached_us": round(asyncio.run(atimed(args.n, warm_principal)), 2),
+        "token_cache": auth._tokens.stats(),
+        "role_cache": auth._roles.stats(),
+    }
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# One chapter, two ways: page-by-page OCR + ai_chat (what /ai did per image) vs services.batch.run
+# (parallel OCR on the pool, pages packed into few provider calls). The provider is a stand-in
+# that sleeps --ai-ms per call; OCR is a CPU-bound stand-in of --job-ms.
+#   python bench/bench_batch.py --pages 40 --workers 4
+import os, sys, json, time, asyncio, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", "sqlite://")
+from services import ocr, batch
+
+def fake_ocr(data: bytes, ms: float) -> str:
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+    return "speech bubble text " * (len(data) // 20)
+
+def make_ai(ms: float, calls: list):
+    async def ai_chat(prompt: str, lang: str = "ar") -> str:
+        calls.append(len(prompt))
+        await asyncio.sleep(ms / 1000)
+        return prompt
+    return ai_chat
+
+async def sequential(pages, args):
+    calls = []
+    ai = make_ai(args.ai_ms, calls)
+    start = time.perf_counter(); first = None
+    for name, read in pages:
+        text = fake_ocr(read(), args.job_ms)
+        await ai(text, "ar")
+        first = first or time.perf_counter() - start
+    return {"seconds": round(time.perf_counter() - start, 3), "first_page_s": round(first, 3), "calls": len(calls)}
+
+async def batched(pages, args):
+    calls = []
+    batch.ai_chat = make_ai(args.ai_ms, calls)
+    await asyncio.gather(*(ocr.pool.run(b"") for _ in range(args.workers)))  # spawn workers before timing
+    start = time.perf_counter(); first = None
+    async for line in batch.run(pages, "ar", None, None):
+        if json.loads(line)["type"] == "ocr":
+            first = first or time.perf_counter() - start
+    return {"seconds": round(time.perf_counter() - start, 3), "first_page_s": round(first, 3), "calls": len(calls)}
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--pages", type=int, default=40)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--job-ms", type=float, default=150)
+    p.add_argument("--ai-ms", type=float, default=400)
+    args = p.parse_args()
+    pages = [(f"{i:03}.png", (lambda i=i: b"x" * (400 + i * 7))) for i in range(args.pages)]
+    out = {"sequential": asyncio.run(sequential(pages, args))}
+    ocr.pool = ocr.OcrPool(workers=args.workers, queue_size=args.pages, timeout=60, job=fake_ocr)
+    # pool.run passes extra args through to the job
+    orig = ocr.pool.run
+    ocr.pool.run = lambda data: orig(data, args.job_ms)
+    out["batched"] = asyncio.run(batched(pages, args))
+    ocr.pool.shutdown()
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
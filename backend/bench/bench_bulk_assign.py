@@ -0,0 +1,61 @@
+# Importing a 500-chapter arc: the old /وزع path (GET /api/works + POST /api/tasks per chapter)
+# vs one POST /api/tasks/bulk. Runs the real app in-process; --rtt-ms adds a bot<->API round trip.
+#   python bench/bench_bulk_assign.py --chapters 500 --rtt-ms 5
+import os, sys, time, json, asyncio, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+import httpx
+from services import auth
+
+class SlowTransport(httpx.ASGITransport):
+    def __init__(self, app, rtt: float):
+        super().__init__(app=app)
+        self.rtt = rtt
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.rtt)
+        return await super().handle_async_request(request)
+
+async def per_chapter(client, work: str, chapters: range, assignees: list[str]):
+    for i, ch in enumerate(chapters):
+        works = (await client.get("/api/works")).json()
+        work_id = next(w["id"] for w in works if w["name"] == work)
+        r = await client.post("/api/tasks", json={"work_id": work_id, "chapter_number": ch,
+                                                  "assignee_discord_id": assignees[i % len(assignees)]})
+        r.raise_for_status()
+
+async def bulk(client, work: str, chapters: range, assignees: list[str]):
+    r = await client.post("/api/tasks/bulk", json={"work_name": work, "chapter_from": chapters.start,
+                                                   "chapter_to": chapters.stop - 1, "assignees": assignees})
+    r.raise_for_status()
+    assert len(r.json()["created"]) == len(chapters)
+
+async def run(args) -> dict:
+    import main, migrations, db
+    migrations.migrate(db.engine)  # no lifespan under a bare ASGITransport
+    headers = {"Authorization": "Bearer " + auth.sign({"discord_id": "1", "role": "admin"})}
+    chapters = range(1, args.chapters + 1)
+    assignees = ["101", "102", "103"]
+    out = {}
+    for name, fn in (("per_chapter", per_chapter), ("bulk", bulk)):
+        transport = SlowTransport(main.app, args.rtt_ms / 1000)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", headers=headers) as client:
+            work = f"Arc-{name}"
+            (await client.post("/api/works", json={"name": work})).raise_for_status()
+            transport.requests = 0
+            t = time.perf_counter()
+            await fn(client, work, chapters, assignees)
+            out[name] = {"seconds": round(time.perf_counter() - t, 3), "http_requests": transport.requests}
+    return out
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--chapters", type=int, default=500)
+    p.add_argument("--rtt-ms", type=float, default=5)
+    args = p.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Replays a revision-heavy submission history (initial chapter + several "fix a few pages"
+# rounds) through the blob store and compares bytes uploaded with whole-file uploads.
+#   python bench/bench_dedup.py --chapters 10 --pages 40 --revisions 3 --changed 4
+import os, sys, json, time, random, zipfile, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TMP = tempfile.mkdtemp()
+os.environ.setdefault("DB_URL", f"sqlite:///{TMP}/bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(TMP, "store")
+from models import Base
+from db import engine, SessionLocal
+from services import blobs
+
+def archive(pages: list[bytes], path: str):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as z:
+        for i, p in enumerate(pages):
+            z.writestr(f"{i:03}.png", p)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chapters", type=int, default=10)
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--page-kb", type=int, default=300)
+    ap.add_argument("--revisions", type=int, default=3)
+    ap.add_argument("--changed", type=int, default=4, help="pages replaced per revision")
+    args = ap.parse_args()
+    Base.metadata.create_all(engine)
+    rnd = random.Random(1)
+    naive = dedup = submissions = 0
+    t0 = time.perf_counter()
+    for ch in range(args.chapters):
+        pages = [rnd.randbytes(args.page_kb * 1024) for _ in range(args.pages)]
+        for rev in range(args.revisions + 1):
+            if rev:
+                for i in rnd.sample(range(args.pages), args.changed):
+                    pages[i] = rnd.randbytes(args.page_kb * 1024)
+            path = os.path.join(TMP, f"ch{ch}-r{rev}.cbz")
+            archive(pages, path)
+            with SessionLocal() as db:
+                m = blobs.store(db, ch + 1, f"Bench/Chapter {ch}/ترجمة", os.path.basename(path), path)
+                db.commit()
+                dedup += m.new_bytes
+            naive += os.path.getsize(path)
+            submissions += 1
+            os.remove(path)
+    print(json.dumps({"submissions": submissions, "naive_upload_mb": round(naive / 2**20, 1),
+                      "dedup_upload_mb": round(dedup / 2**20, 1), "saved_pct": round(100 * (1 - dedup / naive), 1),
+                      "seconds": round(time.perf_counter() - t0, 2)}, indent=2))
+
+if __name__ == "__main__":
+    main()
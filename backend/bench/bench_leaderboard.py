@@ -0,0 +1,87 @@
+# Leaderboard reads on synthetic data: naive GROUP BY over accepted tasks per request vs the
+# rollup tables + in-memory sorted board (top-N and "my rank").
+#   python bench/bench_leaderboard.py --tasks 100000 --users 2000 --works 50
+import os, sys, time, random, tempfile, argparse, statistics, datetime as dt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", "sqlite://")
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Work, Task, LedgerEntry
+from services import ledger, leaderboard
+
+def seed(SessionLocal, tasks: int, users: int, works: int, month: str):
+    rnd = random.Random(3)
+    ts = dt.datetime.strptime(month, "%Y-%m") + dt.timedelta(days=1)
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"discord_id": str(1000 + u), "username": f"u{u}"} for u in range(users)])
+        db.execute(insert(Work), [{"name": f"W{w}", "role_name": f"W{w}"} for w in range(works)])
+        # skewed activity: a few heavy translators, a long tail
+        who = rnd.choices(range(users), [1 / (u + 1) ** 0.7 for u in range(users)], k=tasks)
+        rows = [{"id": i + 1, "work_id": rnd.randrange(works) + 1, "chapter_number": i,
+                 "assignee_discord_id": str(1000 + who[i]), "status": "accepted", "created_at": ts} for i in range(tasks)]
+        db.execute(insert(Task), rows)
+        db.execute(insert(LedgerEntry), [{"user_discord_id": r["assignee_discord_id"], "task_id": r["id"],
+                                          "work_id": r["work_id"], "event": "accept", "points": 15,
+                                          "amount_cents": 50, "month": month} for r in rows])
+        ledger.rebuild(db)
+        db.commit()
+
+def naive_top(db, month: str, limit: int):
+    start = dt.datetime.strptime(month, "%Y-%m")
+    q = (select(Task.assignee_discord_id, (func.count() * 15).label("points"))
+         .where(Task.status=="accepted", Task.created_at >= start)
+         .group_by(Task.assignee_discord_id).order_by(func.count().desc()).limit(limit))
+    return db.execute(q).all()
+
+def naive_rank(db, month: str, uid: str):
+    start = dt.datetime.strptime(month, "%Y-%m")
+    per_user = (select(Task.assignee_discord_id.label("uid"), func.count().label("n"))
+                .where(Task.status=="accepted", Task.created_at >= start)
+                .group_by(Task.assignee_discord_id).subquery())
+    mine = select(per_user.c.n).where(per_user.c.uid==uid).scalar_subquery()
+    return db.scalar(select(func.count()).select_from(per_user).where(per_user.c.n > mine)) + 1
+
+def timed(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter(); fn(); samples.append(time.perf_counter() - t)
+    return {"p50_ms": round(statistics.median(samples) * 1000, 3), "max_ms": round(max(samples) * 1000, 3)}
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--db-url", default=None)
+    p.add_argument("--tasks", type=int, default=100_000)
+    p.add_argument("--users", type=int, default=2000)
+    p.add_argument("--works", type=int, default=50)
+    p.add_argument("--reads", type=int, default=50)
+    args = p.parse_args()
+    url = args.db_url or f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine); Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    month = ledger.month_of()
+    t = time.perf_counter()
+    seed(SessionLocal, args.tasks, args.users, args.works, month)
+    print(f"seeded {args.tasks} tasks in {time.perf_counter() - t:.1f}s")
+    uid = str(1000 + args.users // 2)
+
+    with SessionLocal() as db:
+        res = {
+            "naive top-20": timed(lambda: naive_top(db, month, 20), args.reads),
+            "naive my-rank": timed(lambda: naive_rank(db, month, uid), args.reads),
+        }
+        leaderboard.reset()
+        t = time.perf_counter(); leaderboard.board(db, month); load = time.perf_counter() - t
+        res["board load (once per TTL)"] = {"p50_ms": round(load * 1000, 3), "max_ms": round(load * 1000, 3)}
+        res["board top-20"] = timed(lambda: leaderboard.top(db, month, None, 20), args.reads)
+        res["board my-rank"] = timed(lambda: leaderboard.position(db, month, None, uid), args.reads)
+        assert naive_top(db, month, 1)[0][0] == leaderboard.top(db, month, None, 1)["entries"][0]["discord_id"]
+        assert naive_rank(db, month, uid) == leaderboard.position(db, month, None, uid)["rank"]
+        b = leaderboard.board(db, month)
+        res["board incremental add"] = timed(lambda: b.add(str(1000 + random.randrange(args.users)), 15, 1), args.reads * 20)
+    for k, v in res.items():
+        print(f"  {k:28} p50 {v['p50_ms']:>9} ms   max {v['max_ms']:>9} ms")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
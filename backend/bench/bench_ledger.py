@@ -0,0 +1,89 @@
+# Concurrency stress test for the ledger: many reviewers accept the same submitted tasks at
+# once, and the totals must still equal exactly one payment per task.
+# Defaults to a throwaway SQLite file; point --db-url at Postgres for real row-lock contention.
+#   python bench/bench_ledger.py --tasks 300 --users 20 --reviewers 16 --repeats 4
+import os, sys, time, random, tempfile, argparse, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", "sqlite://")
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.exc import OperationalError, DBAPIError
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Work, Task, LedgerEntry, MonthlyRollup
+from services import counters, ledger, logic, settings
+
+def seed(SessionLocal, tasks: int, users: int):
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"discord_id": str(1000 + u), "username": f"u{u}"} for u in range(users)])
+        db.add(Work(name="Bench", role_name="Bench")); db.flush()
+        db.execute(insert(Task), [{"work_id": 1, "chapter_number": i, "assignee_discord_id": str(1000 + i % users),
+                                   "status": "submitted"} for i in range(tasks)])
+        counters.rebuild(db)
+        db.commit()
+
+def reviewer(SessionLocal, ids: list[int], stats: dict, lock: threading.Lock):
+    for task_id in ids:
+        while True:
+            try:
+                with SessionLocal() as db:
+                    t = db.get(Task, task_id)
+                    logic.review_task_logic(db, t, "accept")
+                    db.commit()
+                break
+            except (OperationalError, DBAPIError):
+                # sqlite "database is locked" / postgres serialization: the API would return 500 and the reviewer retries
+                with lock:
+                    stats["retries"] += 1
+                time.sleep(random.uniform(0, 0.01))
+        with lock:
+            stats["accepts"] += 1
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--db-url", default=None)
+    p.add_argument("--tasks", type=int, default=300)
+    p.add_argument("--users", type=int, default=20)
+    p.add_argument("--reviewers", type=int, default=16)
+    p.add_argument("--repeats", type=int, default=4, help="accept clicks per task")
+    args = p.parse_args()
+    url = args.db_url or f"sqlite:///{tempfile.mktemp(suffix='.db')}?timeout=30"
+    engine = create_engine(url, pool_size=args.reviewers, max_overflow=0) if url.startswith("postgresql") else create_engine(url)
+    Base.metadata.drop_all(engine); Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    seed(SessionLocal, args.tasks, args.users)
+
+    with SessionLocal() as db:
+        ids = list(db.scalars(select(Task.id)))
+    clicks = ids * args.repeats
+    random.Random(1).shuffle(clicks)
+    stats = {"accepts": 0, "retries": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=reviewer, args=(SessionLocal, clicks[i::args.reviewers], stats, lock))
+               for i in range(args.reviewers)]
+    start = time.perf_counter()
+    for th in threads: th.start()
+    for th in threads: th.join()
+    elapsed = time.perf_counter() - start
+
+    pts = settings.get("points_per_accepted")
+    cents = int(round(pts * settings.get("usd_per_15_points") / 15.0 * 100))
+    with SessionLocal() as db:
+        got = {
+            "ledger_rows": db.scalar(select(func.count()).select_from(LedgerEntry)),
+            "user_points": db.scalar(select(func.sum(User.points))),
+            "user_cents": db.scalar(select(func.sum(User.balance_cents))),
+            "rollup_chapters": db.scalar(select(func.sum(MonthlyRollup.chapters))),
+            "rollup_points": db.scalar(select(func.sum(MonthlyRollup.points))),
+        }
+        top = ledger.payouts(db, ledger.month_of())[:3]
+    want = {"ledger_rows": len(ids), "user_points": len(ids) * pts, "user_cents": len(ids) * cents,
+            "rollup_chapters": len(ids), "rollup_points": len(ids) * pts}
+    print(f"{stats['accepts']} accept clicks in {elapsed:.2f}s ({stats['accepts'] / elapsed:.0f}/s), {stats['retries']} retries")
+    for k in want:
+        print(f"  {k:16} {got[k]:>8} expected {want[k]:>8} {'ok' if got[k] == want[k] else 'MISMATCH'}")
+    print("  top payouts:", top)
+    engine.dispose()
+    if got != want:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
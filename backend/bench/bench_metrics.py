@@ -0,0 +1,49 @@
+# Cost of the instrumentation itself: SQL timing listeners on an engine vs a bare one,
+# histogram observe(), and rendering /metrics with many route series.
+#   python bench/bench_metrics.py --queries 20000 --routes 60
+import os, sys, time, json, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, text
+from services import metrics
+
+def run_queries(engine, n: int) -> float:
+    with engine.connect() as conn:
+        stmt = text("SELECT 1")
+        t = time.perf_counter()
+        for _ in range(n):
+            conn.execute(stmt)
+        return time.perf_counter() - t
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--queries", type=int, default=20000)
+    p.add_argument("--routes", type=int, default=60)
+    args = p.parse_args()
+
+    bare = create_engine("sqlite://")
+    instrumented = create_engine("sqlite://")
+    metrics.instrument_engine(instrumented)
+    run_queries(bare, 100); run_queries(instrumented, 100)
+    base = run_queries(bare, args.queries)
+    inst = run_queries(instrumented, args.queries)
+
+    h = metrics.Histogram("bench_seconds", "bench", ("method", "route", "status"))
+    n = args.queries
+    t = time.perf_counter()
+    for i in range(n):
+        h.observe("GET", f"/api/r{i % args.routes}", 200, value=(i % 100) / 1000)
+    observe = time.perf_counter() - t
+
+    t = time.perf_counter()
+    body = metrics.render()
+    render = time.perf_counter() - t
+
+    print(json.dumps({
+        "sql_us_per_query": {"bare": round(base / args.queries * 1e6, 2), "instrumented": round(inst / args.queries * 1e6, 2)},
+        "sql_overhead_us": round((inst - base) / args.queries * 1e6, 2),
+        "observe_us": round(observe / n * 1e6, 2),
+        "render_ms": round(render * 1000, 2), "render_lines": body.count("\n"),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Latency of an unrelated endpoint while OCR requests keep arriving: OCR run inline in the
+# async handler (the old behaviour) vs awaited on the OCR process pool.
+# Uses real tesseract when installed, otherwise a CPU-bound stand-in of --job-ms.
+#   python bench/bench_ocr_pool.py --seconds 5 --ocr-concurrency 4
+import os, sys, io, json, time, shutil, socket, asyncio, argparse, threading, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx, uvicorn
+from fastapi import FastAPI, Request
+from services.ocr import OcrPool, OcrBusy, ocr_image
+
+def burn(image_bytes: bytes, ms: float = 200.0) -> str:
+    end = time.perf_counter() + ms / 1000
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return str(n)
+
+def sample_image() -> bytes:
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (1200, 1700), "white")
+    d = ImageDraw.Draw(img)
+    for y in range(100, 1600, 60):
+        d.text((100, y), "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG", fill="black")
+    buf = io.BytesIO(); img.save(buf, "PNG")
+    return buf.getvalue()
+
+def make_app(mode: str, job, args) -> FastAPI:
+    app = FastAPI()
+    pool = OcrPool(workers=args.workers, queue_size=args.queue, timeout=30, job=job)
+    app.state.pool = pool
+
+    @app.post("/ocr")
+    async def ocr_ep(request: Request):
+        data = await request.body()
+        if mode == "inline":
+            return {"text": job(data, *args.job_args)}
+        try:
+            return {"text": await pool.run(data, *args.job_args)}
+        except OcrBusy:
+            return {"busy": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    return app
+
+def serve(app) -> tuple[uvicorn.Server, str]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+async def measure(app, args, image: bytes) -> dict:
+    lat, ocr_done = [], 0
+    server, base = serve(app)
+    # start the worker processes before timing (spawn start-up is a one-off cost)
+    await asyncio.gather(*(app.state.pool.run(b"", *((0,) if args.job_args else ())) for _ in range(args.workers)))
+    stop = time.perf_counter() + args.seconds
+    async with httpx.AsyncClient(base_url=base, timeout=120) as c:
+        async def ocr_load():
+            nonlocal ocr_done
+            while time.perf_counter() < stop:
+                await c.post("/ocr", content=image)
+                ocr_done += 1
+        async def pinger():
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                await c.get("/ping")
+                lat.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.005)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(ocr_load() for _ in range(args.ocr_concurrency)), *(pinger() for _ in range(args.pingers)))
+        wall = time.perf_counter() - t0
+    server.should_exit = True
+    app.state.pool.shutdown()
+    q = statistics.quantiles(lat, n=100) if len(lat) > 1 else (lat or [float("nan")]) * 99
+    return {"ping_rps": round(len(lat) / wall, 1), "ping_p50_ms": round(q[49] * 1000, 2),
+            "ping_p99_ms": round(q[98] * 1000, 2), "ocr_jobs": ocr_done}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--ocr-concurrency", type=int, default=4)
+    ap.add_argument("--pingers", type=int, default=4)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--queue", type=int, default=8)
+    ap.add_argument("--job-ms", type=float, default=200)
+    args = ap.parse_args()
+    real = shutil.which("tesseract") is not None
+    job = ocr_image if real else burn
+    args.job_args = () if real else (args.job_ms,)
+    image = sample_image() if real else b"x" * 1024
+    out = {"job": "tesseract" if real else f"cpu-burn {args.job_ms}ms"}
+    for mode in ("inline", "pool"):
+        out[mode] = asyncio.run(measure(make_app(mode, job, args), args, image))
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
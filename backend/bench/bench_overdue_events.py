@@ -0,0 +1,83 @@
+# Load test: thousands of overdue tasks -> set-based sweep -> SSE stream -> bot Notifier fan-out.
+#   python bench/bench_overdue_events.py --tasks 5000
+import os, sys, time, json, socket, asyncio, tempfile, threading, argparse, datetime as dt
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(HERE)), "bot"))
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from models import Base, Work, Task
+from services import counters, events
+from services.scheduler import sweep_overdue
+from api_client import ApiClient
+from notify import Notifier
+
+def seed(SessionLocal, n: int, users: int):
+    past = dt.datetime.utcnow() - dt.timedelta(hours=1)
+    with SessionLocal() as db:
+        db.add(Work(name="Bench", role_name="Bench")); db.flush()
+        db.execute(insert(Task), [{"work_id": 1, "chapter_number": i, "assignee_discord_id": str(1000 + i % users),
+                                   "status": ("assigned", "in_progress")[i % 2], "due_at": past} for i in range(n)])
+        counters.rebuild(db)
+        db.commit()
+
+def serve(SessionLocal) -> tuple[uvicorn.Server, int]:
+    app = FastAPI()
+
+    @app.get("/api/events/stream")
+    async def stream(request: Request, after: int = 0):
+        return StreamingResponse(events.stream(SessionLocal, after, request.is_disconnected), media_type="text/event-stream")
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+async def fan_out(port: int, expected: int, rate: float) -> dict:
+    dms, admin = [], []
+    async def send_dm(uid, text): dms.append(uid)
+    async def send_admin(gid, text): admin.append(gid)
+    client = ApiClient(f"http://127.0.0.1:{port}")
+    n = Notifier(client, {}, 1, send_dm, send_admin, rate=rate, burst=int(rate))
+    t0 = time.perf_counter()
+    task = asyncio.create_task(n.run())
+    while len(dms) < expected:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - t0
+    task.cancel()
+    await client.aclose()
+    return {"events": n.cursor, "dms": len(dms), "admin_msgs": len(admin), "fan_out_s": round(elapsed, 3),
+            "msgs_per_s": round((len(dms) + len(admin)) / elapsed, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=5000)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--rate", type=float, default=1e6, help="per-guild messages/sec allowed by the notifier")
+    ap.add_argument("--db", default=None)
+    args = ap.parse_args()
+    url = args.db or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    seed(SessionLocal, args.tasks, args.users)
+
+    t0 = time.perf_counter()
+    ids = sweep_overdue(SessionLocal)
+    sweep_s = time.perf_counter() - t0
+    server, port = serve(SessionLocal)
+    try:
+        out = {"tasks": args.tasks, "swept": len(ids), "sweep_s": round(sweep_s, 3),
+               **asyncio.run(fan_out(port, len(ids), args.rate))}
+    finally:
+        server.should_exit = True
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Clearing a review backlog: one POST /api/tasks/{id}/review per submission (ReviewView buttons)
+# vs one POST /api/tasks/review/batch. Runs the real app in-process; --rtt-ms adds a bot<->API round trip.
+#   python bench/bench_review_batch.py --submissions 50 --rtt-ms 5
+import os, sys, time, json, asyncio, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+import httpx
+from services import auth
+
+class SlowTransport(httpx.ASGITransport):
+    def __init__(self, app, rtt: float):
+        super().__init__(app=app)
+        self.rtt = rtt
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.rtt)
+        return await super().handle_async_request(request)
+
+async def seed(client, work: str, n: int) -> list[int]:
+    r = await client.post("/api/tasks/bulk", json={"work_name": work, "chapter_from": 1, "chapter_to": n,
+                                                   "assignees": ["101", "102", "103"]})
+    ids = [t["id"] for t in r.json()["created"]]
+    for t in r.json()["created"]:
+        h = {"Authorization": "Bearer " + auth.sign({"discord_id": t["assignee_discord_id"], "role": "member"})}
+        (await client.post(f"/api/tasks/{t['id']}/submit", data={"type": "ترجمة", "link": "https://x"}, headers=h)).raise_for_status()
+    return ids
+
+def action(i: int) -> str:
+    return ("accept", "accept", "accept", "reject", "changes")[i % 5]
+
+async def one_by_one(client, ids: list[int]):
+    for i, task_id in enumerate(ids):
+        (await client.post(f"/api/tasks/{task_id}/review", json={"action": action(i), "reason": "x"})).raise_for_status()
+
+async def batched(client, ids: list[int]):
+    r = await client.post("/api/tasks/review/batch",
+                          json={"items": [{"task_id": t, "action": action(i), "reason": "x"} for i, t in enumerate(ids)]})
+    r.raise_for_status()
+    assert r.json()["failed"] == 0
+
+async def run(args) -> dict:
+    import main, migrations, db
+    migrations.migrate(db.engine)  # no lifespan under a bare ASGITransport
+    headers = {"Authorization": "Bearer " + auth.sign({"discord_id": "1", "role": "admin"})}
+    out = {}
+    for name, fn in (("one_by_one", one_by_one), ("batch", batched)):
+        transport = SlowTransport(main.app, args.rtt_ms / 1000)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", headers=headers) as client:
+            ids = await seed(client, f"Backlog-{name}", args.submissions)
+            transport.requests = 0
+            t = time.perf_counter()
+            await fn(client, ids)
+            out[name] = {"seconds": round(time.perf_counter() - t, 3), "http_requests": transport.requests}
+    return out
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--submissions", type=int, default=50)
+    p.add_argument("--rtt-ms", type=float, default=5)
+    args = p.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
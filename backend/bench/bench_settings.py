@@ -0,0 +1,37 @@
+# Per-read cost of a tunable: the snapshot lookup the hot paths use now vs os.getenv + parse
+# (what start_task / the scheduler did before) vs reading the row on every call, plus the cost
+# of one version poll.
+#   python bench/bench_settings.py --reads 200000
+import os, sys, time, json, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+from sqlalchemy import select
+import db, migrations
+from models import Setting
+from services import settings
+
+def per_call(fn, n: int) -> float:
+    t = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t) / n * 1e6
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--reads", type=int, default=200_000)
+    args = p.parse_args()
+    migrations.migrate(db.engine)
+    with db.SessionLocal() as s:
+        settings.update(s, {"overdue_hours": 36})
+        s.commit()
+    settings.refresh(db.SessionLocal)
+    with db.SessionLocal() as s:
+        row = lambda: int(s.scalar(select(Setting.value).where(Setting.key == "overdue_hours")))
+        out = {"snapshot_us": round(per_call(lambda: settings.get("overdue_hours"), args.reads), 3),
+               "getenv_parse_us": round(per_call(lambda: int(os.getenv("OVERDUE_HOURS", "24")), args.reads), 3),
+               "db_row_us": round(per_call(row, max(1, args.reads // 100)), 1)}
+    out["poll_unchanged_us"] = round(per_call(lambda: settings.refresh(db.SessionLocal), 500), 1)
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Startup cost, each measurement in a fresh interpreter: `import main` (median of --runs), the
+# same import with DB_URL pointing at a database that doesn't exist (import must not connect),
+# and time to first request: lifespan (engine + migrations on an empty SQLite file) + GET /health.
+# Exits 1 when a budget is exceeded, so it can gate CI.
+#   python bench/bench_startup.py --runs 7 --import-budget-ms 1500 --first-request-budget-ms 3000
+import os, sys, json, argparse, tempfile, statistics, subprocess
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import time
+t = time.perf_counter()
+import main
+print(time.perf_counter() - t)
+"""
+
+FIRST_REQUEST = """
+import time, asyncio
+t = time.perf_counter()
+import main, httpx
+async def go():
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://api") as c:
+            r = await c.get("/health")
+            r.raise_for_status()
+            return time.perf_counter() - t
+print(asyncio.run(go()))
+"""
+
+def timed(code: str, db_url: str) -> float:
+    env = {**os.environ, "DB_URL": db_url, "PROFILE_SLOW_MS": "0", "CHECK_INTERVAL_MINUTES": "30"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--import-budget-ms", type=float, default=None)
+    p.add_argument("--first-request-budget-ms", type=float, default=None)
+    args = p.parse_args()
+    tmp = tempfile.mkdtemp(prefix="manga-startup-")
+
+    imports = [timed(IMPORT, f"sqlite:///{tmp}/import.db") for _ in range(args.runs)]
+    # nothing listens on port 1: any connect attempt at import would fail the subprocess
+    unreachable = timed(IMPORT, "postgresql://nobody:x@127.0.0.1:1/none")
+    first = [timed(FIRST_REQUEST, f"sqlite:///{tmp}/first-{i}.db") for i in range(args.runs)]
+    report = {"import_ms": {"median": round(statistics.median(imports) * 1000, 1), "max": round(max(imports) * 1000, 1)},
+              "import_unreachable_db_ms": round(unreachable * 1000, 1),
+              "first_request_ms": {"median": round(statistics.median(first) * 1000, 1), "max": round(max(first) * 1000, 1)},
+              "import_created_db_file": os.path.exists(f"{tmp}/import.db")}
+    over = []
+    if report["import_created_db_file"]:
+        over.append("import touched the database")
+    if args.import_budget_ms is not None and report["import_ms"]["median"] > args.import_budget_ms:
+        over.append("import")
+    if args.first_request_budget_ms is not None and report["first_request_ms"]["median"] > args.first_request_budget_ms:
+        over.append("first_request")
+    report["over_budget"] = over
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
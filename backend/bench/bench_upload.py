@@ -0,0 +1,49 @@
+# Peak RSS of handing a large chapter archive to the uploader: the old read-everything path
+# (bytes read from the request, then uploaded) vs the spooled, chunked path used by submit_task.
+# Each mode runs in a fresh subprocess so ru_maxrss is not shared.
+#   python bench/bench_upload.py --mb 150
+import os, sys, json, time, resource, tempfile, argparse, subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def rss_mb() -> float:
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(r / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+def child(mode: str, src: str, root: str):
+    os.environ["UPLOAD_DIR"] = root
+    from services import drive, uploads
+    base = rss_mb()
+    t0 = time.perf_counter()
+    with open(src, "rb") as f:
+        if mode == "buffered":
+            data = f.read()  # what `await file.read()` did
+            link = drive.ensure_drive_path_and_upload("Bench", "Chapter 1/ترجمة", "buffered.zip", data)
+        else:
+            path = uploads.spool_to_disk(f)  # what submit_task does with UploadFile.file
+            with open(path, "rb") as g:
+                link = drive.ensure_drive_path_and_upload("Bench", "Chapter 1/ترجمة", "streamed.zip", g)
+            os.remove(path)
+    print(json.dumps({"mode": mode, "seconds": round(time.perf_counter() - t0, 3),
+                      "baseline_rss_mb": base, "peak_rss_mb": rss_mb(), "link": link}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=int, default=150)
+    ap.add_argument("--child", nargs=3)
+    args = ap.parse_args()
+    if args.child:
+        return child(*args.child)
+    tmp = tempfile.mkdtemp()
+    src = os.path.join(tmp, "chapter.zip")
+    with open(src, "wb") as f:
+        for _ in range(args.mb):
+            f.write(os.urandom(1024 * 1024))
+    out = []
+    for mode in ("buffered", "streamed"):
+        r = subprocess.run([sys.executable, __file__, "--child", mode, src, os.path.join(tmp, "store")],
+                           capture_output=True, text=True, check=True)
+        out.append(json.loads(r.stdout))
+    print(json.dumps({"file_mb": args.mb, "runs": out}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
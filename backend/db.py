@@ -0,0 +1,91 @@
+
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+DB_URL = os.getenv("DB_URL")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE","10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW","20"))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE","100"))
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_url(url: str):
+    # postgresql[+psycopg2]:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite:// (tests)
+    u = make_url(url)
+    backend = u.get_backend_name()
+    u = u.set(drivername=ASYNC_DRIVERS.get(backend, u.drivername))
+    if backend == "postgresql":
+        u = u.update_query_dict({"prepared_statement_cache_size": str(STATEMENT_CACHE_SIZE)})
+    return u
+
+def pool_options(url: str) -> dict:
+    # sqlite's default pools don't take size/overflow
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW}
+
+# Engines are created on first use (or by the app's lifespan), never at import, so importing
+# models/services/main touches no database. `from db import engine` still works: it initializes.
+_hooks: list = []
+
+def init(url: str | None = None):
+    global DB_URL, engine, async_engine
+    if "engine" in globals():
+        return
+    DB_URL = url or os.getenv("DB_URL") or DB_URL
+    engine = create_engine(DB_URL, pool_pre_ping=True, **pool_options(DB_URL))
+    async_engine = create_async_engine(async_url(DB_URL), pool_pre_ping=True, **pool_options(DB_URL))
+    for fn in _hooks:
+        fn(engine); fn(async_engine)
+
+def on_engine(fn):
+    # fn(engine) for each engine created, including ones that already exist (metrics listeners)
+    _hooks.append(fn)
+    if "engine" in globals():
+        fn(engine); fn(async_engine)
+
+async def dispose():
+    # dropped from globals() so the next access goes back through __getattr__ -> init()
+    g = globals()
+    if "engine" in g:
+        await g.pop("async_engine").dispose()
+        g.pop("engine").dispose()
+
+def __getattr__(name: str):
+    if name in ("engine", "async_engine"):
+        init()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _Session(Session):
+    def __init__(self, bind=None, **kw):
+        super().__init__(bind=bind if bind is not None else __getattr__("engine"), **kw)
+
+class _AsyncSession(AsyncSession):
+    def __init__(self, bind=None, **kw):
+        super().__init__(bind=bind if bind is not None else __getattr__("async_engine"), **kw)
+
+SessionLocal = sessionmaker(class_=_Session, autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(class_=_AsyncSession, autoflush=False, expire_on_commit=False)
+
+def insert_ignore(session, model):
+    # INSERT .. ON CONFLICT DO NOTHING for whichever dialect the session is bound to
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,43 +1,42 @@
 
-import os, io, datetime as dt, asyncio
-from typing import Optional, List
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+import os, io, base64, datetime as dt, asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Response, Request, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, HTMLResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sqlalchemy import create_engine, select, func, or_
-from sqlalchemy.orm import sessionmaker, Session
-from models import Base, User, Work, Task, Transaction, Setting
+from pydantic import BaseModel, Field
+from sqlalchemy import select, func, or_, tuple_, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import User, Work, Task, ArchivedTask, TaskEvent, Manifest, PageResult, Transaction, Setting
+from db import SessionLocal, AsyncSessionLocal, get_async_db
 from services.ai import ai_chat, ai_image_ocr_then_translate
-from services.drive import ensure_drive_path_and_upload
-from services.auth import admin_required, get_current_user, oauth_router
-from services.scheduler import scheduler_start, mark_overdue_and_handle
-from services.logic import accept_task_logic, reject_task_logic, request_changes_logic, finalize_member_roles_if_done
+from services.auth import admin_required, get_current_user, invalidate_user, oauth_router
+from services.scheduler import scheduler_start, mark_overdue_and_handle, notify_due
+from services import counters, events, logic, uploads, blobs, ocr, batch, ai, ledger, leaderboard, metrics, settings, archive
+from services.profiler import sampler, PROFILE_SLOW_MS
 from fastapi import APIRouter
+import db as database, migrations
 
-DB_URL = os.getenv("DB_URL")
-engine = create_engine(DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base.metadata.create_all(bind=engine)
+# Importing this module has no side effects (no engine, no DDL, no threads); the lifespan
+# below connects, migrates and starts the background work. uvicorn main:app as before.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN","")
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE","1") == "1"  # off: run `python migrations.py` as a deploy step
+database.on_engine(metrics.instrument_engine)
 
-app = FastAPI(title="Manga Suite API", version="1.0.0")
+root = APIRouter()
 
-origins = [os.getenv("BACKEND_CORS","http://localhost:3000")]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(oauth_router, prefix="/auth", tags=["auth"])
+@root.get("/health", include_in_schema=False)
+async def health():
+    return {"ok": True}
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@root.get("/metrics", include_in_schema=False)
+async def metrics_ep(authorization: Optional[str] = Header(None)):
+    # Prometheus scrape target; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(401, "Bad metrics token")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # --------- Schemas ---------
 class WorkIn(BaseModel):
@@ -54,6 +53,18 @@ class TaskIn(BaseModel):
     work_id: int
     chapter_number: int
     assignee_discord_id: Optional[str] = None
+    type: Optional[str] = None
+
+class BulkTasksIn(BaseModel):
+    # work by id, or by name (created if missing) so the bot needs a single call
+    work_id: Optional[int] = None
+    work_name: Optional[str] = None
+    chapters: List[int] = Field(default_factory=list)
+    chapter_from: Optional[int] = None
+    chapter_to: Optional[int] = None
+    type: Optional[str] = None
+    assignees: List[str] = Field(default_factory=list)  # round-robin over the chapters
+    assignment: Dict[int, str] = Field(default_factory=dict)  # explicit chapter -> assignee, wins over round-robin
 
 class TaskOut(BaseModel):
     id: int
@@ -62,9 +73,13 @@ class TaskOut(BaseModel):
     status: str
     assignee_discord_id: Optional[str]
     type: Optional[str] = None
+    stage: Optional[str] = None
     link: Optional[str] = None
     created_at: dt.datetime
     due_at: Optional[dt.datetime] = None
+    upload_status: Optional[str] = None
+    manifest_id: Optional[int] = None
+    finished_at: Optional[dt.datetime] = None
     class Config:
         from_attributes = True
 
@@ -73,62 +88,183 @@ class ReviewAction(BaseModel):
     reason: Optional[str] = None
     points_awarded: Optional[int] = None
 
+class ReviewItem(ReviewAction):
+    task_id: int
+
+class ReviewBatch(BaseModel):
+    items: List[ReviewItem] = Field(max_length=200)
+
 # --------- Works ---------
 api = APIRouter(prefix="/api", tags=["api"])
 
 @api.post("/works", dependencies=[Depends(admin_required)])
-def create_work(work: WorkIn, db: Session = Depends(get_db)):
+async def create_work(work: WorkIn, db: AsyncSession = Depends(get_async_db)):
     # role_name equals the work name (Discord role created by bot). DB side only.
-    exists = db.scalar(select(Work).where(func.lower(Work.name)==work.name.lower()))
+    exists = await db.scalar(select(Work).where(func.lower(Work.name)==work.name.lower()))
     if exists:
         raise HTTPException(400, "Work already exists")
     w = Work(name=work.name, role_name=work.name)
     db.add(w)
-    db.commit()
-    db.refresh(w)
+    await db.commit()
+    await db.refresh(w)
     return {"id": w.id, "name": w.name, "role_name": w.role_name}
 
 @api.get("/works", dependencies=[Depends(admin_required)], response_model=List[WorkOut])
-def list_works(db: Session = Depends(get_db)):
-    return db.scalars(select(Work)).all()
+async def list_works(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(Work))).all()
+
+@api.get("/works/version", dependencies=[Depends(admin_required)])
+async def works_version(db: AsyncSession = Depends(get_async_db)):
+    # works are only ever added, so count + max id changes whenever the list does
+    count, max_id = (await db.execute(select(func.count(Work.id), func.max(Work.id)))).one()
+    return {"version": f"{count}-{max_id or 0}"}
+
+@api.get("/works/by-name/{name}", dependencies=[Depends(admin_required)], response_model=WorkOut)
+async def work_by_name(name: str, db: AsyncSession = Depends(get_async_db)):
+    w = await db.scalar(select(Work).where(func.lower(Work.name)==name.lower()))
+    if not w:
+        raise HTTPException(404, "Work not found")
+    return w
 
 # --------- Tasks ---------
 @api.post("/tasks", dependencies=[Depends(admin_required)], response_model=TaskOut)
-def create_task(task: TaskIn, db: Session = Depends(get_db)):
-    work = db.get(Work, task.work_id)
+async def create_task(task: TaskIn, db: AsyncSession = Depends(get_async_db)):
+    work = await db.get(Work, task.work_id)
     if not work:
         raise HTTPException(404, "Work not found")
-    t = Task(work_id=task.work_id, chapter_number=task.chapter_number, assignee_discord_id=task.assignee_discord_id)
-    db.add(t); db.commit(); db.refresh(t)
+    if await db.run_sync(archive.chapter_archived, task.work_id, [task.chapter_number], task.type):
+        raise HTTPException(409, "Task already exists for this chapter")
+    t = Task(work_id=task.work_id, chapter_number=task.chapter_number, assignee_discord_id=task.assignee_discord_id,
+             type=task.type, stage=task.type)
+    db.add(t); await db.run_sync(counters.task_added, t)
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(409, "Task already exists for this chapter")
+    await db.refresh(t)
     return t
 
-@api.get("/tasks", dependencies=[Depends(admin_required)], response_model=List[TaskOut])
-def list_tasks(status: Optional[str]=None, db: Session = Depends(get_db)):
-    q = select(Task)
-    if status:
-        q = q.where(Task.status==status)
-    return db.scalars(q.order_by(Task.created_at.desc())).all()
+BULK_MAX_CHAPTERS = 1000
+
+@api.post("/tasks/bulk", dependencies=[Depends(admin_required)])
+async def bulk_create_tasks(body: BulkTasksIn, db: AsyncSession = Depends(get_async_db)):
+    too_many = HTTPException(400, f"At most {BULK_MAX_CHAPTERS} chapters per call")
+    # sized before anything is built, so a huge range or list is refused without allocating it
+    if len(body.chapters) + len(body.assignment) > BULK_MAX_CHAPTERS:
+        raise too_many
+    chapters = list(body.chapters)
+    if body.chapter_from is not None:
+        chapter_to = body.chapter_to if body.chapter_to is not None else body.chapter_from
+        if chapter_to - body.chapter_from + 1 > BULK_MAX_CHAPTERS:
+            raise too_many
+        chapters += range(body.chapter_from, chapter_to + 1)
+    chapters = sorted(set(chapters) | set(body.assignment))
+    if not chapters:
+        raise HTTPException(400, "No chapters")
+    if len(chapters) > BULK_MAX_CHAPTERS:
+        raise too_many
+    if body.work_id is not None:
+        work = await db.get(Work, body.work_id)
+    elif body.work_name:
+        work = await db.scalar(select(Work).where(func.lower(Work.name)==body.work_name.lower()))
+        if not work:
+            work = Work(name=body.work_name, role_name=body.work_name)
+            db.add(work)
+            try:
+                await db.flush()
+            except IntegrityError:
+                # created concurrently
+                await db.rollback()
+                work = await db.scalar(select(Work).where(func.lower(Work.name)==body.work_name.lower()))
+    else:
+        raise HTTPException(400, "work_id or work_name required")
+    if not work:
+        raise HTTPException(404, "Work not found")
+    rows = []
+    for i, ch in enumerate(chapters):
+        assignee = body.assignment.get(ch) or (body.assignees[i % len(body.assignees)] if body.assignees else None)
+        rows.append({"chapter_number": ch, "assignee_discord_id": assignee, "type": body.type})
+    created = await logic.bulk_create_tasks(db, work.id, rows)
+    await db.commit()
+    done = {c["chapter_number"] for c in created}
+    return {"work": {"id": work.id, "name": work.name, "role_name": work.role_name},
+            "created": created, "skipped": [ch for ch in chapters if ch not in done]}
+
+TASK_FIELDS = tuple(TaskOut.model_fields)
+
+def encode_cursor(created_at: dt.datetime, task_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{task_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, int]:
+    try:
+        ts, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return dt.datetime.fromisoformat(ts), int(task_id)
+    except Exception:
+        raise HTTPException(400, "Bad cursor")
+
+@api.get("/tasks", dependencies=[Depends(admin_required)])
+async def list_tasks(response: Response,
+                     status: Optional[str] = Query(None, description="one status or a comma-separated set"),
+                     work_id: Optional[int] = None,
+                     assignee_discord_id: Optional[str] = None,
+                     chapter_min: Optional[int] = None,
+                     chapter_max: Optional[int] = None,
+                     fields: Optional[str] = Query(None, description="comma-separated subset of TaskOut fields"),
+                     cursor: Optional[str] = None,
+                     limit: int = Query(100, ge=1, le=1000),
+                     include_archived: bool = Query(False, description="also walk tasks_archive (old accepted/rejected)"),
+                     db: AsyncSession = Depends(get_async_db)):
+    names = [f for f in (fields or "").split(",") if f] or list(TASK_FIELDS)
+    unknown = set(names) - set(TASK_FIELDS)
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    after = decode_cursor(cursor) if cursor else None
+
+    def page(model):
+        # (created_at, id) are always selected: they are the page key
+        q = select(*[getattr(model, f) for f in dict.fromkeys(names + ["created_at", "id"])])
+        if status:
+            statuses = status.split(",")
+            q = q.where(model.status==statuses[0] if len(statuses)==1 else model.status.in_(statuses))
+        if work_id is not None:
+            q = q.where(model.work_id==work_id)
+        if assignee_discord_id is not None:
+            q = q.where(model.assignee_discord_id==assignee_discord_id)
+        if chapter_min is not None:
+            q = q.where(model.chapter_number>=chapter_min)
+        if chapter_max is not None:
+            q = q.where(model.chapter_number<=chapter_max)
+        if after:
+            q = q.where(tuple_(model.created_at, model.id) < tuple_(*after))
+        return q.order_by(model.created_at.desc(), model.id.desc()).limit(limit)
+
+    q = page(Task)
+    if include_archived:
+        # top `limit` of each table, merged; ids are shared so the cursor works across both
+        u = union_all(*(select(*p.subquery().c) for p in (q, page(ArchivedTask)))).subquery()
+        q = select(*u.c).order_by(u.c.created_at.desc(), u.c.id.desc()).limit(limit)
+    rows = (await db.execute(q)).mappings().all()
+    if len(rows)==limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [{f: r[f] for f in names} for r in rows]
 
 @api.post("/tasks/{task_id}/assign", dependencies=[Depends(admin_required)])
-def assign_task(task_id: int, assignee_discord_id: str, db: Session = Depends(get_db)):
-    t = db.get(Task, task_id)
+async def assign_task(task_id: int, assignee_discord_id: str, db: AsyncSession = Depends(get_async_db)):
+    t = await db.get(Task, task_id, with_for_update=True)
     if not t: raise HTTPException(404, "Task not found")
-    t.assignee_discord_id = assignee_discord_id
-    t.status = "assigned"
-    db.commit()
+    await logic.assign_task(db, t, assignee_discord_id)
+    await db.commit()
     return {"ok": True}
 
 @api.post("/tasks/{task_id}/start")
-def start_task(task_id: int, user=Depends(get_current_user), db: Session = Depends(get_db)):
-    t = db.get(Task, task_id)
+async def start_task(task_id: int, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    t = await db.get(Task, task_id, with_for_update=True)
     if not t: raise HTTPException(404, "Task not found")
     if str(t.assignee_discord_id) != str(user.discord_id):
         raise HTTPException(403, "Not your task")
-    t.status = "in_progress"
-    # set due
-    hours = int(os.getenv("OVERDUE_HOURS","24"))
-    t.due_at = dt.datetime.utcnow() + dt.timedelta(hours=hours)
-    db.commit()
+    await logic.start_task(db, t, settings.get("overdue_hours"))
+    await db.commit()
+    notify_due(t.due_at)
     return {"ok": True}
 
 @api.post("/tasks/{task_id}/submit")
@@ -137,56 +273,148 @@ async def submit_task(task_id: int,
                       upload_to_drive: bool = Form(False),
                       link: Optional[str] = Form(None),
                       file: Optional[UploadFile] = File(None),
+                      file_url: Optional[str] = Form(None),  # attachment URL; fetched server-side
+                      filename: Optional[str] = Form(None),
                       user=Depends(get_current_user),
-                      db: Session = Depends(get_db)):
-    t = db.get(Task, task_id)
+                      db: AsyncSession = Depends(get_async_db)):
+    t = await db.get(Task, task_id)
     if not t: raise HTTPException(404, "Task not found")
     if str(t.assignee_discord_id) != str(user.discord_id):
         raise HTTPException(403, "Not your task")
-    t.type = type
-    # optional drive upload
-    if upload_to_drive:
+    if file_url:
+        uploads.check_url(file_url)
+    job = None
+    # optional drive upload, streamed to disk and handed to a background job
+    if upload_to_drive and (file or file_url):
         # derive folder path: WorkName / Chapter {num} / ترجمة|تحرير
-        work = db.get(Work, t.work_id)
+        work = await db.get(Work, t.work_id)
         if not work: raise HTTPException(400, "Work missing")
         chapter_folder = f"Chapter {t.chapter_number}/{type}"
-        file_bytes = None
-        filename = None
         if file:
-            file_bytes = await file.read()
-            filename = file.filename
-        elif link:
-            # store just the link
-            pass
-        drive_link = None
-        if file_bytes and filename:
-            drive_link = ensure_drive_path_and_upload(work.name, chapter_folder, filename, file_bytes)
-        t.link = drive_link or link
-    else:
-        # store link only or ignore if file-only (bot will handle attachments path)
-        if link:
-            t.link = link
-    t.status = "submitted"
-    db.commit()
-    return {"ok": True, "review_ready": True, "link": t.link}
+            # UploadFile is already spooled by starlette; copy it out in chunks, never into memory
+            path = await asyncio.to_thread(uploads.spool_to_disk, file.file)
+            job = dict(filename=filename or file.filename, path=path)
+        else:
+            job = dict(filename=filename or uploads.filename_from_url(file_url), url=file_url)
+    elif file_url and not link:
+        link = file_url
+    # locked only now, not across the spool above
+    await db.refresh(t, with_for_update=True)
+    if job:
+        t.upload_status = "pending"
+    await logic.submit_task(db, t, type, link)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # the spooled file has no upload job to clean it up
+        if job and job.get("path"):
+            os.remove(job["path"])
+        raise HTTPException(409, "Conflicts with another task for this chapter")
+    if job:
+        uploads.start(SessionLocal, t.id, work.name, chapter_folder, **job)
+    return {"ok": True, "review_ready": job is None, "link": t.link, "upload_status": t.upload_status}
 
-@api.post("/tasks/{task_id}/review", dependencies=[Depends(admin_required)])
-def review_task(task_id: int, req: ReviewAction, db: Session = Depends(get_db)):
-    t = db.get(Task, task_id)
+@api.get("/tasks/{task_id}/upload")
+async def upload_status(task_id: int, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    t = await db.get(Task, task_id) or await db.get(ArchivedTask, task_id)
     if not t: raise HTTPException(404, "Task not found")
-    if req.action == "accept":
-        accept_task_logic(db, t, points=req.points_awarded)
-    elif req.action == "reject":
-        reject_task_logic(db, t, reason=req.reason)
-    elif req.action == "changes":
-        request_changes_logic(db, t, reason=req.reason)
-    else:
+    if not user.is_admin and str(t.assignee_discord_id) != str(user.discord_id):
+        raise HTTPException(403, "Not your task")
+    return {"upload_status": t.upload_status, "link": t.link}
+
+@api.post("/tasks/review/batch", dependencies=[Depends(admin_required)])
+async def review_batch(body: ReviewBatch, db: AsyncSession = Depends(get_async_db)):
+    # all items in one transaction; per-item failures (unknown task / action) don't abort the rest
+    results = await logic.review_batch(db, [i.model_dump() for i in body.items])
+    await db.commit()
+    return {"results": results, "ok": sum(r["ok"] for r in results), "failed": sum(not r["ok"] for r in results)}
+
+@api.get("/review-queue", dependencies=[Depends(admin_required)])
+async def review_queue(response: Response,
+                       work_id: Optional[int] = None,
+                       cursor: Optional[str] = None,
+                       limit: int = Query(25, ge=1, le=200),
+                       db: AsyncSession = Depends(get_async_db)):
+    # oldest submission first; walks ix_tasks_status_created_id forward
+    q = (select(Task.id, Task.work_id, Work.name.label("work_name"), Task.chapter_number, Task.assignee_discord_id,
+                Task.type, Task.link, Task.upload_status, Task.created_at)
+         .join(Work, Work.id==Task.work_id)
+         .where(Task.status=="submitted"))
+    if work_id is not None:
+        q = q.where(Task.work_id==work_id)
+    if cursor:
+        q = q.where(tuple_(Task.created_at, Task.id) > tuple_(*decode_cursor(cursor)))
+    rows = (await db.execute(q.order_by(Task.created_at, Task.id).limit(limit))).mappings().all()
+    if len(rows)==limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [dict(r) for r in rows]
+
+@api.post("/tasks/{task_id}/review", dependencies=[Depends(admin_required)])
+async def review_task(task_id: int, req: ReviewAction, db: AsyncSession = Depends(get_async_db)):
+    if req.action not in logic.REVIEW_ACTIONS:
         raise HTTPException(400, "Unknown action")
-    # may trigger role removal if all tasks done
-    finalize_member_roles_if_done(db, t)
-    db.commit()
+    t = await db.get(Task, task_id, with_for_update=True)
+    if not t: raise HTTPException(404, "Task not found")
+    await logic.review_task(db, t, req.action, reason=req.reason, points=req.points_awarded)
+    await db.commit()
     return {"ok": True}
 
+@api.get("/manifests/{manifest_id}")
+async def get_manifest(manifest_id: int, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    m = await db.get(Manifest, manifest_id)
+    if not m: raise HTTPException(404, "Manifest not found")
+    if not user.is_admin:
+        t = await db.get(Task, m.task_id) or await db.get(ArchivedTask, m.task_id)
+        if not t or str(t.assignee_discord_id) != str(user.discord_id):
+            raise HTTPException(403, "Not your task")
+    return await db.run_sync(blobs.resolve, m)
+
+@api.get("/manifests/{manifest_id}/view", include_in_schema=False)
+async def view_manifest(manifest_id: int, sig: str, db: AsyncSession = Depends(get_async_db)):
+    # what Task.link points at: opened from Discord, so the signature stands in for a bearer token
+    if not blobs.check_sig(manifest_id, sig):
+        raise HTTPException(403, "Bad link")
+    m = await db.get(Manifest, manifest_id)
+    if not m: raise HTTPException(404, "Manifest not found")
+    out = await db.run_sync(blobs.resolve, m)
+    entries = out["entries"]
+    # a single stored file opens directly in Drive
+    if len(entries) == 1 and (entries[0]["url"] or "").startswith(("http://", "https://")):
+        return RedirectResponse(entries[0]["url"])
+    return HTMLResponse(blobs.view_html(out))
+
+# --------- Events ---------
+class EventOut(BaseModel):
+    id: int
+    kind: str
+    task_id: Optional[int] = None
+    work_id: Optional[int] = None
+    assignee_discord_id: Optional[str] = None
+    detail: Optional[str] = None
+    created_at: dt.datetime
+    class Config:
+        from_attributes = True
+
+@api.get("/events", dependencies=[Depends(admin_required)], response_model=List[EventOut])
+async def list_events(after: int = 0, kind: Optional[str] = None, limit: int = Query(500, ge=1, le=5000),
+                      db: AsyncSession = Depends(get_async_db)):
+    q = select(TaskEvent).where(TaskEvent.id > after)
+    if kind:
+        q = q.where(TaskEvent.kind==kind)
+    return (await db.scalars(q.order_by(TaskEvent.id).limit(limit))).all()
+
+@api.get("/events/latest", dependencies=[Depends(admin_required)])
+async def latest_event(db: AsyncSession = Depends(get_async_db)):
+    # where a new consumer starts when it has no saved cursor
+    return {"id": await db.scalar(select(func.max(TaskEvent.id))) or 0}
+
+@api.get("/events/stream", dependencies=[Depends(admin_required)])
+async def stream_events(request: Request, after: int = 0, last_event_id: Optional[str] = Header(None)):
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return StreamingResponse(events.stream(SessionLocal, after, request.is_disconnected),
+                             media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # --------- AI ---------
 class AISchema(BaseModel):
     prompt: Optional[str] = None
@@ -196,37 +424,251 @@ class AISchema(BaseModel):
 async def ai_chat_ep(body: AISchema, user=Depends(get_current_user)):
     return {"reply": await ai_chat(body.prompt or "", body.lang or "ar")}
 
+@api.get("/ai/stats", dependencies=[Depends(admin_required)])
+async def ai_stats_ep():
+    return ai.stats()
+
+class SettingsIn(BaseModel):
+    values: Dict[str, str | int | float]
+
+def settings_out(snap: settings.Snapshot) -> dict:
+    return {"version": snap.version, "values": dict(snap.values)}
+
+@api.get("/settings", dependencies=[Depends(admin_required)])
+async def settings_get():
+    # served from the snapshot, no query; the bot polls this
+    return settings_out(settings.current())
+
+@api.put("/settings", dependencies=[Depends(admin_required)])
+async def settings_put(body: SettingsIn, db: AsyncSession = Depends(get_async_db)):
+    try:
+        snap = await db.run_sync(settings.update, body.values)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    await db.commit()
+    settings.install(snap)
+    return settings_out(snap)
+
+@api.post("/admin/archive", dependencies=[Depends(admin_required)])
+async def archive_now():
+    # what the scheduler does each pass: move finished tasks older than archive_after_days
+    return {"archived": await asyncio.to_thread(archive.run, SessionLocal)}
+
+class ProfilerIn(BaseModel):
+    slow_ms: int = Field(ge=0)  # 0 turns the sampler off
+
+@api.get("/admin/profiler", dependencies=[Depends(admin_required)])
+async def profiler_state():
+    return sampler.state()
+
+@api.post("/admin/profiler", dependencies=[Depends(admin_required)])
+async def profiler_toggle(body: ProfilerIn):
+    sampler.configure(body.slow_ms)
+    return sampler.state()
+
 @api.post("/ai/image")
 async def ai_img_ep(lang: Optional[str]="ar", file: UploadFile = File(...), user=Depends(get_current_user)):
     data = await file.read()
-    text = await ai_image_ocr_then_translate(data, lang=lang or "ar")
+    try:
+        text = await ai_image_ocr_then_translate(data, lang=lang or "ar")
+    except ocr.OcrBusy:
+        raise HTTPException(503, "OCR queue is full, try again shortly", headers={"Retry-After": "5"})
+    except ocr.OcrTimeout:
+        raise HTTPException(504, "OCR timed out")
     return {"text": text}
 
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _batch_stream(spooled: list[tuple[str, str]], lang: str, task_id: Optional[int]):
+    # spooled: (name, temp path); files are removed once the stream ends or the client leaves
+    handles = []
+    try:
+        if len(spooled) == 1 and batch.is_archive(spooled[0][0]):
+            handles.append(open(spooled[0][1], "rb"))
+            pages = batch.pages_from_archive(handles[0])
+        else:
+            pages = [(name, lambda path=path: _read_file(path)) for name, path in spooled]
+        async for line in batch.run(pages, lang, task_id, AsyncSessionLocal):
+            yield line
+    finally:
+        for h in handles:
+            h.close()
+        for _, path in spooled:
+            if os.path.exists(path):
+                os.remove(path)
+
+@api.post("/ai/batch")
+async def ai_batch_ep(lang: str = Form("ar"),
+                      task_id: Optional[int] = Form(None),
+                      files: Optional[List[UploadFile]] = File(None),  # one zip/cbz or several page images
+                      file_url: Optional[str] = Form(None),
+                      user=Depends(get_current_user),
+                      db: AsyncSession = Depends(get_async_db)):
+    if task_id is not None:
+        t = await db.get(Task, task_id)
+        if not t: raise HTTPException(404, "Task not found")
+        if not user.is_admin and str(t.assignee_discord_id) != str(user.discord_id):
+            raise HTTPException(403, "Not your task")
+    if file_url:
+        uploads.check_url(file_url)
+        spooled = [(uploads.filename_from_url(file_url), await asyncio.to_thread(uploads.download_to_disk, file_url))]
+    elif files:
+        spooled = [(f.filename or f"page{i}.png", await asyncio.to_thread(uploads.spool_to_disk, f.file))
+                   for i, f in enumerate(files, 1)]
+    else:
+        raise HTTPException(400, "No pages")
+    return StreamingResponse(_batch_stream(spooled, lang, task_id), media_type="application/x-ndjson")
+
+@api.get("/tasks/{task_id}/pages")
+async def task_pages(task_id: int, lang: str = "ar", user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    t = await db.get(Task, task_id) or await db.get(ArchivedTask, task_id)
+    if not t: raise HTTPException(404, "Task not found")
+    if not user.is_admin and str(t.assignee_discord_id) != str(user.discord_id):
+        raise HTTPException(403, "Not your task")
+    rows = (await db.scalars(select(PageResult).where(PageResult.task_id==task_id, PageResult.lang==lang)
+                             .order_by(PageResult.page))).all()
+    return [{"page": r.page, "name": r.name, "ocr_text": r.ocr_text, "translation": r.translation} for r in rows]
+
 # --------- Finance & Settings ---------
 class PayMethod(BaseModel):
     method: str  # bybit, paypal, binance, credit
     address: Optional[str] = None
 
 @api.post("/users/paymethod")
-def set_paymethod(body: PayMethod, user=Depends(get_current_user), db: Session = Depends(get_db)):
-    u = db.scalar(select(User).where(User.discord_id==str(user.discord_id)))
+async def set_paymethod(body: PayMethod, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    u = await db.scalar(select(User).where(User.discord_id==str(user.discord_id)))
     if not u:
         raise HTTPException(404, "User not found")
     u.pay_method = body.method
     u.pay_address = body.address
-    db.commit()
+    await db.commit()
     return {"ok": True}
 
+@api.get("/users/{discord_id}/monthly")
+async def user_monthly(discord_id: str, month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+                       user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    if not user.is_admin and str(user.discord_id) != discord_id:
+        raise HTTPException(403, "Not allowed")
+    return await db.run_sync(ledger.monthly, discord_id, month or ledger.month_of())
+
+@api.get("/users/{discord_id}/evaluation")
+async def user_evaluation(discord_id: str, month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+                          user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # includes earnings: same rule as /monthly
+    if not user.is_admin and str(user.discord_id) != discord_id:
+        raise HTTPException(403, "Not allowed")
+    return await db.run_sync(ledger.evaluation, discord_id, month or ledger.month_of())
+
+@api.get("/leaderboard")
+async def get_leaderboard(month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+                          work_id: Optional[int] = None,
+                          limit: int = Query(20, ge=1, le=200),
+                          offset: int = Query(0, ge=0),
+                          user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    out = await db.run_sync(leaderboard.top, month or ledger.month_of(), work_id, limit, offset)
+    out["me"] = await db.run_sync(leaderboard.position, out["month"], work_id, str(user.discord_id))
+    return out
+
+@api.get("/admin/payouts", dependencies=[Depends(admin_required)])
+async def admin_payouts(month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"), db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(ledger.payouts, month or ledger.month_of())
+
+class RoleIn(BaseModel):
+    role: str = Field(pattern="^(owner|admin|reviewer|member)$")
+
+@api.put("/users/{discord_id}/role", dependencies=[Depends(admin_required)])
+async def set_role(discord_id: str, body: RoleIn, db: AsyncSession = Depends(get_async_db)):
+    u = await db.scalar(select(User).where(User.discord_id==discord_id))
+    if not u:
+        raise HTTPException(404, "User not found")
+    u.role = body.role
+    await db.commit()
+    invalidate_user(discord_id)
+    return {"ok": True}
+
+class RoleRef(BaseModel):
+    discord_id: str
+    work_id: int
+
+class RolesRemoved(BaseModel):
+    items: List[RoleRef] = Field(max_length=1000)
+
+@api.get("/roles/to-remove", dependencies=[Depends(admin_required)])
+async def roles_to_remove(response: Response, cursor: Optional[str] = None,
+                          limit: int = Query(500, ge=1, le=1000), db: AsyncSession = Depends(get_async_db)):
+    # members whose open-task count in a work dropped to zero and who still hold its role
+    after = None
+    if cursor:
+        try:
+            work_id, _, discord_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+            after = (int(work_id), discord_id)
+        except Exception:
+            raise HTTPException(400, "Bad cursor")
+    pairs = await db.run_sync(counters.roles_to_remove, after, limit)
+    names = dict((await db.execute(select(Work.id, Work.role_name).where(Work.id.in_({w for w, _ in pairs})))).all()) if pairs else {}
+    if len(pairs)==limit:
+        response.headers["X-Next-Cursor"] = base64.urlsafe_b64encode(f"{pairs[-1][0]}|{pairs[-1][1]}".encode()).decode()
+    return [{"discord_id": d, "work_id": w, "role_name": names.get(w)} for w, d in pairs]
+
+@api.post("/roles/removed", dependencies=[Depends(admin_required)])
+async def roles_removed(body: RolesRemoved, db: AsyncSession = Depends(get_async_db)):
+    n = await db.run_sync(counters.roles_removed, [(i.work_id, i.discord_id) for i in body.items])
+    await db.commit()
+    return {"ok": True, "updated": n}
+
 @api.get("/admin/summary", dependencies=[Depends(admin_required)])
-def admin_summary(db: Session = Depends(get_db)):
-    total_tasks = db.scalar(select(func.count(Task.id)))
-    submitted = db.scalar(select(func.count(Task.id)).where(Task.status=="submitted"))
-    accepted = db.scalar(select(func.count(Task.id)).where(Task.status=="accepted"))
-    rejected = db.scalar(select(func.count(Task.id)).where(Task.status=="rejected"))
-    return {"total_tasks": total_tasks, "submitted": submitted, "accepted": accepted, "rejected": rejected}
-
-app.include_router(api)
-
-@app.on_event("startup")
-async def on_start():
-    asyncio.create_task(scheduler_start(SessionLocal))
+async def admin_summary(by: Optional[str] = Query(None, pattern="^(work|assignee)$"),
+                        exact: bool = False,
+                        db: AsyncSession = Depends(get_async_db)):
+    if exact:
+        # grouped scans of tasks and the archive, bypassing the counters table
+        by_status = {}
+        for model in (Task, ArchivedTask):
+            for st, n in (await db.execute(select(model.status, func.count()).group_by(model.status))).all():
+                by_status[st] = by_status.get(st, 0) + n
+    else:
+        # read-only: migrations backfill the counters of a pre-existing database
+        by_status = (await db.run_sync(counters.read)).get("", {})
+    out = {"total_tasks": sum(by_status.values()), "submitted": by_status.get("submitted", 0),
+           "accepted": by_status.get("accepted", 0), "rejected": by_status.get("rejected", 0),
+           "by_status": by_status}
+    if by:
+        out[f"by_{by}"] = await db.run_sync(counters.read, by)
+    return out
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init()
+    if AUTO_MIGRATE:
+        await asyncio.to_thread(migrations.migrate, database.engine)
+    await asyncio.to_thread(settings.refresh, SessionLocal, True)
+    sampler.configure(PROFILE_SLOW_MS)
+    background = [asyncio.create_task(scheduler_start(SessionLocal)), asyncio.create_task(settings.poll(SessionLocal))]
+    try:
+        yield
+    finally:
+        for t in background:
+            t.cancel()
+        sampler.configure(0)
+        ocr.pool.shutdown()
+        await database.dispose()
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Manga Suite API", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[os.getenv("BACKEND_CORS","http://localhost:3000")],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # added last so it wraps CORS too and sees every request
+    app.add_middleware(metrics.MetricsMiddleware, on_done=sampler.on_done)
+    app.include_router(oauth_router, prefix="/auth", tags=["auth"])
+    app.include_router(root)
+    app.include_router(api)
+    return app
+
+app = create_app()
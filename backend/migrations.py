@@ -0,0 +1,176 @@
+import os, sys, datetime as dt
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, insert, text
+from sqlalchemy.schema import CreateIndex
+
+# Ordered schema migrations, applied once each and recorded in schema_migrations.
+# Run by the app's lifespan (AUTO_MIGRATE=1, the default) or explicitly: python migrations.py
+# Steps are written to be idempotent so a database created by the old create_all-at-import
+# (any age) and a fresh one converge on the same schema.
+
+_meta = MetaData()
+versions = Table("schema_migrations", _meta,
+                 Column("version", Integer, primary_key=True),
+                 Column("name", String(120)),
+                 Column("applied_at", DateTime))
+
+def _columns(conn, table: str) -> dict:
+    return {c["name"]: c for c in inspect(conn).get_columns(table)}
+
+def _indexes(conn, table: str) -> set:
+    return {i["name"] for i in inspect(conn).get_indexes(table)}
+
+def _create_tables(conn):
+    # every table the models know about; existing ones are left alone
+    from models import Base
+    Base.metadata.create_all(conn)
+
+def _task_upload_status(conn):
+    if "upload_status" not in _columns(conn, "tasks"):
+        conn.execute(text("ALTER TABLE tasks ADD COLUMN upload_status VARCHAR(20)"))
+
+STEP3_INDEXES = {"ix_tasks_created_id", "ix_tasks_status_created_id", "ix_tasks_assignee_created_id",
+                 "ix_tasks_due_open", "ix_works_name_lower"}
+
+def _task_indexes(conn):
+    from models import Task, Work
+    # superseded: the plain assignee index by (assignee, created_at, id), the work/chapter one by the unique index
+    for old in ("ix_tasks_assignee_discord_id", "ix_tasks_work_chapter"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {old}"))
+    # IF NOT EXISTS rather than checkfirst: reflection can't see expression indexes on sqlite.
+    # Only the indexes that existed at this version: later ones are on columns later steps add
+    for ix in list(Task.__table__.indexes) + list(Work.__table__.indexes):
+        if ix.name in STEP3_INDEXES:
+            conn.execute(CreateIndex(ix, if_not_exists=True))
+
+def _task_events_nullable_task(conn):
+    # work_done events carry no task
+    if "task_events" not in inspect(conn).get_table_names() or _columns(conn, "task_events")["task_id"]["nullable"]:
+        return
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE task_events ALTER COLUMN task_id DROP NOT NULL"))
+        return
+    # sqlite can't drop a NOT NULL: rebuild the table from the model and copy the rows over
+    from models import TaskEvent
+    conn.execute(text("ALTER TABLE task_events RENAME TO task_events_old"))
+    for ix in _indexes(conn, "task_events_old"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {ix}"))
+    TaskEvent.__table__.create(conn)
+    cols = ", ".join(c.name for c in TaskEvent.__table__.columns)
+    conn.execute(text(f"INSERT INTO task_events ({cols}) SELECT {cols} FROM task_events_old"))
+    conn.execute(text("DROP TABLE task_events_old"))
+
+def _member_work_roles_backfill(conn):
+    # open counts for members who had tasks before the table existed
+    from sqlalchemy.orm import Session
+    from services import counters
+    from models import MemberWorkRole
+    with Session(bind=conn) as db:
+        if db.scalar(select(MemberWorkRole.work_id).limit(1)) is None:
+            counters.rebuild(db)
+            db.flush()
+
+def _tasks_archive(conn):
+    from models import ArchivedTask
+    ArchivedTask.__table__.create(conn, checkfirst=True)
+
+def _task_manifest_id(conn):
+    # Task.link used to be the bearer-only JSON manifest URL; keep the id in its own column and
+    # point link at the signed, browsable view
+    from services import blobs
+    tables = inspect(conn).get_table_names()
+    for table in ("tasks", "tasks_archive"):
+        if table in tables and "manifest_id" not in _columns(conn, table):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN manifest_id INTEGER"))
+        rows = conn.execute(text(f"SELECT id, link FROM {table} WHERE link LIKE '%/api/manifests/%'")).all()
+        for task_id, link in rows:
+            manifest_id = link.rstrip("/").rsplit("/", 1)[-1]
+            if manifest_id.isdigit():
+                conn.execute(text(f"UPDATE {table} SET manifest_id = :m, link = :link WHERE id = :id"),
+                             {"m": int(manifest_id), "link": blobs.view_link(int(manifest_id)), "id": task_id})
+
+def _task_finished_at(conn):
+    # archiving goes by when a task finished, not when it was created; older rows take the time of
+    # their last review, or created_at if the review predates task_events
+    from models import Task
+    tables = inspect(conn).get_table_names()
+    for table in ("tasks", "tasks_archive"):
+        if table not in tables:
+            continue
+        if "finished_at" not in _columns(conn, table):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN finished_at TIMESTAMP"))
+        conn.execute(text(
+            f"UPDATE {table} SET finished_at = COALESCE((SELECT MAX(e.created_at) FROM task_events e "
+            f"WHERE e.task_id = {table}.id AND e.kind = 'reviewed'), created_at) "
+            f"WHERE finished_at IS NULL AND status IN ('accepted', 'rejected')"))
+    for ix in Task.__table__.indexes:
+        if ix.name == "ix_tasks_finished":
+            conn.execute(CreateIndex(ix, if_not_exists=True))
+
+def _task_stage(conn):
+    # uniqueness used to be on (work, chapter, type). Old data breaks it: every task was created
+    # untyped and /submit filled the type in, so a reassigned chapter has two rows of the same type.
+    # It now keys on stage, set only at creation; existing rows keep stage NULL and stay unconstrained
+    from models import Task, ArchivedTask
+    tables = inspect(conn).get_table_names()
+    conn.execute(text("DROP INDEX IF EXISTS ux_tasks_work_chapter_type"))
+    conn.execute(text("DROP INDEX IF EXISTS ux_tasks_archive_work_chapter_type"))
+    for model in (Task, ArchivedTask):
+        table = model.__tablename__
+        if table not in tables:
+            continue
+        if "stage" not in _columns(conn, table):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN stage VARCHAR(20)"))
+        for ix in model.__table__.indexes:
+            if ix.name.endswith("_work_chapter_stage"):
+                conn.execute(CreateIndex(ix, if_not_exists=True))
+
+def _counters_backfill(conn):
+    # step 5 only looked at member_work_roles; a database whose counters table is empty while it
+    # has tasks (it used to be filled lazily by the first /admin/summary) is counted here
+    from sqlalchemy.orm import Session
+    from services import counters
+    from models import Task, ArchivedTask, TaskStatusCounter
+    with Session(bind=conn) as db:
+        if db.scalar(select(TaskStatusCounter.status).limit(1)) is not None:
+            return
+        if db.scalar(select(Task.id).limit(1)) is None and db.scalar(select(ArchivedTask.id).limit(1)) is None:
+            return
+        counters.rebuild(db)
+        db.flush()
+
+MIGRATIONS = [
+    (1, "create missing tables", _create_tables),
+    (2, "tasks.upload_status", _task_upload_status),
+    (3, "task and work indexes", _task_indexes),
+    (4, "task_events.task_id nullable", _task_events_nullable_task),
+    (5, "backfill counters and member open counts", _member_work_roles_backfill),
+    (6, "tasks_archive", _tasks_archive),
+    (7, "tasks.manifest_id", _task_manifest_id),
+    (8, "tasks.finished_at", _task_finished_at),
+    (9, "tasks.stage", _task_stage),
+    (10, "backfill empty counters", _counters_backfill),
+]
+
+def pending(conn) -> list[tuple]:
+    versions.create(conn, checkfirst=True)
+    done = set(conn.scalars(select(versions.c.version)))
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+def migrate(engine) -> list[int]:
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # several workers booting at once: one migrates, the others wait and then skip
+                conn.execute(text("SELECT pg_advisory_xact_lock(7412001)"))
+            if version not in {v for v, _, _ in pending(conn)}:
+                continue
+            fn(conn)
+            conn.execute(insert(versions).values(version=version, name=name, applied_at=dt.datetime.utcnow()))
+            applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import db
+    print("applied:", migrate(db.engine) or "nothing, schema is current")
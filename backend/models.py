@@ -1,7 +1,7 @@
 
 import datetime as dt
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Text, Boolean
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Text, Boolean, Index, UniqueConstraint, func
 
 class Base(DeclarativeBase):
     pass
@@ -24,19 +24,181 @@ class Work(Base):
     name: Mapped[str] = mapped_column(String(120), unique=True)
     role_name: Mapped[str] = mapped_column(String(120))
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    __table_args__ = (
+        # case-insensitive name lookups (create_work, /works/by-name) hit this instead of scanning
+        Index("ix_works_name_lower", func.lower(name), unique=True),
+    )
 
 class Task(Base):
     __tablename__ = "tasks"
     id: Mapped[int] = mapped_column(primary_key=True)
     work_id: Mapped[int] = mapped_column(ForeignKey("works.id"))
     chapter_number: Mapped[int] = mapped_column(Integer)
-    assignee_discord_id: Mapped[str] = mapped_column(String(40), nullable=True, index=True)
+    assignee_discord_id: Mapped[str] = mapped_column(String(40), nullable=True)
     status: Mapped[str] = mapped_column(String(30), default="open") # open/assigned/in_progress/submitted/accepted/rejected/changes_requested/overdue
     type: Mapped[str] = mapped_column(String(20), nullable=True)   # ترجمة/تحرير
+    # the type the task was created for; fixed from then on (submit rewrites type), NULL when created untyped
+    stage: Mapped[str] = mapped_column(String(20), nullable=True)
     link: Mapped[str] = mapped_column(Text, nullable=True)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
     due_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=True)
     review_note: Mapped[str] = mapped_column(Text, nullable=True)
+    upload_status: Mapped[str] = mapped_column(String(20), nullable=True) # pending/uploading/done/failed
+    manifest_id: Mapped[int] = mapped_column(Integer, nullable=True)  # deduplicated submissions; link is its browsable view
+    finished_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=True)  # when it became accepted/rejected
+    __table_args__ = (
+        # keyset pagination of /api/tasks walks (created_at, id) DESC, optionally behind an equality filter
+        Index("ix_tasks_created_id", created_at, id),
+        Index("ix_tasks_status_created_id", status, created_at, id),
+        Index("ix_tasks_assignee_created_id", assignee_discord_id, created_at, id),
+        # one task per chapter and stage; bulk assignment relies on it to skip chapters that already exist.
+        # Untyped tasks are not covered: a translator and an editor can both hold the same chapter
+        Index("ux_tasks_work_chapter_stage", work_id, chapter_number, stage, unique=True,
+              postgresql_where=stage.isnot(None), sqlite_where=stage.isnot(None)),
+        # overdue sweep / next-wakeup lookups only ever look at tasks that are still running
+        Index("ix_tasks_due_open", due_at,
+              postgresql_where=status.in_(("assigned", "in_progress")),
+              sqlite_where=status.in_(("assigned", "in_progress"))),
+        # the archive pass looks for finished tasks by when they finished
+        Index("ix_tasks_finished", finished_at,
+              postgresql_where=status.in_(("accepted", "rejected")),
+              sqlite_where=status.in_(("accepted", "rejected"))),
+    )
+
+class ArchivedTask(Base):
+    # accepted/rejected tasks moved out of `tasks` once finished longer ago than the archive window (services/archive.py);
+    # same columns and ids, so listings can union the two
+    __tablename__ = "tasks_archive"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    work_id: Mapped[int] = mapped_column(Integer)
+    chapter_number: Mapped[int] = mapped_column(Integer)
+    assignee_discord_id: Mapped[str] = mapped_column(String(40), nullable=True)
+    status: Mapped[str] = mapped_column(String(30))
+    type: Mapped[str] = mapped_column(String(20), nullable=True)
+    stage: Mapped[str] = mapped_column(String(20), nullable=True)
+    link: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime)
+    due_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=True)
+    review_note: Mapped[str] = mapped_column(Text, nullable=True)
+    upload_status: Mapped[str] = mapped_column(String(20), nullable=True)
+    manifest_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    finished_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=True)
+    archived_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    __table_args__ = (
+        Index("ix_tasks_archive_created_id", created_at, id),
+        Index("ix_tasks_archive_assignee_created_id", assignee_discord_id, created_at, id),
+        # bulk assignment checks it so an archived chapter isn't handed out again
+        Index("ux_tasks_archive_work_chapter_stage", work_id, chapter_number, stage, unique=True,
+              postgresql_where=stage.isnot(None), sqlite_where=stage.isnot(None)),
+    )
+
+class TaskStatusCounter(Base):
+    # materialized COUNT(*) per status; scope is global / work / assignee (scope_id "" for global)
+    __tablename__ = "task_status_counters"
+    scope: Mapped[str] = mapped_column(String(10), primary_key=True)
+    scope_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    status: Mapped[str] = mapped_column(String(30), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+class MemberWorkRole(Base):
+    # open tasks per (member, work); role_held stays true until the bot confirms it removed the work role
+    __tablename__ = "member_work_roles"
+    assignee_discord_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    work_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    open_count: Mapped[int] = mapped_column(Integer, default=0)
+    role_held: Mapped[bool] = mapped_column(Boolean, default=True)
+    changed_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    __table_args__ = (
+        # /api/roles/to-remove only ever reads the (small) set of members who finished a work
+        Index("ix_member_work_roles_done", work_id, assignee_discord_id,
+              postgresql_where=(open_count == 0) & role_held,
+              sqlite_where=(open_count == 0) & role_held),
+    )
+
+class TaskEvent(Base):
+    # append-only feed; consumers resume from the last id they saw
+    __tablename__ = "task_events"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(30))  # overdue/submitted/reviewed/reassigned/uploaded/upload_failed/work_done
+    task_id: Mapped[int] = mapped_column(Integer, nullable=True)  # null for member-level events (work_done)
+    work_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    assignee_discord_id: Mapped[str] = mapped_column(String(40), nullable=True)
+    detail: Mapped[str] = mapped_column(String(200), nullable=True)  # review action / previous assignee
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+
+class Blob(Base):
+    # content-addressed store for submitted files / archive pages
+    __tablename__ = "blobs"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(Integer)
+    location: Mapped[str] = mapped_column(Text)  # uploader link
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+
+class Manifest(Base):
+    # one per submission: which blobs make up the file; Task.manifest_id points here
+    __tablename__ = "manifests"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(Integer, index=True)
+    filename: Mapped[str] = mapped_column(String(255))
+    path: Mapped[str] = mapped_column(String(255))  # Work/Chapter N/type
+    entries: Mapped[str] = mapped_column(Text)  # JSON [[name, sha256, size], ...]
+    total_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    new_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+
+class PageResult(Base):
+    # batch OCR/translation output saved against a task so reviewers don't recompute it
+    __tablename__ = "page_results"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(Integer)
+    lang: Mapped[str] = mapped_column(String(10))
+    page: Mapped[int] = mapped_column(Integer)
+    name: Mapped[str] = mapped_column(String(255))
+    ocr_text: Mapped[str] = mapped_column(Text, nullable=True)
+    translation: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    __table_args__ = (Index("ix_page_results_task_lang_page", task_id, lang, page),)
+
+class AiCacheEntry(Base):
+    # second tier behind the in-memory LRU in services.ai (AI_CACHE_DB=1)
+    __tablename__ = "ai_cache"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(Text)
+    expires_at: Mapped[dt.datetime] = mapped_column(DateTime, index=True)
+
+class LedgerEntry(Base):
+    # append-only; the unique (task_id, event) makes a repeated accept a no-op instead of a second payment
+    __tablename__ = "ledger"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_discord_id: Mapped[str] = mapped_column(String(40), index=True)
+    task_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    work_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    event: Mapped[str] = mapped_column(String(20))  # accept/bonus/adjust
+    points: Mapped[int] = mapped_column(Integer, default=0)
+    amount_cents: Mapped[int] = mapped_column(Integer, default=0)
+    month: Mapped[str] = mapped_column(String(7))  # YYYY-MM
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    __table_args__ = (UniqueConstraint("task_id", "event", name="uq_ledger_task_event"),)
+
+class MonthlyRollup(Base):
+    # per-user monthly totals kept in the same transaction as the ledger entry
+    __tablename__ = "monthly_rollups"
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    user_discord_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    chapters: Mapped[int] = mapped_column(Integer, default=0)
+    points: Mapped[int] = mapped_column(Integer, default=0)
+    amount_cents: Mapped[int] = mapped_column(Integer, default=0)
+    __table_args__ = (Index("ix_monthly_rollups_month_points", month, points),)
+
+class WorkRollup(Base):
+    # same totals split by work, for per-work rankings and the evaluation breakdown
+    __tablename__ = "work_rollups"
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    work_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_discord_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    chapters: Mapped[int] = mapped_column(Integer, default=0)
+    points: Mapped[int] = mapped_column(Integer, default=0)
+    __table_args__ = (Index("ix_work_rollups_user_month", user_discord_id, month),)
 
 class Transaction(Base):
     __tablename__ = "transactions"
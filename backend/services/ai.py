@@ -1,36 +1,180 @@
 
-import os, io, asyncio
+import os, re, time, asyncio, hashlib, datetime as dt
 from typing import Optional
-try:
-    import pytesseract
-    from PIL import Image
-except Exception:
-    pytesseract = None
-    Image = None
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from models import AiCacheEntry
+from db import AsyncSessionLocal
+from services import ocr, metrics
+from services.cache import TTLCache
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE","2048"))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL","86400"))
+AI_CACHE_DB = os.getenv("AI_CACHE_DB","0") == "1"
+# per provider: concurrent calls, sustained calls/sec, burst
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY","4"))
+AI_RATE = float(os.getenv("AI_RATE_PER_SEC","2"))
+AI_BURST = int(os.getenv("AI_BURST","5"))
 
-async def ai_chat(prompt: str, lang: str="ar") -> str:
-    # Minimal adapter that prefers DeepSeek then OpenAI; falls back to a stub if none.
+_WS = re.compile(r"[^\S\n]+")
+
+def provider() -> str:
+    # DeepSeek preferred, then OpenAI, else the local stub
     if DEEPSEEK_API_KEY:
+        return "deepseek"
+    if OPENAI_API_KEY:
+        return "openai"
+    return "local"
+
+def normalize(prompt: str) -> str:
+    # cache key only: "  BOOM!!\n" and "BOOM!!" are the same SFX. Line breaks count, since
+    # a batch of dialogue lines is not the same request as those lines run together
+    return "\n".join(_WS.sub(" ", line).strip() for line in prompt.strip().splitlines())
+
+def cache_key(kind: str, lang: str, prov: str, payload: bytes | str) -> str:
+    h = hashlib.sha256(payload if isinstance(payload, bytes) else payload.encode()).hexdigest()
+    return hashlib.sha256(f"{kind}|{prov}|{lang}|{h}".encode()).hexdigest()
+
+class _Bucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.at) * self.rate)
+                self.at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class _Limiter:
+    def __init__(self):
+        self.sem = asyncio.Semaphore(AI_CONCURRENCY)
+        self.bucket = _Bucket(AI_RATE, AI_BURST)
+        self.calls = 0
+
+_limiters: dict[str, _Limiter] = {}
+memory = TTLCache(maxsize=AI_CACHE_SIZE, ttl=AI_CACHE_TTL)
+_inflight: dict[str, asyncio.Future] = {}
+_stats = {"requests": 0, "db_hits": 0, "db_misses": 0, "coalesced": 0}
+_db_writes = 0
+
+provider_seconds = metrics.Histogram("ai_provider_duration_seconds", "Provider call time", ("provider", "kind"))
+limiter_wait = metrics.Histogram("ai_limiter_wait_seconds", "Time waiting for a provider slot or token", ("provider",))
+metrics.Counter("ai_requests_total", "AI requests", fn=lambda: _stats["requests"])
+metrics.Counter("ai_cache_hits_total", "AI requests served without a provider call of their own", ("source",),
+                fn=lambda: {("memory",): memory.hits, ("db",): _stats["db_hits"], ("coalesced",): _stats["coalesced"]})
+metrics.Counter("ai_provider_calls_total", "Provider calls", ("provider",), fn=lambda: {(k,): v.calls for k, v in _limiters.items()})
+metrics.Gauge("ai_inflight", "Distinct AI requests waiting on a provider", fn=lambda: len(_inflight))
+metrics.Gauge("ai_cache_entries", "Entries in the in-memory AI cache", fn=lambda: len(memory))
+
+async def _db_get(key: str) -> Optional[str]:
+    async with AsyncSessionLocal() as db:
+        row = await db.get(AiCacheEntry, key)
+        if row and row.expires_at > dt.datetime.utcnow():
+            return row.value
+    return None
+
+async def _db_set(key: str, value: str):
+    global _db_writes
+    async with AsyncSessionLocal() as db:
+        await db.merge(AiCacheEntry(key=key, value=value,
+                                    expires_at=dt.datetime.utcnow() + dt.timedelta(seconds=AI_CACHE_TTL)))
+        _db_writes += 1
+        if _db_writes % 100 == 0:
+            await db.execute(delete(AiCacheEntry).where(AiCacheEntry.expires_at < dt.datetime.utcnow()))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # another worker stored the same key first; its value is just as good
+            await db.rollback()
+
+async def _limited(prov: str, fn, *args) -> str:
+    lim = _limiters.get(prov)
+    if lim is None:
+        lim = _limiters[prov] = _Limiter()
+    start = time.perf_counter()
+    async with lim.sem:
+        if prov != "local":
+            await lim.bucket.take()
+        lim.calls += 1
+        now = time.perf_counter()
+        limiter_wait.observe(prov, value=now - start)
+        try:
+            return await fn(*args)
+        finally:
+            provider_seconds.observe(prov, fn.__name__.strip("_"), value=time.perf_counter() - now)
+
+async def cached(key: str, compute) -> str:
+    # memory -> db -> one in-flight provider call shared by every identical request
+    _stats["requests"] += 1
+    hit = memory.get(key)
+    if hit is not None:
+        return hit
+    fut = _inflight.get(key)
+    if fut is not None:
+        _stats["coalesced"] += 1
+        return await asyncio.shield(fut)
+    fut = _inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        value = await _db_get(key) if AI_CACHE_DB else None
+        if AI_CACHE_DB:
+            _stats["db_hits" if value is not None else "db_misses"] += 1
+        if value is None:
+            value = await compute()
+            if AI_CACHE_DB:
+                await _db_set(key, value)
+        memory.set(key, value)
+        fut.set_result(value)
+        return value
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()  # mark retrieved when nobody else was waiting
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+def stats() -> dict:
+    # hit_rate: share of requests answered without a provider call of their own
+    served = memory.hits + _stats["db_hits"] + _stats["coalesced"]
+    return {"memory": memory.stats(), "db": AI_CACHE_DB, **_stats, "inflight": len(_inflight),
+            "hit_rate": round(served / _stats["requests"], 4) if _stats["requests"] else 0.0,
+            "provider_calls": {k: v.calls for k, v in _limiters.items()}}
+
+async def _chat(prov: str, prompt: str, lang: str) -> str:
+    if prov == "deepseek":
         # pseudo-call
         return f"[DeepSeek:{lang}] {prompt[:400]}"
-    if OPENAI_API_KEY:
+    if prov == "openai":
         return f"[OpenAI:{lang}] {prompt[:400]}"
-    # fallback
     return f"[Local:{lang}] {prompt[:400]} (نموذج محلي تجريبي)"
 
-async def ai_image_ocr_then_translate(image_bytes: bytes, lang: str="ar") -> str:
-    text = ""
-    if pytesseract and Image:
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            text = pytesseract.image_to_string(img)
-        except Exception:
-            text = ""
-    if DEEPSEEK_API_KEY:
+async def _image(prov: str, text: str, lang: str) -> str:
+    if prov == "deepseek":
         return f"[DeepSeek OCR→{lang}] {text[:500]}"
-    if OPENAI_API_KEY:
+    if prov == "openai":
         return f"[OpenAI OCR→{lang}] {text[:500]}"
     return f"[Local OCR→{lang}] {text[:500]}"
+
+async def ai_chat(prompt: str, lang: str="ar") -> str:
+    # the provider gets the prompt as written; only the key is normalized
+    prov = provider()
+    return await cached(cache_key("chat", lang, prov, normalize(prompt)), lambda: _limited(prov, _chat, prov, prompt, lang))
+
+async def ai_image_ocr_then_translate(image_bytes: bytes, lang: str="ar") -> str:
+    # keyed on the image bytes so a re-run page skips OCR too;
+    # OcrBusy / OcrTimeout propagate so the API can answer 503 / 504
+    prov = provider()
+    async def run():
+        # OCR runs outside the provider limiter; only the provider call is rate limited
+        return await _limited(prov, _image, prov, await ocr.pool.run(image_bytes), lang)
+    return await cached(cache_key("image", lang, prov, image_bytes), run)
@@ -0,0 +1,51 @@
+import os, datetime as dt
+from sqlalchemy import select, insert, delete, literal, DateTime
+from sqlalchemy.orm import Session
+from models import Task, ArchivedTask as A
+from services import settings
+
+# Hot/cold split of the tasks table: accepted/rejected tasks that finished more than archive_after_days
+# ago move to tasks_archive in short batches (one transaction each), so listings, counts and the
+# overdue sweep only ever walk live work. Counters and the ledger are untouched: archived tasks
+# still count in summaries, payouts and the leaderboard.
+
+TERMINAL = ("accepted", "rejected")
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH","5000"))
+ARCHIVE_MAX_BATCHES = int(os.getenv("ARCHIVE_MAX_BATCHES","20"))  # per scheduler pass; the rest waits for the next one
+
+COLUMNS = [c.name for c in Task.__table__.columns]
+
+def archive_batch(db: Session, cutoff: dt.datetime, limit: int, now: dt.datetime) -> int:
+    ids = db.scalars(select(Task.id).where(Task.status.in_(TERMINAL), Task.finished_at < cutoff)
+                     .limit(limit).with_for_update(skip_locked=True)).all()
+    if not ids:
+        return 0
+    db.execute(insert(A).from_select(COLUMNS + ["archived_at"],
+                                     select(*Task.__table__.columns, literal(now, DateTime)).where(Task.id.in_(ids))))
+    db.execute(delete(Task).where(Task.id.in_(ids)).execution_options(synchronize_session=False))
+    return len(ids)
+
+def run(session_maker, now: dt.datetime | None = None, batch: int = ARCHIVE_BATCH,
+        max_batches: int = ARCHIVE_MAX_BATCHES) -> int:
+    days = settings.get("archive_after_days")
+    if days <= 0:
+        return 0
+    now = now or dt.datetime.utcnow()
+    cutoff = now - dt.timedelta(days=days)
+    total = 0
+    for _ in range(max_batches):
+        with session_maker() as db:
+            n = archive_batch(db, cutoff, batch, now)
+            db.commit()
+        total += n
+        if n < batch:
+            break
+    return total
+
+def chapter_archived(db: Session, work_id: int, chapters: list[int], stage: str | None) -> set[int]:
+    # chapters of this work/stage that were done and archived; assignment must not hand them out again.
+    # Untyped tasks have no stage and, like in tasks, never conflict
+    if not chapters or stage is None:
+        return set()
+    return set(db.scalars(select(A.chapter_number).where(
+        A.work_id == work_id, A.chapter_number.in_(chapters), A.stage == stage)))
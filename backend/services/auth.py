@@ -1,31 +1,97 @@
 
-import os, time, base64, json, httpx
+import os, time, hmac, base64, json, hashlib
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, APIRouter
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 from sqlalchemy import select
 from models import User
-from main import SessionLocal
+from db import AsyncSessionLocal
+from services.cache import TTLCache
+from services import metrics
 
 security = HTTPBearer()
 oauth_router = APIRouter()
 
 # This is a minimal OAuth flow suitable for admin-only dashboard.
-# Frontend exchanges code -> backend -> Discord user info -> JWT-like simple token (signed).
-SECRET = os.getenv("DISCORD_OAUTH_CLIENT_SECRET","devsecret")
+# Frontend exchanges code -> backend -> Discord user info -> compact HMAC-signed token.
+# The bot shares API_TOKEN_SECRET and mints tokens for the members it acts for, marked iss="bot".
+SECRET = os.getenv("API_TOKEN_SECRET", os.getenv("DISCORD_OAUTH_CLIENT_SECRET","devsecret")).encode()
+TOKEN_TTL = int(os.getenv("TOKEN_TTL_SECONDS", str(7*24*3600)))
+ADMIN_ROLES = ("admin", "owner")
+
+# verified token -> (discord_id, claimed role, exp, issuer); discord_id -> role from users (None: no row)
+_tokens = TTLCache(maxsize=10000, ttl=float(os.getenv("TOKEN_CACHE_TTL","300")))
+_roles = TTLCache(maxsize=10000, ttl=float(os.getenv("ROLE_CACHE_TTL","60")))
+
+unsign_seconds = metrics.Histogram("auth_token_decode_seconds", "HMAC check + decode of uncached tokens",
+                                   buckets=(.00001, .00005, .0001, .0005, .001, .005))
+metrics.Counter("auth_cache_lookups_total", "Token/role cache lookups", ("cache", "result"),
+                fn=lambda: {("token", "hit"): _tokens.hits, ("token", "miss"): _tokens.misses,
+                            ("role", "hit"): _roles.hits, ("role", "miss"): _roles.misses})
+
+@dataclass(frozen=True)
+class Principal:
+    discord_id: str
+    role: str
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role in ADMIN_ROLES
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _mac(body: str) -> str:
+    return _b64(hmac.new(SECRET, body.encode(), hashlib.sha256).digest())
 
 def sign(payload: dict) -> str:
-    data = json.dumps(payload).encode()
-    sig = base64.urlsafe_b64encode(data).decode()
-    return sig
+    payload = {"exp": int(time.time()) + TOKEN_TTL, **payload}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_mac(body)}"
 
 def unsign(token: str) -> dict:
+    body, _, sig = token.partition(".")
+    if not sig or not hmac.compare_digest(sig, _mac(body)):
+        raise HTTPException(401, "Bad token")
     try:
-        data = base64.urlsafe_b64decode(token.encode())
-        return json.loads(data.decode())
+        data = json.loads(_unb64(body))
     except Exception:
         raise HTTPException(401, "Bad token")
+    if data.get("exp", 0) < time.time():
+        raise HTTPException(401, "Token expired")
+    return data
+
+def verify(token: str) -> tuple[str, str, str | None]:
+    hit = _tokens.get(token)
+    if hit is None:
+        with unsign_seconds.time():
+            data = unsign(token)
+        hit = (str(data["discord_id"]), data.get("role", "member"), data["exp"], data.get("iss"))
+        _tokens.set(token, hit)
+    elif hit[2] < time.time():
+        _tokens.pop(token)
+        raise HTTPException(401, "Token expired")
+    return hit[0], hit[1], hit[3]
+
+async def resolve_role(discord_id: str, claimed: str, issuer: str | None = None) -> str:
+    # Bot-minted tokens carry the member's live Discord roles, checked by the bot on every
+    # interaction: their claim wins (a dashboard login's "member" row must not demote a Discord
+    # admin). For dashboard tokens users.role wins, so demotions apply without re-issuing tokens.
+    if issuer == "bot":
+        return claimed
+    role = _roles.get(discord_id, False)
+    if role is False:
+        async with AsyncSessionLocal() as db:
+            role = await db.scalar(select(User.role).where(User.discord_id==discord_id))
+        _roles.set(discord_id, role)
+    return role or claimed
+
+def invalidate_user(discord_id: str):
+    _roles.pop(str(discord_id))
 
 class TokenResponse(BaseModel):
     token: str
@@ -36,19 +102,21 @@ async def oauth_callback(code: str):
     # Here we mock by treating code as discord_id for simplicity of demo.
     discord_id = code
     username = f"user_{code[-4:]}" if len(code) >= 4 else f"user_{code}"
-    with SessionLocal() as db:
-        u = db.scalar(select(User).where(User.discord_id==discord_id))
+    async with AsyncSessionLocal() as db:
+        u = await db.scalar(select(User).where(User.discord_id==discord_id))
         if not u:
             u = User(discord_id=discord_id, username=username, role="admin" if os.getenv("ADMIN_MOCK","0")=="1" else "member")
-            db.add(u); db.commit()
-    token = sign({"discord_id": discord_id, "role": u.role, "ts": int(time.time())})
+            db.add(u); await db.commit()
+        role = u.role
+    invalidate_user(discord_id)
+    token = sign({"discord_id": discord_id, "role": role})
     return {"token": token}
 
-def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)):
-    data = unsign(token.credentials)
-    return data
+async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    discord_id, claimed, issuer = verify(token.credentials)
+    return Principal(discord_id, await resolve_role(discord_id, claimed, issuer))
 
-def admin_required(user=Depends(get_current_user)):
-    if user.get("role") not in ("admin", "owner"):
+def admin_required(user: Principal = Depends(get_current_user)):
+    if not user.is_admin:
         raise HTTPException(403, "Admins only")
     return user
@@ -0,0 +1,97 @@
+
+import os, re, json, asyncio, zipfile
+from sqlalchemy import delete
+from models import PageResult
+from services import ocr
+from services.ai import ai_chat
+
+# Whole-chapter OCR + translation: pages are OCR'd in parallel on the OCR pool, their text
+# packed into as few ai_chat calls as fit AI_CONTEXT_CHARS, and results streamed as NDJSON.
+
+AI_CONTEXT_CHARS = int(os.getenv("AI_CONTEXT_CHARS","12000"))
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")
+ARCHIVE_EXTS = (".zip", ".cbz")
+MARKER = "[[page {}]]"
+_MARKER_RE = re.compile(r"\[\[page (\d+)\]\]")
+
+def pages_from_archive(fileobj):
+    # lazily yields (name, read_fn) so only pages in flight are held in memory
+    z = zipfile.ZipFile(fileobj)
+    for info in sorted(z.infolist(), key=lambda i: i.filename):
+        if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTS):
+            yield info.filename, (lambda info=info: z.read(info))
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_EXTS)
+
+def pack(pages: list[dict], limit: int = AI_CONTEXT_CHARS) -> list[list[dict]]:
+    # greedy, order-preserving; a single oversized page gets its own (truncated by the provider) batch
+    batches, cur, size = [], [], 0
+    for p in pages:
+        block = len(MARKER.format(p["page"])) + len(p["text"]) + 1
+        if cur and size + block > limit:
+            batches.append(cur); cur, size = [], 0
+        cur.append(p); size += block
+    if cur:
+        batches.append(cur)
+    return batches
+
+def split_reply(reply: str, batch: list[dict]) -> dict[int, str]:
+    parts = _MARKER_RE.split(reply)
+    out = {int(parts[i]): parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+    if not out and len(batch) == 1:
+        out[batch[0]["page"]] = reply.strip()
+    return out
+
+async def _ocr(page: int, name: str, read, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        data = await asyncio.to_thread(read)
+        while True:
+            try:
+                text = await ocr.pool.run(data)
+                break
+            except ocr.OcrCrashed:
+                text = ""
+                break
+            except ocr.OcrBusy:
+                # the pool is shared with /ai/image; wait for room instead of failing the chapter
+                await asyncio.sleep(0.5)
+            except ocr.OcrTimeout:
+                text = ""
+                break
+    return {"page": page, "name": name, "text": text}
+
+async def run(pages, lang: str, task_id: int | None, session_maker):
+    # pages: iterable of (name, read_fn); yields NDJSON lines
+    sem = asyncio.Semaphore(max(1, ocr.pool.workers))
+    results: dict[int, dict] = {}
+    tasks = [asyncio.create_task(_ocr(i, name, read, sem)) for i, (name, read) in enumerate(pages, 1)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            r = await fut
+            results[r["page"]] = r
+            yield json.dumps({"type": "ocr", **r}, ensure_ascii=False) + "\n"
+    finally:
+        # client went away or a page failed: don't leave OCR jobs queued behind us
+        for t in tasks:
+            t.cancel()
+
+    ordered = [results[k] for k in sorted(results)]
+    batches = pack(ordered)
+    async def translate(batch):
+        prompt = "\n".join(f"{MARKER.format(p['page'])}\n{p['text']}" for p in batch)
+        return batch, split_reply(await ai_chat(prompt, lang), batch)
+    translations: dict[int, str] = {}
+    for fut in asyncio.as_completed([translate(b) for b in batches]):
+        batch, parts = await fut
+        for p in batch:
+            translations[p["page"]] = parts.get(p["page"], "")
+            yield json.dumps({"type": "translation", "page": p["page"], "text": translations[p["page"]]}, ensure_ascii=False) + "\n"
+
+    if task_id is not None:
+        async with session_maker() as db:
+            await db.execute(delete(PageResult).where(PageResult.task_id==task_id, PageResult.lang==lang))
+            db.add_all(PageResult(task_id=task_id, lang=lang, page=p["page"], name=p["name"], ocr_text=p["text"],
+                                  translation=translations.get(p["page"])) for p in ordered)
+            await db.commit()
+    yield json.dumps({"type": "done", "pages": len(ordered), "calls": len(batches), "task_id": task_id}) + "\n"
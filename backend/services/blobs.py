@@ -0,0 +1,87 @@
+
+import os, hmac, html, json, hashlib, zipfile
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Blob, Manifest
+from services.drive import get_uploader, CHUNK_SIZE
+from services import auth
+
+# Files are split into content-addressed blobs: the whole file, or each page of a zip/cbz.
+# Only blobs the store has never seen are uploaded, so a revision that touches a few pages
+# uploads just those pages; the Manifest lists every blob (Task.manifest_id) and Task.link is a
+# signed view of it that opens from Discord without a token.
+
+PUBLIC_API_BASE = os.getenv("PUBLIC_API_BASE","http://localhost:8000")
+ARCHIVE_EXTS = (".zip", ".cbz")
+
+def _sha256(fileobj) -> tuple[str, int]:
+    h, size = hashlib.sha256(), 0
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        h.update(chunk); size += len(chunk)
+    return h.hexdigest(), size
+
+def _put(db: Session, sha: str, size: int, open_fn) -> int:
+    # returns bytes uploaded (0 when the blob already exists)
+    if db.get(Blob, sha) is not None:
+        return 0
+    up = get_uploader()
+    with open_fn() as f:
+        location = up.upload(up.folder("blobs", sha[:2]), sha, f)
+    try:
+        with db.begin_nested():
+            db.add(Blob(sha256=sha, size=size, location=location))
+    except IntegrityError:
+        # a concurrent submission stored the same content first
+        pass
+    return size
+
+def store(db: Session, task_id: int, path_label: str, filename: str, path: str) -> Manifest:
+    entries, new_bytes = [], 0
+    if filename.lower().endswith(ARCHIVE_EXTS) and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                with z.open(info) as f:
+                    sha, size = _sha256(f)
+                new_bytes += _put(db, sha, size, lambda info=info: z.open(info))
+                entries.append([info.filename, sha, size])
+    else:
+        with open(path, "rb") as f:
+            sha, size = _sha256(f)
+        new_bytes += _put(db, sha, size, lambda: open(path, "rb"))
+        entries.append([filename, sha, size])
+    m = Manifest(task_id=task_id, filename=filename, path=path_label, entries=json.dumps(entries, ensure_ascii=False),
+                 total_bytes=sum(e[2] for e in entries), new_bytes=new_bytes)
+    db.add(m)
+    db.flush()
+    return m
+
+def _sig(manifest_id: int) -> str:
+    # no expiry: the link lives on in review embeds and the admin channel
+    return hmac.new(auth.SECRET, f"manifest:{manifest_id}".encode(), hashlib.sha256).hexdigest()[:32]
+
+def view_link(manifest_id: int) -> str:
+    return f"{PUBLIC_API_BASE}/api/manifests/{manifest_id}/view?sig={_sig(manifest_id)}"
+
+def manifest_link(m: Manifest) -> str:
+    return view_link(m.id)
+
+def check_sig(manifest_id: int, sig: str) -> bool:
+    return hmac.compare_digest(sig, _sig(manifest_id))
+
+def view_html(resolved: dict) -> str:
+    rows = "".join(
+        f'<li><a href="{html.escape(e["url"])}">{html.escape(e["name"])}</a> ({e["size"]} B)</li>'
+        if (e["url"] or "").startswith(("http://", "https://")) else f'<li>{html.escape(e["name"])} ({e["size"]} B)</li>'
+        for e in resolved["entries"])
+    title = html.escape(f'{resolved["path"]}/{resolved["filename"]}')
+    return f'<!doctype html><meta charset="utf-8"><title>{title}</title><h3>{title}</h3><ol>{rows}</ol>'
+
+def resolve(db: Session, m: Manifest) -> dict:
+    entries = json.loads(m.entries)
+    locations = dict(db.execute(select(Blob.sha256, Blob.location).where(Blob.sha256.in_({e[1] for e in entries}))).all())
+    return {"id": m.id, "task_id": m.task_id, "filename": m.filename, "path": m.path,
+            "total_bytes": m.total_bytes, "new_bytes": m.new_bytes, "created_at": m.created_at,
+            "entries": [{"name": n, "sha256": sha, "size": size, "url": locations.get(sha)} for n, sha, size in entries]}
@@ -0,0 +1,163 @@
+
+import datetime as dt
+from collections import Counter
+from sqlalchemy import select, insert, update, delete, func, case, event, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from models import Task, ArchivedTask, TaskEvent, TaskStatusCounter as C, MemberWorkRole as M
+from services import events
+
+# Every Task.status / assignee change goes through here so task_status_counters stays
+# in the same transaction as the row it counts.
+
+# tasks in these states keep the member's work role
+OPEN_STATUSES = {"open", "assigned", "in_progress", "submitted", "changes_requested", "overdue"}
+FINISHED_STATUSES = {"accepted", "rejected"}
+
+def _add(db: Session, scope: str, scope_id: str, status: str, delta: int):
+    where = (C.scope==scope, C.scope_id==scope_id, C.status==status)
+    if db.execute(update(C).where(*where).values(count=C.count + delta)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(C(scope=scope, scope_id=scope_id, status=status, count=delta))
+    except IntegrityError:
+        # another transaction inserted the row first
+        db.execute(update(C).where(*where).values(count=C.count + delta))
+
+def _track_open(db: Session, work_id: int, assignee: str | None, status: str, delta: int):
+    # netted per transaction and written in before_commit, so assigned -> in_progress is not a 1 -> 0 -> 1 blip
+    if assignee and status in OPEN_STATUSES:
+        db.info.setdefault("open_deltas", Counter())[(str(assignee), work_id)] += delta
+
+def bump(db: Session, work_id: int, assignee: str | None, status: str, delta: int):
+    _add(db, "global", "", status, delta)
+    _add(db, "work", str(work_id), status, delta)
+    if assignee:
+        _add(db, "assignee", str(assignee), status, delta)
+    _track_open(db, work_id, assignee, status, delta)
+
+def task_added(db: Session, t: Task):
+    t.status = t.status or "open"
+    bump(db, t.work_id, t.assignee_discord_id, t.status, 1)
+
+def set_status(db: Session, t: Task, status: str) -> bool:
+    # compare-and-set on the row: if another transaction moved the task since it was loaded, the
+    # UPDATE matches nothing and neither the row nor the counters change. False = no transition.
+    if t.status == status:
+        return False
+    # finished_at follows the status: the archive window counts from it
+    finished = dt.datetime.utcnow() if status in FINISHED_STATUSES else None
+    moved = db.execute(update(Task).where(Task.id==t.id, Task.status==t.status).values(status=status, finished_at=finished)
+                       .execution_options(synchronize_session=False)).rowcount
+    if not moved:
+        db.expire(t, ["status", "finished_at"])
+        return False
+    bump(db, t.work_id, t.assignee_discord_id, t.status, -1)
+    bump(db, t.work_id, t.assignee_discord_id, status, 1)
+    set_committed_value(t, "status", status)
+    set_committed_value(t, "finished_at", finished)
+    return True
+
+def set_assignee(db: Session, t: Task, assignee: str | None):
+    if t.assignee_discord_id == assignee:
+        return
+    if t.assignee_discord_id:
+        _add(db, "assignee", str(t.assignee_discord_id), t.status, -1)
+        _track_open(db, t.work_id, t.assignee_discord_id, t.status, -1)
+    if assignee:
+        _add(db, "assignee", str(assignee), t.status, 1)
+        _track_open(db, t.work_id, assignee, t.status, 1)
+    t.assignee_discord_id = assignee
+
+def _apply_open(db: Session, assignee: str, work_id: int, delta: int, now: dt.datetime) -> int:
+    where = (M.assignee_discord_id==assignee, M.work_id==work_id)
+    # clamp at 0: rows that predate this table start from nothing until rebuild() backfills them
+    values = {"open_count": case((M.open_count + delta < 0, 0), else_=M.open_count + delta), "changed_at": now}
+    if delta > 0:
+        values["role_held"] = True
+    row = db.execute(update(M).where(*where).values(**values).returning(M.open_count)).first()
+    if row is not None:
+        return row[0]
+    try:
+        with db.begin_nested():
+            db.add(M(assignee_discord_id=assignee, work_id=work_id, open_count=max(delta, 0), role_held=True, changed_at=now))
+        return max(delta, 0)
+    except IntegrityError:
+        return db.execute(update(M).where(*where).values(**values).returning(M.open_count)).scalar_one()
+
+@event.listens_for(Session, "before_commit")
+def _flush_open(session):
+    if session.in_nested_transaction():
+        return  # also fired for SAVEPOINT releases; only the outer commit counts
+    deltas = session.info.pop("open_deltas", None)
+    if not deltas:
+        return
+    now = dt.datetime.utcnow()
+    done = False
+    # sorted: concurrent commits touch member rows in the same order
+    for (assignee, work_id), delta in sorted(deltas.items()):
+        if delta and _apply_open(session, assignee, work_id, delta, now) == 0 and delta < 0:
+            # member has nothing left in this work: the bot can drop the work role
+            session.add(TaskEvent(kind="work_done", work_id=work_id, assignee_discord_id=assignee, created_at=now))
+            done = True
+    if done:
+        events.mark(session)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_open(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("open_deltas", None)
+
+def roles_to_remove(db: Session, after: tuple[int, str] | None = None, limit: int = 500) -> list[tuple[int, str]]:
+    q = select(M.work_id, M.assignee_discord_id).where(M.open_count==0, M.role_held)
+    if after:
+        q = q.where((M.work_id > after[0]) | ((M.work_id == after[0]) & (M.assignee_discord_id > after[1])))
+    return [tuple(r) for r in db.execute(q.order_by(M.work_id, M.assignee_discord_id).limit(limit))]
+
+def roles_removed(db: Session, pairs: list[tuple[int, str]]) -> int:
+    # only rows still at zero: a member re-assigned meanwhile keeps role_held
+    if not pairs:
+        return 0
+    return db.execute(update(M).where(M.open_count==0, M.role_held,
+                                      tuple_(M.work_id, M.assignee_discord_id).in_(pairs))
+                      .values(role_held=False)).rowcount
+
+def rebuild(db: Session):
+    # one grouped pass over tasks (and the archive: archived tasks still count); used to backfill
+    # counters on an existing database
+    totals = Counter()
+    for model in (Task, ArchivedTask):
+        for work_id, assignee, status, n in db.execute(
+                select(model.work_id, model.assignee_discord_id, model.status, func.count())
+                .group_by(model.work_id, model.assignee_discord_id, model.status)):
+            totals[("global", "", status)] += n
+            totals[("work", str(work_id), status)] += n
+            if assignee:
+                totals[("assignee", str(assignee), status)] += n
+    db.execute(delete(C))
+    db.add_all(C(scope=sc, scope_id=sid, status=st, count=n) for (sc, sid, st), n in totals.items())
+    # open counts per (member, work); members already at zero keep their pending role removal
+    db.execute(update(M).values(open_count=0))
+    known = set(db.execute(select(M.assignee_discord_id, M.work_id)).all())
+    rows = [{"assignee_discord_id": a, "work_id": w, "open_count": n, "role_held": True}
+            for a, w, n in db.execute(
+                select(Task.assignee_discord_id, Task.work_id, func.count())
+                .where(Task.assignee_discord_id.is_not(None), Task.status.in_(OPEN_STATUSES))
+                .group_by(Task.assignee_discord_id, Task.work_id))]
+    # bulk UPDATE by primary key for known pairs, one executemany INSERT for the rest
+    old = [r for r in rows if (r["assignee_discord_id"], r["work_id"]) in known]
+    if old:
+        db.execute(update(M), old)
+    if len(old) < len(rows):
+        db.execute(insert(M), [r for r in rows if (r["assignee_discord_id"], r["work_id"]) not in known])
+    db.info.pop("open_deltas", None)
+    db.flush()
+
+def read(db: Session, scope: str = "global") -> dict[str, dict[str, int]]:
+    out: dict[str, dict[str, int]] = {}
+    for scope_id, status, n in db.execute(select(C.scope_id, C.status, C.count).where(C.scope==scope)):
+        if n:
+            out.setdefault(scope_id, {})[status] = n
+    return out
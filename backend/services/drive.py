@@ -1,11 +1,185 @@
 
-import os, io, json, hashlib
-# Minimal Google Drive uploader stub (structure + link simulation).
-# Replace with real googleapiclient integration if desired.
+import os, io, uuid, fcntl, threading
+# Chunked uploaders behind one interface: Google Drive when credentials are configured,
+# otherwise a local directory tree with the same Work/Chapter N/type layout.
 
 ROOT_ID = os.getenv("GOOGLE_DRIVE_ROOT_FOLDER_ID","")
+CREDENTIALS_PATH = os.getenv("GOOGLE_DRIVE_CREDENTIALS_PATH","")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR","/tmp/manga-uploads")
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_MB","8")) * 1024 * 1024
 
-def ensure_drive_path_and_upload(work_name: str, chapter_folder: str, filename: str, data: bytes) -> str:
-    # Pretend uploading and return a stable fake link.
-    h = hashlib.sha256((work_name + chapter_folder + filename).encode()).hexdigest()[:12]
-    return f"https://drive.google.com/fake/{h}/{filename}"
+class Uploader:
+    def __init__(self):
+        # (parent id, name) -> folder id, so repeat submissions skip the folder lookups
+        self._folders: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def folder(self, *parts: str) -> str:
+        parent = self.root_id()
+        for name in parts:
+            key = (parent, name)
+            with self._lock:
+                hit = self._folders.get(key)
+            if hit is None:
+                hit = self.ensure_folder(parent, name)
+                with self._lock:
+                    self._folders[key] = hit
+            parent = hit
+        return parent
+
+    def upload(self, folder_id: str, filename: str, fileobj) -> str:
+        # resumable: begin() picks up an interrupted session at its stored offset
+        session = self.begin(folder_id, filename, fileobj)
+        try:
+            fileobj.seek(session["offset"])
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.put_chunk(session, chunk)
+            return self.finish(session)
+        except BaseException:
+            self.abort(session)
+            raise
+
+    def root_id(self) -> str: raise NotImplementedError
+    def ensure_folder(self, parent_id: str, name: str) -> str: raise NotImplementedError
+    def begin(self, folder_id: str, filename: str, fileobj) -> dict: raise NotImplementedError
+    def put_chunk(self, session: dict, data: bytes): raise NotImplementedError
+    def finish(self, session: dict) -> str: raise NotImplementedError
+    def abort(self, session: dict): pass
+
+def _safe(name: str) -> str:
+    # keep user-supplied names inside the upload root
+    name = name.replace("/", "_").replace("\\", "_")
+    return name if name not in ("", ".", "..") else "_"
+
+class LocalUploader(Uploader):
+    def __init__(self, root: str = UPLOAD_DIR):
+        super().__init__()
+        self.root = root
+
+    def root_id(self) -> str:
+        return ""
+
+    def ensure_folder(self, parent_id: str, name: str) -> str:
+        rel = os.path.join(parent_id, _safe(name))
+        os.makedirs(os.path.join(self.root, rel), exist_ok=True)
+        return rel
+
+    @staticmethod
+    def _claim(f, path: str) -> bool:
+        # held for the whole session; also released if the process dies, so a crash leaves a resumable part
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        # the previous holder may have renamed it into place between our open and flock
+        try:
+            return os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _matching_prefix(f, fileobj) -> int:
+        # how much of the part file is this same content; a part left by a different file restarts at 0
+        f.seek(0); fileobj.seek(0)
+        n = 0
+        while True:
+            have = f.read(CHUNK_SIZE)
+            if not have or fileobj.read(len(have)) != have:
+                return n
+            n += len(have)
+
+    def begin(self, folder_id: str, filename: str, fileobj) -> dict:
+        filename = _safe(filename)
+        part = os.path.join(self.root, folder_id, filename + ".part")
+        f, private = open(part, "a+b"), False
+        if not self._claim(f, part):
+            # another session is writing this name (two submissions sharing a page): use a private part
+            f.close()
+            part, private = os.path.join(self.root, folder_id, f"{filename}.{uuid.uuid4().hex}.part"), True
+            f = open(part, "w+b")
+        offset = self._matching_prefix(f, fileobj)
+        f.truncate(offset)
+        f.seek(offset)
+        return {"file": f, "part": part, "private": private, "rel": os.path.join(folder_id, filename), "offset": offset}
+
+    def put_chunk(self, session: dict, data: bytes):
+        session["file"].write(data)
+        session["offset"] += len(data)
+
+    def finish(self, session: dict) -> str:
+        f = session["file"]
+        f.flush()
+        os.replace(session["part"], os.path.join(self.root, session["rel"]))
+        f.close()
+        return f"local://{session['rel']}"
+
+    def abort(self, session: dict):
+        # the shared part stays for a retry to resume; a private one is nobody else's
+        session["file"].close()
+        if session["private"]:
+            try:
+                os.remove(session["part"])
+            except OSError:
+                pass
+
+class DriveUploader(Uploader):
+    FOLDER = "application/vnd.google-apps.folder"
+
+    def __init__(self, credentials_path: str = CREDENTIALS_PATH, root_id: str = ROOT_ID):
+        super().__init__()
+        self.credentials_path = credentials_path
+        self._root = root_id
+        self._service = None
+
+    @property
+    def service(self):
+        if self._service is None:
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+            creds = service_account.Credentials.from_service_account_file(
+                self.credentials_path, scopes=["https://www.googleapis.com/auth/drive"])
+            self._service = build("drive", "v3", credentials=creds, cache_discovery=False)
+        return self._service
+
+    def root_id(self) -> str:
+        if not self._root:
+            self._root = self.ensure_folder("root", "Manga Suite")
+        return self._root
+
+    def ensure_folder(self, parent_id: str, name: str) -> str:
+        escaped = name.replace("\\", "\\\\").replace("'", "\\'")
+        q = (f"name = '{escaped}' and '{parent_id}' in parents "
+             f"and mimeType = '{self.FOLDER}' and trashed = false")
+        found = self.service.files().list(q=q, fields="files(id)", pageSize=1).execute().get("files", [])
+        if found:
+            return found[0]["id"]
+        meta = {"name": name, "mimeType": self.FOLDER, "parents": [parent_id]}
+        return self.service.files().create(body=meta, fields="id").execute()["id"]
+
+    def upload(self, folder_id: str, filename: str, fileobj) -> str:
+        # googleapiclient drives the resumable session itself, CHUNK_SIZE bytes per request
+        from googleapiclient.http import MediaIoBaseUpload
+        media = MediaIoBaseUpload(fileobj, mimetype="application/octet-stream", chunksize=CHUNK_SIZE, resumable=True)
+        req = self.service.files().create(body={"name": filename, "parents": [folder_id]},
+                                          media_body=media, fields="id,webViewLink")
+        done = None
+        while done is None:
+            _, done = req.next_chunk(num_retries=3)
+        return done.get("webViewLink") or f"https://drive.google.com/file/d/{done['id']}/view"
+
+_uploader: Uploader | None = None
+
+def get_uploader() -> Uploader:
+    global _uploader
+    if _uploader is None:
+        _uploader = DriveUploader() if CREDENTIALS_PATH and os.path.exists(CREDENTIALS_PATH) else LocalUploader()
+    return _uploader
+
+def ensure_drive_path_and_upload(work_name: str, chapter_folder: str, filename: str, data) -> str:
+    # data: bytes or a seekable binary file object
+    fileobj = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    up = get_uploader()
+    return up.upload(up.folder(work_name, *chapter_folder.split("/")), filename, fileobj)
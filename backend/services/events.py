@@ -0,0 +1,63 @@
+
+import json, asyncio
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from models import Task, TaskEvent
+
+# Writers add TaskEvent rows inside their own transaction; once it commits, open streams
+# are woken. Streams also re-poll on a timer, which covers events written by other workers.
+
+_loop: asyncio.AbstractEventLoop | None = None
+_changed: asyncio.Event | None = None
+
+def emit(db: Session, kind: str, t: Task, detail: str | None = None):
+    db.add(TaskEvent(kind=kind, task_id=t.id, work_id=t.work_id,
+                     assignee_discord_id=t.assignee_discord_id, detail=detail))
+    mark(db)
+
+def mark(db: Session):
+    db.info["events_pending"] = True
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    # also fired when a SAVEPOINT is released; wait for the outer commit
+    if not session.in_nested_transaction() and session.info.pop("events_pending", False):
+        notify()
+
+def _fire():
+    global _changed
+    ev, _changed = _changed, asyncio.Event()
+    if ev is not None:
+        ev.set()
+
+def notify():
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_fire)
+
+async def _wait(timeout: float):
+    global _loop, _changed
+    if _loop is None:
+        _loop, _changed = asyncio.get_running_loop(), asyncio.Event()
+    try:
+        await asyncio.wait_for(_changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+def fetch(session_maker, after: int, limit: int = 500) -> list[dict]:
+    with session_maker() as db:
+        rows = db.scalars(select(TaskEvent).where(TaskEvent.id > after).order_by(TaskEvent.id).limit(limit)).all()
+        return [{"id": e.id, "kind": e.kind, "task_id": e.task_id, "work_id": e.work_id,
+                 "assignee_discord_id": e.assignee_discord_id, "detail": e.detail,
+                 "created_at": e.created_at.isoformat()} for e in rows]
+
+async def stream(session_maker, after: int, is_disconnected, keepalive: float = 15.0):
+    # Server-Sent Events; the id line lets clients resume with Last-Event-ID / ?after=
+    cursor = after
+    while not await is_disconnected():
+        batch = await asyncio.to_thread(fetch, session_maker, cursor)
+        for e in batch:
+            cursor = e["id"]
+            yield f"id: {e['id']}\nevent: {e['kind']}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+        if not batch:
+            yield ": keepalive\n\n"
+            await _wait(keepalive)
@@ -0,0 +1,103 @@
+
+import os, time, bisect, threading
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from models import MonthlyRollup as R, WorkRollup as W
+
+# Ranked views over the rollup tables. Each (month, work_id or None) board is loaded once with an
+# indexed read, then kept sorted in memory: ledger.credit queues deltas on the session and they
+# are applied after commit. Boards are reloaded after LEADERBOARD_TTL so other workers' writes show up.
+
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL","60"))
+
+class Board:
+    def __init__(self, rows=()):
+        # rows: (discord_id, points, chapters)
+        self.scores: dict[str, tuple[int, int]] = {}
+        self.order: list[tuple[int, int, str]] = []  # (-points, -chapters, discord_id), ascending
+        for uid, points, chapters in rows:
+            self.scores[uid] = (points, chapters)
+        self.order = sorted((-p, -c, uid) for uid, (p, c) in self.scores.items())
+        self.loaded_at = time.monotonic()
+
+    def add(self, uid: str, points: int, chapters: int):
+        old = self.scores.get(uid)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (-old[0], -old[1], uid))]
+            points, chapters = old[0] + points, old[1] + chapters
+        self.scores[uid] = (points, chapters)
+        bisect.insort(self.order, (-points, -chapters, uid))
+
+    def rank(self, uid: str) -> int | None:
+        # competition ranking on points: ties share a rank
+        s = self.scores.get(uid)
+        if s is None:
+            return None
+        return bisect.bisect_left(self.order, (-s[0],)) + 1
+
+    def top(self, n: int, offset: int = 0) -> list[dict]:
+        out = []
+        for neg_p, neg_c, uid in self.order[offset:offset + n]:
+            out.append({"rank": bisect.bisect_left(self.order, (neg_p,)) + 1, "discord_id": uid,
+                        "points": -neg_p, "chapters": -neg_c})
+        return out
+
+    def __len__(self):
+        return len(self.order)
+
+_boards: dict[tuple[str, int | None], Board] = {}
+_lock = threading.Lock()
+
+def _load(db: Session, month: str, work_id: int | None) -> Board:
+    if work_id is None:
+        rows = db.execute(select(R.user_discord_id, R.points, R.chapters).where(R.month==month)).all()
+    else:
+        rows = db.execute(select(W.user_discord_id, W.points, W.chapters)
+                          .where(W.month==month, W.work_id==work_id)).all()
+    return Board(rows)
+
+def board(db: Session, month: str, work_id: int | None = None) -> Board:
+    key = (month, work_id)
+    b = _boards.get(key)
+    if b is None or time.monotonic() - b.loaded_at > LEADERBOARD_TTL:
+        b = _load(db, month, work_id)
+        with _lock:
+            _boards[key] = b
+    return b
+
+def top(db: Session, month: str, work_id: int | None = None, limit: int = 20, offset: int = 0) -> dict:
+    b = board(db, month, work_id)
+    with _lock:
+        return {"month": month, "work_id": work_id, "total": len(b), "entries": b.top(limit, offset)}
+
+def position(db: Session, month: str, work_id: int | None, discord_id: str) -> dict:
+    b = board(db, month, work_id)
+    with _lock:
+        return {"rank": b.rank(discord_id), "ranked_users": len(b)}
+
+def reset():
+    with _lock:
+        _boards.clear()
+
+def pending(db: Session, month: str, work_id: int | None, discord_id: str, points: int, chapters: int):
+    db.info.setdefault("board_deltas", []).append((month, work_id, discord_id, points, chapters))
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.in_nested_transaction():
+        return  # SAVEPOINT release, the outer transaction may still roll back
+    deltas = session.info.pop("board_deltas", None)
+    if not deltas:
+        return
+    with _lock:
+        for month, work_id, uid, points, chapters in deltas:
+            # boards not loaded yet will read the committed rollups when first asked
+            for key in {(month, None), (month, work_id)}:
+                b = _boards.get(key)
+                if b is not None:
+                    b.add(uid, points, chapters)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("board_deltas", None)
@@ -0,0 +1,121 @@
+
+import datetime as dt
+from collections import defaultdict
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import User, Work, LedgerEntry as L, MonthlyRollup as R, WorkRollup as W
+from db import insert_ignore
+from services import leaderboard
+
+# Points and balance only move through credit(): one ledger row per (task, event), then
+# atomic increments on users and monthly_rollups in the same transaction.
+
+# README: less than 15 weak, 15-30 good, 35+ legendary (chapters accepted in the month)
+TIERS = ((35, "legendary"), (15, "good"), (0, "weak"))
+
+def month_of(ts: dt.datetime | None = None) -> str:
+    return (ts or dt.datetime.utcnow()).strftime("%Y-%m")
+
+def tier(chapters: int) -> str:
+    return next(name for floor, name in TIERS if chapters >= floor)
+
+def _upsert(db: Session, model, keys: dict, deltas: dict):
+    where = [getattr(model, k)==v for k, v in keys.items()]
+    values = {k: getattr(model, k) + v for k, v in deltas.items()}
+    if db.execute(update(model).where(*where).values(**values)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**keys, **deltas))
+    except IntegrityError:
+        # another transaction inserted the row first
+        db.execute(update(model).where(*where).values(**values))
+
+def credit(db: Session, discord_id: str, task_id: int | None, event: str, points: int, cents: int,
+           work_id: int | None = None) -> bool:
+    # False when this (task, event) was already paid
+    month = month_of()
+    try:
+        with db.begin_nested():
+            db.add(L(user_discord_id=discord_id, task_id=task_id, work_id=work_id, event=event,
+                     points=points, amount_cents=cents, month=month))
+    except IntegrityError:
+        return False
+    db.execute(update(User).where(User.discord_id==discord_id)
+               .values(points=User.points + points, balance_cents=User.balance_cents + cents)
+               .execution_options(synchronize_session=False))
+    chapters = 1 if event == "accept" else 0
+    _upsert(db, R, {"month": month, "user_discord_id": discord_id},
+            {"chapters": chapters, "points": points, "amount_cents": cents})
+    if work_id is not None:
+        _upsert(db, W, {"month": month, "work_id": work_id, "user_discord_id": discord_id},
+                {"chapters": chapters, "points": points})
+    leaderboard.pending(db, month, work_id, discord_id, points, chapters)
+    return True
+
+def credit_many(db: Session, entries: list[dict]) -> set[int]:
+    # set-based credit(): entries are {user_discord_id, task_id, work_id, event, points, amount_cents};
+    # returns the task ids actually paid (already-paid ones are skipped by the unique constraint)
+    if not entries:
+        return set()
+    month = month_of()
+    paid = db.execute(insert_ignore(db, L).returning(L.task_id, L.user_discord_id, L.work_id, L.event, L.points, L.amount_cents),
+                      [{**e, "month": month} for e in entries]).all()
+    per_user = defaultdict(lambda: [0, 0, 0])
+    per_work = defaultdict(lambda: [0, 0])
+    for task_id, uid, work_id, event, points, cents in paid:
+        chapters = 1 if event == "accept" else 0
+        u = per_user[uid]; u[0] += chapters; u[1] += points; u[2] += cents
+        w = per_work[(uid, work_id)]; w[0] += chapters; w[1] += points
+    for uid, (chapters, points, cents) in per_user.items():
+        db.execute(update(User).where(User.discord_id==uid)
+                   .values(points=User.points + points, balance_cents=User.balance_cents + cents)
+                   .execution_options(synchronize_session=False))
+        _upsert(db, R, {"month": month, "user_discord_id": uid},
+                {"chapters": chapters, "points": points, "amount_cents": cents})
+    for (uid, work_id), (chapters, points) in per_work.items():
+        if work_id is not None:
+            _upsert(db, W, {"month": month, "work_id": work_id, "user_discord_id": uid},
+                    {"chapters": chapters, "points": points})
+        leaderboard.pending(db, month, work_id, uid, points, chapters)
+    return {task_id for task_id, *_ in paid}
+
+def monthly(db: Session, discord_id: str, month: str) -> dict:
+    r = db.get(R, (month, discord_id))
+    chapters, points, cents = (r.chapters, r.points, r.amount_cents) if r else (0, 0, 0)
+    return {"month": month, "discord_id": discord_id, "chapters": chapters, "points": points,
+            "amount_cents": cents, "tier": tier(chapters)}
+
+def evaluation(db: Session, discord_id: str, month: str) -> dict:
+    out = monthly(db, discord_id, month)
+    out.update(leaderboard.position(db, month, None, discord_id))
+    rows = db.execute(select(W.work_id, Work.name, W.chapters, W.points)
+                      .join(Work, Work.id==W.work_id, isouter=True)
+                      .where(W.user_discord_id==discord_id, W.month==month)
+                      .order_by(W.points.desc())).all()
+    out["works"] = [{"work_id": w, "name": name, "chapters": c, "points": p} for w, name, c, p in rows]
+    return out
+
+def payouts(db: Session, month: str) -> list[dict]:
+    rows = db.execute(select(R, User.pay_method, User.pay_address)
+                      .join(User, User.discord_id==R.user_discord_id, isouter=True)
+                      .where(R.month==month, R.amount_cents > 0)
+                      .order_by(R.points.desc())).all()
+    return [{"discord_id": r.user_discord_id, "chapters": r.chapters, "points": r.points,
+             "amount_cents": r.amount_cents, "tier": tier(r.chapters),
+             "pay_method": method, "pay_address": address} for r, method, address in rows]
+
+def rebuild(db: Session):
+    # recompute rollups from the ledger (repair / backfill)
+    db.execute(delete(R)); db.execute(delete(W))
+    chapters = func.sum(case((L.event=="accept", 1), else_=0))
+    rows = db.execute(select(L.month, L.user_discord_id, chapters, func.sum(L.points), func.sum(L.amount_cents))
+                      .group_by(L.month, L.user_discord_id)).all()
+    db.add_all(R(month=m, user_discord_id=u, chapters=c or 0, points=p or 0, amount_cents=a or 0)
+               for m, u, c, p, a in rows)
+    rows = db.execute(select(L.month, L.work_id, L.user_discord_id, chapters, func.sum(L.points))
+                      .where(L.work_id.is_not(None))
+                      .group_by(L.month, L.work_id, L.user_discord_id)).all()
+    db.add_all(W(month=m, work_id=w, user_discord_id=u, chapters=c or 0, points=p or 0) for m, w, u, c, p in rows)
+    leaderboard.reset()
@@ -1,34 +1,162 @@
 
-import os
+import datetime as dt
+from collections import Counter, defaultdict
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from models import Task, User, Work
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from models import Task, Work
+from db import insert_ignore
+from services.counters import set_status, set_assignee, bump, FINISHED_STATUSES
+from services.events import emit
+from services import ledger, settings, archive
 
-POINTS_PER_ACCEPTED = int(os.getenv("POINTS_PER_ACCEPTED_TASK","15"))
-USD_PER_15 = float(os.getenv("USD_PER_15_POINTS","0.5"))
+def _cents(points: int) -> int:
+    return int(round((points * settings.get("usd_per_15_points") / 15.0) * 100))
+
+def bulk_create_tasks_logic(db: Session, work_id: int, rows: list[dict]) -> list[dict]:
+    # rows: {"chapter_number", "assignee_discord_id", "type"}; one INSERT .. ON CONFLICT DO NOTHING,
+    # so chapters that already have a task (same stage) are skipped instead of failing the batch
+    # chapters already done and archived are skipped the same way. The type is also the task's stage
+    for type in {r["type"] for r in rows}:
+        done = archive.chapter_archived(db, work_id, [r["chapter_number"] for r in rows if r["type"] == type], type)
+        rows = [r for r in rows if r["type"] != type or r["chapter_number"] not in done]
+    if not rows:
+        return []
+    now = dt.datetime.utcnow()
+    stmt = insert_ignore(db, Task).returning(Task.id, Task.chapter_number, Task.assignee_discord_id, Task.status)
+    created = db.execute(stmt, [{"work_id": work_id, "status": "open", "created_at": now, "stage": r["type"], **r}
+                                for r in rows]).all()
+    for (assignee, status), n in Counter((r.assignee_discord_id, r.status) for r in created).items():
+        bump(db, work_id, assignee, status, n)
+    return [{"id": r.id, "chapter_number": r.chapter_number, "assignee_discord_id": r.assignee_discord_id}
+            for r in created]
 
 def accept_task_logic(db: Session, t: Task, points: int|None=None):
-    t.status = "accepted"
+    # a repeated click finds the task already accepted: no second event, no second credit
+    if not set_status(db, t, "accepted"):
+        return
+    emit(db, "reviewed", t, "accept")
     # points to money
-    pts = points if points is not None else POINTS_PER_ACCEPTED
+    pts = points if points is not None else settings.get("points_per_accepted")
     if t.assignee_discord_id:
-        u = db.scalar(select(User).where(User.discord_id==t.assignee_discord_id))
-        if u:
-            u.points += pts
-            # 15 points => 0.5$  => value per point:
-            per_point = USD_PER_15 / 15.0
-            u.balance_cents += int(round( (pts * per_point) * 100 ))
+        # 15 points => 0.5$
+        ledger.credit(db, t.assignee_discord_id, t.id, "accept", pts, _cents(pts), work_id=t.work_id)
     db.flush()
 
 def reject_task_logic(db: Session, t: Task, reason: str|None=None):
-    t.status = "rejected"
+    if not set_status(db, t, "rejected"):
+        return
     t.review_note = reason or ""
+    emit(db, "reviewed", t, "reject")
 
 def request_changes_logic(db: Session, t: Task, reason: str|None=None):
-    t.status = "changes_requested"
+    if not set_status(db, t, "changes_requested"):
+        return
     t.review_note = reason or ""
+    emit(db, "reviewed", t, "changes")
 
 def finalize_member_roles_if_done(db: Session, t: Task):
-    # This is a DB-level flag; actual Discord role removal is handled by the bot
-    # which periodically checks members tasks via API and removes the role if none left.
+    # Nothing to do per task: counters keeps open counts per (member, work) and, on commit, flags the
+    # member for role removal (member_work_roles + a work_done event) when the count reaches zero.
+    # The bot drains GET /api/roles/to-remove and confirms with POST /api/roles/removed.
     pass
+
+def assign_task_logic(db: Session, t: Task, assignee_discord_id: str):
+    previous = t.assignee_discord_id
+    set_assignee(db, t, assignee_discord_id)
+    set_status(db, t, "assigned")
+    # a new assignment starts without a deadline; start sets one
+    t.due_at = None
+    if previous and previous != assignee_discord_id:
+        emit(db, "reassigned", t, previous)
+
+def start_task_logic(db: Session, t: Task, hours: int):
+    set_status(db, t, "in_progress")
+    t.due_at = dt.datetime.utcnow() + dt.timedelta(hours=hours)
+
+def submit_task_logic(db: Session, t: Task, type: str, link: str|None):
+    t.type = type
+    if link:
+        t.link = link
+    set_status(db, t, "submitted")
+    emit(db, "submitted", t, type)
+
+REVIEW_ACTIONS = {"accept", "reject", "changes"}
+
+def review_task_logic(db: Session, t: Task, action: str, reason: str|None=None, points: int|None=None):
+    if action == "accept":
+        accept_task_logic(db, t, points=points)
+    elif action == "reject":
+        reject_task_logic(db, t, reason=reason)
+    elif action == "changes":
+        request_changes_logic(db, t, reason=reason)
+    # may trigger role removal if all tasks done
+    finalize_member_roles_if_done(db, t)
+
+REVIEW_STATUS = {"accept": "accepted", "reject": "rejected", "changes": "changes_requested"}
+
+def review_batch_logic(db: Session, items: list[dict]) -> list[dict]:
+    # items: {task_id, action, reason, points_awarded}. Same outcome as review_task_logic per item,
+    # but one UPDATE per (status, note) group, one counters pass and one ledger insert for the batch.
+    tasks = {t.id: t for t in db.scalars(select(Task).where(Task.id.in_({i["task_id"] for i in items}))
+                                         .with_for_update())}
+    results, groups, credits, seen = [], defaultdict(list), [], set()
+    moves = Counter()
+    for it in items:
+        t, action = tasks.get(it["task_id"]), it["action"]
+        if t is None:
+            results.append({"task_id": it["task_id"], "ok": False, "error": "not_found"}); continue
+        if action not in REVIEW_ACTIONS:
+            results.append({"task_id": t.id, "ok": False, "error": "unknown_action"}); continue
+        if t.id in seen:
+            results.append({"task_id": t.id, "ok": False, "error": "duplicate"}); continue
+        seen.add(t.id)
+        status = REVIEW_STATUS[action]
+        if t.status == status:
+            # already there (a repeated batch): nothing to move, notify or pay
+            results.append({"task_id": t.id, "ok": True, "action": action, "status": status, "changed": False}); continue
+        groups[(status, None if action == "accept" else it.get("reason") or "")].append(t.id)
+        moves[(t.work_id, t.assignee_discord_id, t.status, status)] += 1
+        emit(db, "reviewed", t, action)
+        if action == "accept" and t.assignee_discord_id:
+            pts = it.get("points_awarded")
+            pts = pts if pts is not None else settings.get("points_per_accepted")
+            credits.append({"user_discord_id": t.assignee_discord_id, "task_id": t.id, "work_id": t.work_id,
+                            "event": "accept", "points": pts, "amount_cents": _cents(pts)})
+        results.append({"task_id": t.id, "ok": True, "action": action, "status": status})
+    now = dt.datetime.utcnow()
+    for (status, note), ids in groups.items():
+        values = {"status": status, "finished_at": now if status in FINISHED_STATUSES else None}
+        if note is not None:
+            values["review_note"] = note
+        db.execute(update(Task).where(Task.id.in_(ids)).values(**values).execution_options(synchronize_session=False))
+    for (work_id, assignee, old, new), n in moves.items():
+        bump(db, work_id, assignee, old, -n)
+        bump(db, work_id, assignee, new, n)
+    paid = ledger.credit_many(db, credits)
+    for r in results:
+        if r.get("action") == "accept" and r.get("changed", True):
+            r["paid"] = r["task_id"] in paid
+    for t in tasks.values():
+        db.expire(t)
+    return results
+
+# Async entry points for the API: the ORM logic above runs on the AsyncSession's
+# underlying Session via run_sync, so the scheduler threads and handlers share one implementation.
+async def assign_task(db: AsyncSession, t: Task, assignee_discord_id: str):
+    await db.run_sync(assign_task_logic, t, assignee_discord_id)
+
+async def start_task(db: AsyncSession, t: Task, hours: int):
+    await db.run_sync(start_task_logic, t, hours)
+
+async def submit_task(db: AsyncSession, t: Task, type: str, link: str|None):
+    await db.run_sync(submit_task_logic, t, type, link)
+
+async def bulk_create_tasks(db: AsyncSession, work_id: int, rows: list[dict]) -> list[dict]:
+    return await db.run_sync(bulk_create_tasks_logic, work_id, rows)
+
+async def review_batch(db: AsyncSession, items: list[dict]) -> list[dict]:
+    return await db.run_sync(review_batch_logic, items)
+
+async def review_task(db: AsyncSession, t: Task, action: str, reason: str|None=None, points: int|None=None):
+    await db.run_sync(review_task_logic, t, action, reason, points)
@@ -0,0 +1,191 @@
+import time, bisect, threading, contextvars
+from sqlalchemy import event
+
+# Minimal Prometheus text-format registry (counters, gauges, histograms with labels).
+# Kept dependency-free so the bot can carry the same shape without prometheus_client.
+
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.fn = fn  # read at scrape time instead of pushed: fn() -> value, or {label tuple: value}
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def inc(self, *labels, n: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self) -> list[str]:
+        values = self._values
+        if self.fn is not None:
+            v = self.fn()
+            values = v if isinstance(v, dict) else {(): v}
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(values.items())]
+
+class Counter(_Metric):
+    kind = "counter"
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                # per-bucket counts (cumulated at render), then sum and count
+                h = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][bisect.bisect_left(self.buckets, value)] += 1
+            h[1] += value
+            h[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def totals(self) -> dict[tuple, tuple[int, float]]:
+        # {labels: (count, sum)}; benches diff these around a run
+        with self._lock:
+            return {k: (h[2], h[1]) for k, h in self._values.items()}
+
+    def render(self) -> list[str]:
+        out = []
+        with self._lock:
+            items = sorted((k, ([*h[0]], h[1], h[2])) for k, h in self._values.items())
+        for k, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                acc += c
+                le = 'le="%s"' % le
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {round(total, 6)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {n}")
+        return out
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: tuple):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(*self.labels, value=time.perf_counter() - self.start)
+
+registry: list[_Metric] = []
+
+def render() -> str:
+    lines = []
+    for m in registry:
+        body = m.render()
+        if body:
+            lines += m.header() + body
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --------- HTTP + SQL ---------
+http_seconds = Histogram("http_request_duration_seconds", "Time to response headers per route", ("method", "route", "status"))
+http_inflight = Gauge("http_requests_inflight", "Requests being handled")
+db_seconds = Histogram("db_time_per_request_seconds", "Total SQL time per request (\"background\": per statement)", ("route",))
+db_queries = Histogram("db_queries_per_request", "SQL statements issued per request", ("route",),
+                       buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+
+# per-request [queries, seconds]; worker threads and run_sync greenlets inherit the context,
+# so statements are attributed to the request that issued them. None outside requests.
+request_sql: contextvars.ContextVar = contextvars.ContextVar("request_sql", default=None)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    acc = request_sql.get()
+    if acc is not None:
+        acc[0] += 1
+        acc[1] += elapsed
+    else:
+        db_seconds.observe("background", value=elapsed)
+
+def instrument_engine(engine):
+    # sync Engine, or AsyncEngine via its sync_engine
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+class MetricsMiddleware:
+    # pure ASGI so streaming responses (SSE, /ai/batch) pass through untouched; latency is
+    # taken at http.response.start, which keeps hour-long event streams out of the histogram and the profiler
+    def __init__(self, app, on_done=None):
+        self.app = app
+        self.on_done = on_done  # on_done(route, start, end) for the slow-request profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        acc = [0, 0.0]
+        token = request_sql.set(acc)
+        started = []
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                started.append(time.perf_counter())
+                http_seconds.observe(scope["method"], _route(scope), message["status"], value=started[0] - start)
+            await send(message)
+
+        http_inflight.inc()
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            if not started:
+                # unhandled: ServerErrorMiddleware (outside us) answers 500
+                http_seconds.observe(scope["method"], _route(scope), 500, value=time.perf_counter() - start)
+            raise
+        finally:
+            http_inflight.inc(n=-1)
+            request_sql.reset(token)
+            route = f"{scope['method']} {_route(scope)}"
+            if acc[0]:
+                db_queries.observe(route, value=acc[0])
+                db_seconds.observe(route, value=acc[1])
+            if self.on_done is not None:
+                # same clock as the histogram: a long stream is not a slow request
+                self.on_done(route, start, started[0] if started else time.perf_counter())
+
+def _route(scope) -> str:
+    # route template ("/api/tasks/{task_id}/start") so labels don't explode per id
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
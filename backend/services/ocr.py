@@ -0,0 +1,215 @@
+
+import os, io, time, asyncio, threading, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services import metrics
+
+# OCR runs in a small process pool so tesseract never holds the event loop (or the GIL).
+# PIL/pytesseract are imported inside the workers only.
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE","32"))  # running + waiting jobs before we refuse
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT_SECONDS","60"))
+OCR_LANGS = os.getenv("OCR_LANGS","eng")
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE","2400"))
+OCR_MIN_SIDE = int(os.getenv("OCR_MIN_SIDE","1000"))
+
+ocr_seconds = metrics.Histogram("ocr_duration_seconds", "OCR job time including queueing for a worker")
+ocr_refused = metrics.Counter("ocr_refused_total", "OCR jobs refused or abandoned", ("reason",))
+
+class OcrBusy(Exception):
+    pass
+
+class OcrTimeout(Exception):
+    pass
+
+class OcrCrashed(OcrBusy):
+    # the page killed its worker twice; callers that wait out OcrBusy should give up on it instead
+    pass
+
+def _otsu(hist: list[int]) -> int:
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_b = w_b = 0
+    best, threshold = 0.0, 127
+    for i, h in enumerate(hist):
+        w_b += h
+        if w_b == 0:
+            continue
+        w_f = total - w_b
+        if w_f == 0:
+            break
+        sum_b += i * h
+        m_b, m_f = sum_b / w_b, (sum_all - sum_b) / w_f
+        between = w_b * w_f * (m_b - m_f) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+def preprocess(img):
+    # manga pages: grayscale, bring the long side into tesseract's comfortable range,
+    # stretch contrast (screentone greys), then Otsu-binarize so balloon text is pure black on white
+    from PIL import Image, ImageOps
+    img = ImageOps.grayscale(img)
+    side = max(img.size)
+    if side > OCR_MAX_SIDE or side < OCR_MIN_SIDE:
+        scale = (OCR_MAX_SIDE if side > OCR_MAX_SIDE else OCR_MIN_SIDE) / side
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    img = ImageOps.autocontrast(img, cutoff=1)
+    t = _otsu(img.histogram())
+    return img.point(lambda p: 255 if p > t else 0, mode="L")
+
+def ocr_image(image_bytes: bytes, langs: str = OCR_LANGS) -> str:
+    try:
+        import pytesseract
+        from PIL import Image
+    except Exception:
+        return ""
+    try:
+        img = preprocess(Image.open(io.BytesIO(image_bytes)))
+        return pytesseract.image_to_string(img, lang=langs)
+    except Exception:
+        return ""
+
+class _Worker:
+    # one single-process executor; replaced on its own when its job hangs or its process dies
+    __slots__ = ("executor", "dead")
+
+    def __init__(self):
+        self.executor: ProcessPoolExecutor | None = None
+        self.dead = False
+
+class OcrPool:
+    # Each job takes a worker to itself, so its timeout only runs while it is actually being worked
+    # on, and a stuck or crashed job costs only its own process. Not tied to one event loop.
+    def __init__(self, workers: int = OCR_WORKERS, queue_size: int = OCR_QUEUE_SIZE,
+                 timeout: float = OCR_TIMEOUT, job=ocr_image):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.job = job
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._idle = deque(_Worker() for _ in range(workers))
+        self._waiters: deque = deque()  # (loop, future) of callers waiting for a worker
+        self._spawned: set[_Worker] = set()
+
+    def _release(self, w: _Worker):
+        # any thread: hand the worker to the longest waiter, or park it
+        with self._lock:
+            if w.dead:
+                return
+            while self._waiters:
+                loop, fut = self._waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._hand, fut, w)
+                    return
+            self._idle.append(w)
+
+    def _hand(self, fut: asyncio.Future, w: _Worker):
+        if fut.cancelled():
+            self._release(w)
+        else:
+            fut.set_result(w)
+
+    async def _take(self) -> _Worker:
+        while True:
+            with self._lock:
+                if self._idle:
+                    w = self._idle.popleft()
+                    if w.dead:
+                        continue
+                    return w
+                loop = asyncio.get_running_loop()
+                fut = loop.create_future()
+                self._waiters.append((loop, fut))
+            try:
+                w = await fut
+            except asyncio.CancelledError:
+                with self._lock:
+                    if (loop, fut) in self._waiters:
+                        self._waiters.remove((loop, fut))
+                if fut.done() and not fut.cancelled():
+                    self._release(fut.result())
+                raise
+            if not w.dead:
+                return w
+
+    def _replace(self, w: _Worker):
+        # kill only this worker; an empty slot takes its place and spawns on first use
+        with self._lock:
+            if w.dead:
+                return
+            w.dead = True
+            self._spawned.discard(w)
+        ex = w.executor
+        if ex is not None:
+            for p in list(getattr(ex, "_processes", {}).values()):
+                p.terminate()
+            ex.shutdown(wait=False, cancel_futures=True)
+        self._release(_Worker())
+
+    def _done(self, w: _Worker, cf):
+        # executor thread: the worker finished its page (possibly after its caller gave up) and is
+        # free again, unless its process died
+        if not cf.cancelled() and isinstance(cf.exception(), BrokenProcessPool):
+            self._replace(w)
+        else:
+            self._release(w)
+
+    async def _run_once(self, args):
+        w = await self._take()
+        try:
+            if w.executor is None:
+                # spawn: forking a process that holds DB pools and an event loop is not safe
+                w.executor = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+                with self._lock:
+                    self._spawned.add(w)
+            cf = w.executor.submit(self.job, *args)
+        except BaseException:
+            self._replace(w)
+            raise
+        cf.add_done_callback(lambda cf: self._done(w, cf))
+        # the clock starts here, once the worker is ours, not while waiting behind other jobs
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(cf), self.timeout)
+        except asyncio.TimeoutError:
+            self._replace(w)
+            ocr_refused.inc("timeout")
+            raise OcrTimeout()
+
+    async def run(self, *args):
+        if self.pending >= self.queue_size:
+            ocr_refused.inc("busy")
+            raise OcrBusy()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            try:
+                out = await self._run_once(args)
+            except BrokenProcessPool:
+                # the worker process died under this job (crash, OOM kill); one more go on a fresh one
+                try:
+                    out = await self._run_once(args)
+                except BrokenProcessPool:
+                    ocr_refused.inc("crashed")
+                    raise OcrCrashed()
+            ocr_seconds.observe(value=time.perf_counter() - start)
+            return out
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        # busy workers finish their page and are dropped; the pool respawns on next use
+        with self._lock:
+            spawned, self._spawned = self._spawned, set()
+            self._idle = deque(_Worker() for _ in range(self.workers))
+            for w in spawned:
+                w.dead = True
+        for w in spawned:
+            w.executor.shutdown(wait=False, cancel_futures=True)
+
+pool = OcrPool()
+metrics.Gauge("ocr_queue_depth", "OCR jobs running or waiting for a worker", fn=lambda: pool.pending)
+metrics.Gauge("ocr_queue_capacity", "OCR jobs accepted before refusing", fn=lambda: pool.queue_size)
@@ -0,0 +1,89 @@
+import os, sys, time, queue, threading, collections, datetime as dt
+
+# Opt-in sampling profiler for slow requests. A daemon thread samples every thread's stack at
+# PROFILE_HZ into a short ring buffer; when a request takes longer than PROFILE_SLOW_MS, the
+# samples taken during it are appended as collapsed stacks ("route;frame;frame count") to
+# PROFILE_DIR/<day>.folded, ready for flamegraph.pl or speedscope.
+# Async handlers share the loop thread, so concurrent requests can show up in each other's window.
+
+PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS","0"))  # 0 = off
+PROFILE_HZ = int(os.getenv("PROFILE_HZ","100"))
+PROFILE_DIR = os.getenv("PROFILE_DIR","profiles")
+PROFILE_WINDOW = int(os.getenv("PROFILE_WINDOW_SECONDS","30"))
+
+# leaf frames of threads that are parked, not working
+IDLE = {"select", "poll", "wait", "_worker", "accept", "_run_once"}
+
+def _frame(f) -> str:
+    return f"{os.path.basename(f.f_code.co_filename)}:{f.f_code.co_name}"
+
+def collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+class Sampler:
+    def __init__(self, hz: int = PROFILE_HZ, directory: str = PROFILE_DIR, window: int = PROFILE_WINDOW):
+        self.hz = hz
+        self.directory = directory
+        self.slow_ms = 0
+        self.samples: collections.deque = collections.deque(maxlen=max(1, hz * window))
+        self.written = 0
+        self._slow: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0
+
+    def configure(self, slow_ms: int):
+        self.slow_ms = max(0, int(slow_ms))
+        if self.enabled and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        elif not self.enabled and self._thread is not None:
+            self._stop.set()
+            self._thread = None
+            self.samples.clear()
+
+    def _sample(self, me: int):
+        now = time.perf_counter()
+        for ident, frame in sys._current_frames().items():
+            if ident == me or frame.f_code.co_name in IDLE:
+                continue
+            self.samples.append((now, collapse(frame)))
+
+    def _run(self):
+        me = threading.get_ident()
+        interval = 1.0 / self.hz
+        while not self._stop.wait(interval):
+            self._sample(me)
+            while not self._slow.empty():
+                self._write(*self._slow.get())
+
+    def on_done(self, route: str, start: float, end: float):
+        # called by the metrics middleware for every request; cheap unless it was slow
+        if self.enabled and (end - start) * 1000 >= self.slow_ms:
+            self._slow.put((route, start, end))
+
+    def _write(self, route: str, start: float, end: float):
+        stacks = collections.Counter(s for t, s in list(self.samples) if start <= t <= end)
+        if not stacks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{dt.datetime.utcnow():%Y%m%d}.folded")
+        root = route.replace(";", ":").replace(" ", "_")
+        with open(path, "a") as f:
+            for stack, n in stacks.items():
+                f.write(f"{root};{stack} {n}\n")
+        self.written += 1
+
+    def state(self) -> dict:
+        return {"slow_ms": self.slow_ms, "hz": self.hz, "directory": self.directory,
+                "buffered_samples": len(self.samples), "slow_requests_written": self.written}
+
+sampler = Sampler()  # started by the app's lifespan with PROFILE_SLOW_MS
@@ -1,24 +1,110 @@
 
-import os, asyncio, datetime as dt
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from models import Task
+import asyncio, datetime as dt
+from collections import Counter
+from sqlalchemy import select, update, func
+from models import Task, TaskEvent
+from services import counters, events, metrics, settings, archive
 
-async def mark_overdue_and_handle(session_maker):
-    now = dt.datetime.utcnow()
+RUNNING = ("assigned", "in_progress")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_wake = asyncio.Event()
+_next_wake: dt.datetime | None = None
+
+sweep_seconds = metrics.Histogram("scheduler_sweep_duration_seconds", "Scheduler job duration", ("job",))
+swept = metrics.Counter("scheduler_tasks_total", "Tasks moved by the scheduler", ("job",))
+
+def sweep_overdue(session_maker, now: dt.datetime | None = None) -> list[int]:
+    # set-based: the partial index on due_at finds candidates, no rows are loaded into the ORM
+    now = now or dt.datetime.utcnow()
+    ids = []
     with session_maker() as db:
-        tasks = db.scalars(select(Task).where(Task.status.in_(("assigned","in_progress")))).all()
-        hours = int(os.getenv("OVERDUE_HOURS","24"))
-        for t in tasks:
-            if t.due_at and now > t.due_at:
-                t.status = "overdue"
+        # one UPDATE per source status so the counters know what each row moved out of
+        for status in RUNNING:
+            rows = db.execute(
+                update(Task).where(Task.status==status, Task.due_at < now)
+                .values(status="overdue")
+                .returning(Task.id, Task.work_id, Task.assignee_discord_id)
+                .execution_options(synchronize_session=False)).all()
+            if not rows:
+                continue
+            for (work_id, assignee), n in Counter((r.work_id, r.assignee_discord_id) for r in rows).items():
+                counters.bump(db, work_id, assignee, status, -n)
+                counters.bump(db, work_id, assignee, "overdue", n)
+            db.add_all(TaskEvent(kind="overdue", task_id=r.id, work_id=r.work_id,
+                                 assignee_discord_id=r.assignee_discord_id, created_at=now) for r in rows)
+            ids += [r.id for r in rows]
+        if ids:
+            events.mark(db)
         db.commit()
+    return ids
+
+def reclaim_overdue(session_maker, now: dt.datetime | None = None) -> list[int]:
+    # tasks ignored for RECLAIM_AFTER_HOURS past their deadline go back to the pool
+    now = now or dt.datetime.utcnow()
+    cutoff = now - dt.timedelta(hours=settings.get("reclaim_after_hours"))
+    with session_maker() as db:
+        # RETURNING would only give the new (NULL) assignee, so lock and read the candidates first.
+        # The stale deadline goes too, or the next assignee would be swept again on the next pass
+        rows = db.execute(
+            select(Task.id, Task.work_id, Task.assignee_discord_id)
+            .where(Task.status=="overdue", Task.due_at < cutoff).with_for_update()).all()
+        if not rows:
+            return []
+        db.execute(update(Task).where(Task.id.in_([r.id for r in rows]))
+                   .values(status="open", assignee_discord_id=None, due_at=None)
+                   .execution_options(synchronize_session=False))
+        for (work_id, assignee), n in Counter((r.work_id, r.assignee_discord_id) for r in rows).items():
+            counters.bump(db, work_id, assignee, "overdue", -n)
+            counters.bump(db, work_id, None, "open", n)
+        db.add_all(TaskEvent(kind="reassigned", task_id=r.id, work_id=r.work_id,
+                             detail=r.assignee_discord_id, created_at=now) for r in rows)
+        events.mark(db)
+        db.commit()
+    return [r.id for r in rows]
+
+def next_due(session_maker) -> dt.datetime | None:
+    with session_maker() as db:
+        return db.scalar(select(func.min(Task.due_at)).where(Task.status.in_(RUNNING)))
+
+async def mark_overdue_and_handle(session_maker) -> list[int]:
+    with sweep_seconds.time("overdue"):
+        ids = await asyncio.to_thread(sweep_overdue, session_maker)
+    with sweep_seconds.time("reclaim"):
+        reclaimed = await asyncio.to_thread(reclaim_overdue, session_maker)
+    swept.inc("overdue", n=len(ids))
+    swept.inc("reclaim", n=len(reclaimed))
+    return ids
+
+async def archive_finished(session_maker) -> int:
+    with sweep_seconds.time("archive"):
+        n = await asyncio.to_thread(archive.run, session_maker)
+    swept.inc("archive", n=n)
+    return n
+
+def notify_due(due_at: dt.datetime):
+    # called from request threads when a deadline is set; wakes the loop early if needed
+    if _loop is not None and (_next_wake is None or due_at < _next_wake):
+        _loop.call_soon_threadsafe(_wake.set)
 
 async def scheduler_start(session_maker):
-    interval = int(os.getenv("CHECK_INTERVAL_MINUTES","30"))
+    global _loop, _next_wake
+    _loop = asyncio.get_running_loop()
     while True:
+        # upper bound on a sleep, so deadlines written by other processes are still picked up
+        interval = max(1, settings.get("check_interval_minutes")) * 60
+        _wake.clear()
+        delay = interval
         try:
             await mark_overdue_and_handle(session_maker)
-        except Exception as e:
+            await archive_finished(session_maker)
+            due = await asyncio.to_thread(next_due, session_maker)
+            if due:
+                delay = min(interval, max(0.0, (due - dt.datetime.utcnow()).total_seconds()) + 1)
+        except Exception:
+            pass
+        _next_wake = dt.datetime.utcnow() + dt.timedelta(seconds=delay)
+        try:
+            await asyncio.wait_for(_wake.wait(), delay)
+        except asyncio.TimeoutError:
             pass
-        await asyncio.sleep(interval*60)
@@ -0,0 +1,106 @@
+import os, asyncio, dataclasses
+from types import MappingProxyType
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import Setting, TaskEvent
+from db import insert_ignore
+from services import events
+
+# Runtime tunables. The environment gives the defaults (existing deployments keep their values),
+# rows in `settings` override them. Reads hit an immutable in-process snapshot, no I/O; writers
+# bump the `_version` row in the same transaction, and every process reloads the table when its
+# poll sees a new version. The bot hears about changes through a "settings" task event.
+
+# key -> (type, env var, default)
+SPECS = {
+    "overdue_hours": (int, "OVERDUE_HOURS", 24),
+    "reclaim_after_hours": (int, "RECLAIM_AFTER_HOURS", 24),
+    "check_interval_minutes": (int, "CHECK_INTERVAL_MINUTES", 30),
+    "points_per_accepted": (int, "POINTS_PER_ACCEPTED_TASK", 15),
+    "usd_per_15_points": (float, "USD_PER_15_POINTS", 0.5),
+    "archive_after_days": (int, "ARCHIVE_AFTER_DAYS", 180),  # 0 = never archive
+}
+VERSION_KEY = "_version"
+POLL_SECONDS = float(os.getenv("SETTINGS_POLL_SECONDS","5"))
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    version: int
+    values: MappingProxyType
+
+def defaults() -> dict:
+    return {k: typ(os.getenv(env, str(default))) for k, (typ, env, default) in SPECS.items()}
+
+_snap = Snapshot(0, MappingProxyType(defaults()))
+
+def get(key: str):
+    return _snap.values[key]
+
+def current() -> Snapshot:
+    return _snap
+
+def install(snap: Snapshot):
+    # never go back: a slow poll may finish after a newer write was installed
+    global _snap
+    if snap.version >= _snap.version:
+        _snap = snap
+
+def validate(changes: dict) -> dict:
+    # ValueError on unknown keys or values that don't parse as the key's type
+    out = {}
+    for k, v in changes.items():
+        if k not in SPECS:
+            raise ValueError(f"Unknown setting: {k}")
+        typ = SPECS[k][0]
+        try:
+            out[k] = typ(v)
+        except (TypeError, ValueError):
+            raise ValueError(f"{k} must be {typ.__name__}")
+        if out[k] < 0:
+            raise ValueError(f"{k} must be >= 0")
+    return out
+
+def load(db: Session) -> Snapshot:
+    rows = dict(db.execute(select(Setting.key, Setting.value)).all())
+    values = defaults()
+    for k, raw in rows.items():
+        if k in SPECS:
+            try:
+                values[k] = SPECS[k][0](raw)
+            except ValueError:
+                pass  # a hand-edited bad row keeps the default rather than breaking every read
+    return Snapshot(int(rows.get(VERSION_KEY) or 0), MappingProxyType(values))
+
+def update(db: Session, changes: dict) -> Snapshot:
+    values = validate(changes)
+    # the version row serializes concurrent writers
+    db.execute(insert_ignore(db, Setting).values(key=VERSION_KEY, value="0"))
+    row = db.scalar(select(Setting).where(Setting.key == VERSION_KEY).with_for_update())
+    row.value = str(int(row.value) + 1)
+    existing = {s.key: s for s in db.scalars(select(Setting).where(Setting.key.in_(values)))}
+    for k, v in values.items():
+        if k in existing:
+            existing[k].value = str(v)
+        else:
+            db.add(Setting(key=k, value=str(v)))
+    db.add(TaskEvent(kind="settings", detail=row.value))
+    events.mark(db)
+    db.flush()
+    return load(db)
+
+def refresh(session_maker, force: bool = False) -> bool:
+    with session_maker() as db:
+        version = int(db.scalar(select(Setting.value).where(Setting.key == VERSION_KEY)) or 0)
+        if version == _snap.version and not force:
+            return False
+        install(load(db))
+        return True
+
+async def poll(session_maker):
+    # one indexed lookup per interval; the full table only when the version moved
+    while True:
+        await asyncio.sleep(POLL_SECONDS)
+        try:
+            await asyncio.to_thread(refresh, session_maker)
+        except Exception:
+            pass
@@ -0,0 +1,98 @@
+
+import os, time, shutil, asyncio, tempfile, functools
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from fastapi import HTTPException
+from models import Task
+from services import events, blobs, metrics
+from services.drive import ensure_drive_path_and_upload, CHUNK_SIZE
+
+# Submissions are copied to disk in CHUNK_SIZE pieces and uploaded by a background job;
+# Task.upload_status tracks it: pending -> uploading -> done | failed.
+
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or tempfile.gettempdir()
+# file_url submissions are fetched server-side, so only trusted hosts (Discord's CDN) are allowed
+URL_HOSTS = set(os.getenv("UPLOAD_URL_HOSTS","cdn.discordapp.com,media.discordapp.net").split(","))
+# store submissions as deduplicated blobs + manifest instead of one file per submission. Off by
+# default: blobs are named by hash under blobs/xx/, not the Work/Chapter N/type folders staff browse
+DEDUP = os.getenv("UPLOAD_DEDUP","0") == "1"
+# uploads get their own threads: long Drive uploads on the loop's default executor would starve
+# spool_to_disk, the SSE fetches, scheduler sweeps and settings polls that share it. Extra jobs
+# wait their turn with upload_status "pending".
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS","4"))
+
+_jobs: set[asyncio.Future] = set()
+_executor: ThreadPoolExecutor | None = None
+
+upload_seconds = metrics.Histogram("upload_duration_seconds", "Background upload job time", ("result",))
+metrics.Gauge("upload_jobs_running", "Background upload jobs queued or running", fn=lambda: len(_jobs))
+
+def check_url(url: str):
+    u = urlparse(url)
+    if u.scheme != "https" or u.hostname not in URL_HOSTS:
+        raise HTTPException(400, "file_url host not allowed")
+
+def filename_from_url(url: str) -> str:
+    return os.path.basename(urlparse(url).path) or "upload.bin"
+
+def spool_to_disk(src) -> str:
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_TMP_DIR, prefix="submit-", delete=False) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return dst.name
+
+def download_to_disk(url: str) -> str:
+    import httpx  # ~200ms to import; only link submissions need it
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_TMP_DIR, prefix="submit-", delete=False) as dst:
+        with httpx.stream("GET", url, timeout=60, follow_redirects=False) as r:
+            r.raise_for_status()
+            for chunk in r.iter_bytes(CHUNK_SIZE):
+                dst.write(chunk)
+        return dst.name
+
+def _set(session_maker, task_id: int, status: str, link: str | None = None, manifest_id: int | None = None):
+    with session_maker() as db:
+        t = db.get(Task, task_id)
+        if not t:
+            return
+        t.upload_status = status
+        if link:
+            t.link = link
+        if manifest_id:
+            t.manifest_id = manifest_id
+        if status in ("done", "failed"):
+            events.emit(db, "uploaded" if status == "done" else "upload_failed", t, (link or "")[:200] or None)
+        db.commit()
+
+def run_upload(session_maker, task_id: int, work_name: str, chapter_folder: str, filename: str,
+               path: str | None = None, url: str | None = None):
+    start = time.perf_counter()
+    try:
+        _set(session_maker, task_id, "uploading")
+        if url:
+            path = download_to_disk(url)
+        manifest_id = None
+        if DEDUP:
+            with session_maker() as db:
+                m = blobs.store(db, task_id, f"{work_name}/{chapter_folder}", filename, path)
+                db.commit()
+                link, manifest_id = blobs.manifest_link(m), m.id
+        else:
+            with open(path, "rb") as f:
+                link = ensure_drive_path_and_upload(work_name, chapter_folder, filename, f)
+        _set(session_maker, task_id, "done", link, manifest_id)
+        upload_seconds.observe("done", value=time.perf_counter() - start)
+    except Exception:
+        _set(session_maker, task_id, "failed")
+        upload_seconds.observe("failed", value=time.perf_counter() - start)
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def start(session_maker, *args, **kwargs):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(UPLOAD_WORKERS, thread_name_prefix="upload")
+    job = asyncio.get_running_loop().run_in_executor(_executor, functools.partial(run_upload, session_maker, *args, **kwargs))
+    _jobs.add(job)
+    job.add_done_callback(_jobs.discard)
+    return job
@@ -0,0 +1,93 @@
+
+import os, re, time, random, asyncio
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2 = os.getenv("API_HTTP2", "1") == "1"
+except Exception:
+    HTTP2 = False
+
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# errors raised before the request reached the server: safe to retry for any method
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_ID_SEG = re.compile(r"/\d+(?=/|$)")
+
+def route_key(method: str, path: str) -> str:
+    # /api/tasks/12/start -> "POST /api/tasks/{id}/start" so counters don't explode per id
+    return f"{method.upper()} {_ID_SEG.sub('/{id}', path.split('?', 1)[0])}"
+
+class RouteStats:
+    __slots__ = ("count", "errors", "total", "max")
+    def __init__(self):
+        self.count = 0; self.errors = 0; self.total = 0.0; self.max = 0.0
+
+    def add(self, seconds: float, ok: bool):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.errors += 1
+
+    def as_dict(self):
+        avg = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "errors": self.errors, "avg_ms": round(avg*1000, 2), "max_ms": round(self.max*1000, 2)}
+
+# One pooled keep-alive client shared by every command and button.
+class ApiClient:
+    def __init__(self, base_url: str, timeout: float = 20, max_connections: int = 20,
+                 max_concurrency: int = 16, retries: int = 3, backoff: float = 0.25, transport=None):
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.stats: dict[str, RouteStats] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self._timeout, limits=self._limits,
+                                             http2=HTTP2, transport=self._transport)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _delay(self, attempt: int) -> float:
+        # full jitter: uniform(0, backoff * 2^attempt)
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        method = method.upper()
+        stats = self.stats.setdefault(route_key(method, path), RouteStats())
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self._sem:
+                    r = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                stats.add(time.perf_counter() - start, False)
+                retryable = isinstance(e, CONNECT_ERRORS) or method in IDEMPOTENT
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                stats.add(time.perf_counter() - start, r.status_code < 500)
+                # 5xx on POST may have been applied server-side, so only idempotent calls are replayed
+                if r.status_code < 500 or method not in IDEMPOTENT or attempt >= self.retries:
+                    return r
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    def stream(self, method: str, path: str, **kwargs):
+        # long-lived responses (SSE) share the pool but skip the semaphore and retries
+        return self.client.stream(method.upper(), path, **kwargs)
+
+    def snapshot(self) -> dict:
+        return {k: v.as_dict() for k, v in sorted(self.stats.items())}
@@ -0,0 +1,31 @@
+
+import os, time, hmac, json, base64, hashlib
+
+# Mints the backend's HMAC tokens (same format as backend/services/auth.py) for the member
+# the bot is acting for. iss="bot" tells the backend the role claim comes from live Discord roles
+# and wins over its users table.
+SECRET = os.getenv("API_TOKEN_SECRET", os.getenv("DISCORD_OAUTH_CLIENT_SECRET","devsecret")).encode()
+TOKEN_TTL = int(os.getenv("BOT_TOKEN_TTL_SECONDS","3600"))
+
+_minted: dict[tuple[str, str], tuple[float, str]] = {}
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def sign(payload: dict, ttl: int = TOKEN_TTL) -> str:
+    payload = {"exp": int(time.time()) + ttl, "iss": "bot", **payload}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_b64(hmac.new(SECRET, body.encode(), hashlib.sha256).digest())}"
+
+def token_for(discord_id, role: str = "member") -> str:
+    # reuse a token until half its lifetime is gone so the backend's verify cache keeps hitting
+    key = (str(discord_id), role)
+    hit = _minted.get(key)
+    if hit and hit[0] > time.time():
+        return hit[1]
+    token = sign({"discord_id": str(discord_id), "role": role})
+    _minted[key] = (time.time() + TOKEN_TTL / 2, token)
+    return token
+
+def headers_for(discord_id, role: str = "member") -> dict:
+    return {"Authorization": f"Bearer {token_for(discord_id, role)}"}
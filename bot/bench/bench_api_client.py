@@ -0,0 +1,93 @@
+# Replays the bot's backend call patterns against a local stub API, comparing the old
+# client-per-call helper with the shared pooled ApiClient.
+#   pip install fastapi uvicorn && python bench/bench_api_client.py --rounds 200 --concurrency 20
+import os, sys, time, json, socket, asyncio, threading, argparse, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx, uvicorn
+from fastapi import FastAPI
+from api_client import ApiClient
+
+def stub_app() -> FastAPI:
+    app = FastAPI()
+    works = [{"id": i, "name": f"Work {i}", "role_name": f"Work {i}"} for i in range(1, 51)]
+
+    @app.get("/api/works")
+    def list_works():
+        return works
+
+    @app.post("/api/works")
+    def create_work():
+        return works[0]
+
+    @app.post("/api/tasks")
+    def create_task():
+        return {"id": 1, "work_id": 1, "chapter_number": 1, "status": "open"}
+
+    @app.post("/api/tasks/{task_id}/start")
+    def start(task_id: int):
+        return {"ok": True}
+
+    @app.post("/api/tasks/{task_id}/review")
+    def review(task_id: int):
+        return {"ok": True}
+    return app
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stub_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+# the three round-trips /وزع makes, then /استلام and a review button press
+PATTERN = [("GET", "/api/works", {}), ("POST", "/api/works", {"json": {"name": "Work 1"}}),
+           ("POST", "/api/tasks", {"json": {"work_id": 1, "chapter_number": 3}}),
+           ("POST", "/api/tasks/1/start", {}), ("POST", "/api/tasks/1/review", {"json": {"action": "accept"}})]
+
+async def run(call, rounds: int, concurrency: int) -> dict:
+    lat = []
+    sem = asyncio.Semaphore(concurrency)
+    async def one():
+        async with sem:
+            for method, path, kw in PATTERN:
+                t0 = time.perf_counter()
+                await call(method, path, **kw)
+                lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(rounds)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    q = statistics.quantiles(lat, n=100)
+    return {"calls": len(lat), "wall_s": round(wall, 3), "rps": round(len(lat)/wall, 1),
+            "p50_ms": round(q[49]*1000, 2), "p99_ms": round(q[98]*1000, 2)}
+
+async def main(args):
+    base = f"http://127.0.0.1:{args.port}"
+
+    async def per_call(method, path, **kw):
+        async with httpx.AsyncClient(timeout=20) as client:
+            return await client.request(method, f"{base}{path}", **kw)
+
+    shared = ApiClient(base, max_connections=args.concurrency, max_concurrency=args.concurrency)
+    out = {"per_call_client": await run(per_call, args.rounds, args.concurrency),
+           "shared_client": await run(shared.request, args.rounds, args.concurrency),
+           "routes": shared.snapshot()}
+    await shared.aclose()
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=20)
+    args = ap.parse_args()
+    args.port = free_port()
+    server = serve(args.port)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.should_exit = True
@@ -0,0 +1,232 @@
+# End-to-end bench of bot/main.py's slash commands and review buttons through a fake Discord
+# layer (interactions, members, roles, channels) against the real backend app in-process.
+# Each session plays a team round: add work, /وزع a range, members /استلام and /تسليم,
+# admins accept half with the review buttons and the rest through /طابور_المراجعة, then /ai.
+# ack_ms is how long a handler takes to acknowledge (Discord allows 3s), done_ms until the last
+# answer; --api-delay-ms makes every API call slow so the two come apart. Exits 1 when the p99
+# acknowledgement is over --ack-budget-ms, or when a round did not get as far as its review messages.
+#   python bench/bench_commands.py --sessions 8 --chapters 10
+#   python bench/bench_commands.py --sessions 16 --api-delay-ms 2000 --ack-budget-ms 250
+import os, sys, time, json, random, asyncio, tempfile, argparse, importlib.util
+from types import SimpleNamespace
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(os.path.dirname(BOT_DIR), "backend")
+# backend first so `import main` is the API; the bot's main.py is loaded by path as bot_main
+sys.path[:0] = [BACKEND_DIR, BOT_DIR]
+os.environ.setdefault("DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("METRICS_PORT", "0")
+import httpx
+import discord
+
+ADMIN_ID = 1
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+
+class FakeMember:
+    def __init__(self, member_id: int, admin: bool = False):
+        self.id = member_id
+        self.roles: list[FakeRole] = []
+        self.mention = f"<@{member_id}>"
+        self.guild_permissions = SimpleNamespace(administrator=admin)
+
+    async def add_roles(self, *roles, reason=None):
+        self.roles += [r for r in roles if r not in self.roles]
+
+class FakeChannel:
+    def __init__(self, on_send=None):
+        self.sent: list[dict] = []
+        self.on_send = on_send
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append({"content": content, **kwargs})
+        if self.on_send:
+            self.on_send()
+
+class FakeGuild:
+    def __init__(self):
+        self.roles: list[FakeRole] = []
+        self.review = FakeChannel()
+
+    async def create_role(self, name: str, **kwargs):
+        role = FakeRole(1000 + len(self.roles), name)
+        self.roles.append(role)
+        return role
+
+    def get_channel(self, channel_id: int):
+        return self.review
+
+class FakeResponse:
+    def __init__(self, answered: asyncio.Event):
+        self.messages: list[dict] = []
+        self._done = False
+        self.acked_at: float | None = None
+        self.answered = answered
+
+    def _ack(self):
+        self._done = True
+        self.acked_at = time.perf_counter()
+
+    async def send_message(self, content=None, **kwargs):
+        self._ack()
+        self.messages.append({"content": content, **kwargs})
+        self.answered.set()
+
+    async def defer(self, thinking: bool = False, **kwargs):
+        # a "thinking" defer promises a followup; a silent one (select menus) is the whole answer
+        self._ack()
+        if not thinking:
+            self.answered.set()
+
+    def is_done(self) -> bool:
+        return self._done
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild: FakeGuild, command=None, data: dict | None = None):
+        self.user = user
+        self.guild = guild
+        self.command = command
+        self.data = data or {}
+        self.answered = asyncio.Event()
+        self.response = FakeResponse(self.answered)
+        self.followup = FakeChannel(self.answered.set)
+
+def load_bot():
+    spec = importlib.util.spec_from_file_location("bot_main", os.path.join(BOT_DIR, "main.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+class SlowTransport(httpx.ASGITransport):
+    def __init__(self, app, delay: float):
+        super().__init__(app=app)
+        self.delay = delay
+
+    async def handle_async_request(self, request):
+        await asyncio.sleep(self.delay)
+        return await super().handle_async_request(request)
+
+class Harness:
+    def __init__(self, bot_main, guild: FakeGuild):
+        self.bm = bot_main
+        self.guild = guild
+        self.admin = FakeMember(ADMIN_ID, admin=True)
+        self.lat: dict[str, list[float]] = {}
+        self.ack: dict[str, list[float]] = {}
+
+    async def _answer(self, label: str, i: FakeInteraction, t: float):
+        # queued work answers later through the followup; wait for it so the flow can go on
+        self.ack.setdefault(label, []).append((i.response.acked_at or time.perf_counter()) - t)
+        await asyncio.wait_for(i.answered.wait(), 600)
+        self.lat.setdefault(label, []).append(time.perf_counter() - t)
+
+    async def command(self, name: str, user: FakeMember, **kwargs) -> FakeInteraction:
+        # what CommandTree._call does for an app command: tree check, then the callback
+        cmd = self.bm.tree.get_command(name, guild=discord.Object(id=self.bm.GUILD_ID))
+        i = FakeInteraction(user, self.guild, cmd)
+        t = time.perf_counter()
+        if await self.bm.tree.interaction_check(i):
+            await cmd.callback(i, **kwargs)
+        await self._answer(name, i, t)
+        return i
+
+    async def click(self, view, item, user: FakeMember, label: str, data: dict | None = None) -> FakeInteraction:
+        # what View._scheduled_task does for a component: view check, then the item callback
+        i = FakeInteraction(user, self.guild, data=data)
+        t = time.perf_counter()
+        if await view.interaction_check(i):
+            await item.callback(i)
+        await self._answer(label, i, t)
+        return i
+
+async def session(h: Harness, n: int, chapters: int, members: list[FakeMember], task_ids):
+    work = f"Bench {n}"
+    await h.command("اضف_عمل", h.admin, العمل=work)
+    role = next(r for r in h.guild.roles if r.name == work)
+    team = random.Random(n).sample(members, 2)
+    await h.command("وزع", h.admin, عضو=team[0], رول_العمل=role, الفصول=f"1-{chapters}", عضو_2=team[1])
+    tasks = await task_ids(work)
+    if len(tasks) != chapters:
+        raise RuntimeError(f"{work}: /وزع created {len(tasks)} of {chapters} tasks")
+    by_member = {m.id: m for m in team}
+    for task_id, assignee in tasks:
+        await h.command("استلام", by_member[int(assignee)], مهمة=task_id)
+        await h.command("تسليم", by_member[int(assignee)], مهمة=task_id, نوع_العمل="ترجمة", رابط=f"https://example.com/{task_id}")
+    views = [m["view"] for m in h.guild.review.sent if isinstance(m.get("view"), h.bm.ReviewView) and m["view"].task_id in dict(tasks)]
+    for view in views[: len(views) // 2]:
+        await h.click(view, view.accept, h.admin, "button:accept")
+    # the rest through the multi-select queue, 25 per page
+    while True:
+        i = await h.command("طابور_المراجعة", h.admin)
+        view = i.followup.sent[-1].get("view")
+        mine = [k for k, t in view.items.items() if t["work_name"] == work] if view else []
+        if not mine:
+            break
+        select = next(c for c in view.children if isinstance(c, discord.ui.Select))
+        await h.click(view, select, h.admin, "select", data={"values": mine})
+        await h.click(view, view.accept_selected, h.admin, "button:accept_selected")
+    await h.command("ai", members[0], نص="BOOM!! " * (n % 3 + 1))
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+async def run(args) -> dict:
+    import main as api_main, migrations, db
+    migrations.migrate(db.engine)  # no lifespan under a bare ASGITransport
+    from sqlalchemy import select
+    from db import SessionLocal
+    from models import Task, Work
+    bm = load_bot()
+    # auth_headers only gives a discord.Member the admin claim; the fakes stand in for members
+    bm.auth_headers = lambda member: bm.auth.headers_for(member.id, "admin" if bm.is_admin(member) else "member")
+    transport = SlowTransport(api_main.app, args.api_delay_ms / 1000)
+    bm.api_client = bm.ApiClient("http://api", transport=transport)
+
+    async def task_ids(work: str):
+        with SessionLocal() as db:
+            return db.execute(select(Task.id, Task.assignee_discord_id).join(Work, Work.id == Task.work_id)
+                              .where(Work.name == work).order_by(Task.id)).all()
+
+    guild = FakeGuild()
+    h = Harness(bm, guild)
+    members = [FakeMember(2000 + m) for m in range(max(4, args.sessions))]
+    before = bm.metrics.api_seconds.totals()
+    start = time.perf_counter()
+    await asyncio.gather(*(session(h, n, args.chapters, members, task_ids) for n in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    await bm.jobs.stop()
+    await bm.api_client.aclose()
+    api_calls: dict[str, int] = {}
+    for (command, route, status), (n, _) in bm.metrics.api_seconds.totals().items():
+        api_calls[command] = api_calls.get(command, 0) + n - before.get((command, route, status), (0, 0))[0]
+    handled = sum(len(v) for v in h.lat.values())
+    return {"sessions": args.sessions, "chapters": args.chapters, "seconds": round(elapsed, 2),
+            "interactions": handled, "interactions_per_sec": round(handled / elapsed, 1),
+            "ack_p99_ms": round(pct([a for v in h.ack.values() for a in v], .99) * 1000, 2),
+            "commands": {k: {"count": len(v), "ack_p50_ms": round(pct(h.ack[k], .5) * 1000, 2), "ack_p99_ms": round(pct(h.ack[k], .99) * 1000, 2),
+                             "done_p50_ms": round(pct(v, .5) * 1000, 2), "done_p95_ms": round(pct(v, .95) * 1000, 2),
+                             "done_p99_ms": round(pct(v, .99) * 1000, 2)} for k, v in sorted(h.lat.items())},
+            "api_calls_by_command": dict(sorted(api_calls.items())),
+            "review_messages": len(guild.review.sent)}
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sessions", type=int, default=8, help="concurrent team rounds")
+    p.add_argument("--chapters", type=int, default=10, help="chapters per round")
+    p.add_argument("--api-delay-ms", type=float, default=0, help="added to every bot -> API call")
+    p.add_argument("--ack-budget-ms", type=float, default=None)
+    args = p.parse_args()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    # a round that stopped early (e.g. every command refused) would pass any latency budget
+    if report["review_messages"] != args.sessions * args.chapters:
+        sys.exit(f"expected {args.sessions * args.chapters} review messages, got {report['review_messages']}")
+    if args.ack_budget_ms is not None and report["ack_p99_ms"] > args.ack_budget_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Role reconciliation against a fake guild: the RoleReconciler's Discord and API call counts
+# must scale with the number of pending removals, not members x works. The naive count is what
+# "check every member's tasks per work" would cost. The backend diff is served by an in-memory stub.
+#   python bench/bench_roles.py --members 2000 --works 40 --done 150
+import os, sys, json, time, random, asyncio, argparse, base64
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+from api_client import ApiClient
+from roles import RoleReconciler
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.name = name
+
+class FakeMember:
+    def __init__(self, member_id: int, guild):
+        self.id = member_id
+        self.roles = []
+        self.guild = guild
+
+    async def remove_roles(self, role, reason=None):
+        self.guild.discord_calls += 1
+        await asyncio.sleep(0)
+        self.roles.remove(role)
+
+class FakeGuild:
+    def __init__(self):
+        self.roles = []
+        self.members = {}
+        self.discord_calls = 0
+
+    def get_member(self, member_id: int):
+        return self.members.get(member_id)
+
+def build(args):
+    rnd = random.Random(5)
+    guild = FakeGuild()
+    guild.roles = [FakeRole(f"Work {w}") for w in range(1, args.works + 1)]
+    for m in range(args.members):
+        member = guild.members[10_000 + m] = FakeMember(10_000 + m, guild)
+        member.roles = rnd.sample(guild.roles, k=min(3, len(guild.roles)))
+    holders = [(int(r.name.split()[1]), str(m.id)) for m in guild.members.values() for r in m.roles]
+    pending = sorted(rnd.sample(holders, args.done))
+    # noise the reconciler must absorb without Discord calls: roles removed by hand, members who left
+    for w, d in pending[: args.done // 10]:
+        guild.members[int(d)].roles.remove(guild.roles[w - 1])
+    for w, d in pending[args.done // 10: args.done // 5]:
+        guild.members.pop(int(d), None)
+    expected = sum(1 for w, d in pending if int(d) in guild.members and guild.roles[w - 1] in guild.members[int(d)].roles)
+    return guild, pending, expected
+
+def stub(pending: list[tuple[int, str]], stats: dict):
+    remaining = set(pending)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        stats["api_calls"] += 1
+        if request.url.path == "/api/roles/to-remove":
+            limit = int(request.url.params.get("limit", 500))
+            after = request.url.params.get("cursor")
+            rows = sorted(remaining)
+            if after:
+                w, _, d = base64.urlsafe_b64decode(after).decode().partition("|")
+                rows = [r for r in rows if r > (int(w), d)]
+            page = rows[:limit]
+            headers = {}
+            if len(page) == limit:
+                headers["X-Next-Cursor"] = base64.urlsafe_b64encode(f"{page[-1][0]}|{page[-1][1]}".encode()).decode()
+            return httpx.Response(200, json=[{"discord_id": d, "work_id": w, "role_name": f"Work {w}"} for w, d in page],
+                                  headers=headers)
+        if request.url.path == "/api/roles/removed":
+            for i in json.loads(request.content)["items"]:
+                remaining.discard((i["work_id"], i["discord_id"]))
+            return httpx.Response(200, json={"ok": True})
+        return httpx.Response(404)
+    return handler, remaining
+
+async def run(args) -> dict:
+    guild, pending, expected = build(args)
+    stats = {"api_calls": 0}
+    handler, remaining = stub(pending, stats)
+    client = ApiClient("http://api", transport=httpx.MockTransport(handler))
+    rec = RoleReconciler(client.request, {}, lambda: guild, rate=args.rate, burst=args.burst, page=args.page)
+    t = time.perf_counter()
+    acked = await rec.run_pass()
+    elapsed = time.perf_counter() - t
+    await client.aclose()
+    out = {"pending_removals": len(pending), "expected_discord_calls": expected,
+           "discord_calls": guild.discord_calls, "api_calls": stats["api_calls"], "acked": acked,
+           "left_unacked": len(remaining), "seconds": round(elapsed, 3),
+           "naive_api_calls": args.members * args.works}
+    assert guild.discord_calls == expected, out
+    assert not remaining, out
+    return out
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--members", type=int, default=2000)
+    p.add_argument("--works", type=int, default=40)
+    p.add_argument("--done", type=int, default=150, help="(member, work) pairs that reached zero open tasks")
+    p.add_argument("--page", type=int, default=100)
+    p.add_argument("--rate", type=float, default=50.0, help="role removals per second")
+    p.add_argument("--burst", type=int, default=10)
+    args = p.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import time, random, asyncio
+import discord
+import metrics
+from api_client import CONNECT_ERRORS
+
+# Slow interaction work runs here instead of in the interaction handler: the handler defers
+# (Discord's 3s acknowledgement window) and the job answers through the followup webhook.
+# Bounded: a fixed set of workers and a queue that refuses new work when full.
+
+# interaction tokens (and so followups) expire 15 minutes after the interaction
+FOLLOWUP_WINDOW = 14 * 60
+
+queued = metrics.Gauge("bot_jobs_queued", "Jobs waiting for a worker")
+running = metrics.Gauge("bot_jobs_running", "Jobs being worked on")
+wait_seconds = metrics.Histogram("bot_job_wait_seconds", "Time from enqueue to a worker picking the job up", ("job",))
+run_seconds = metrics.Histogram("bot_job_duration_seconds", "Job run time including retries", ("job", "result"))
+retried = metrics.Counter("bot_job_retries_total", "Job attempts retried after a transient error", ("job",))
+refused = metrics.Counter("bot_jobs_refused_total", "Jobs refused because the queue was full", ("job",))
+
+def transient(e: Exception) -> bool:
+    # worth another attempt: Discord 5xx / rate limits, and API calls that never reached the backend.
+    # A read timeout or dropped response may come after the backend acted, and a retry would re-send
+    # the POST (the same replay ApiClient refuses for non-idempotent methods).
+    if isinstance(e, discord.HTTPException):
+        return e.status >= 500 or e.status == 429
+    return isinstance(e, CONNECT_ERRORS)
+
+class Job:
+    __slots__ = ("name", "fn", "on_fail", "retries", "enqueued", "attempts")
+
+    def __init__(self, name: str, fn, on_fail, retries: int):
+        self.name = name
+        self.fn = fn
+        self.on_fail = on_fail
+        self.retries = retries
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+class JobQueue:
+    def __init__(self, workers: int = 4, size: int = 100, retries: int = 2, backoff: float = 1.0):
+        self.workers = workers
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.queue: asyncio.Queue | None = None
+        self.running = 0
+        self._tasks: list[asyncio.Task] = []
+        queued.fn = lambda: self.queue.qsize() if self.queue else 0
+        running.fn = lambda: self.running
+
+    def _ensure_workers(self):
+        # started on first use, inside the running loop
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.size)
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def full(self) -> bool:
+        return self.queue is not None and self.queue.full()
+
+    def submit(self, fn, on_fail=None, name: str | None = None, retries: int | None = None) -> bool:
+        # fn() -> awaitable, called again on a transient error, so it must skip steps already done
+        # (or pass retries=0). on_fail() -> awaitable, run once when the job gives up.
+        self._ensure_workers()
+        name = name or metrics.command.get()
+        try:
+            self.queue.put_nowait(Job(name, fn, on_fail, self.retries if retries is None else retries))
+            return True
+        except asyncio.QueueFull:
+            refused.inc(name)
+            return False
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        waited = time.monotonic() - job.enqueued
+        wait_seconds.observe(job.name, value=waited)
+        if waited > FOLLOWUP_WINDOW:
+            run_seconds.observe(job.name, "expired", value=0)
+            return
+        # api() calls made by the job are labelled with the command that queued it
+        metrics.command.set(job.name)
+        self.running += 1
+        start = time.perf_counter()
+        result = "ok"
+        try:
+            while True:
+                job.attempts += 1
+                try:
+                    await job.fn()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if not transient(e) or job.attempts > job.retries:
+                        result = "failed"
+                        if job.on_fail is not None:
+                            try:
+                                await job.on_fail()
+                            except Exception:
+                                pass
+                        break
+                    retried.inc(job.name)
+                    await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (job.attempts - 1)))
+        finally:
+            self.running -= 1
+            run_seconds.observe(job.name, result, value=time.perf_counter() - start)
+
+    async def join(self):
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
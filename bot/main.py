@@ -1,36 +1,127 @@
 
-import os, asyncio, httpx, datetime as dt
+import os, json, math, asyncio, datetime as dt
 from dotenv import load_dotenv
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
+from api_client import ApiClient, route_key
+from work_index import WorkIndex
+from settings import SettingsCache
+from notify import Notifier
+from roles import RoleReconciler
+from jobs import JobQueue
+import auth
+import metrics
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 GUILD_ID = int(os.getenv("GUILD_ID","0"))
 REVIEW_CHANNEL_ID = int(os.getenv("REVIEW_CHANNEL_ID","0"))
 ADMIN_ROLE_ID = int(os.getenv("ADMIN_ROLE_ID","0"))
+ADMIN_CHANNEL_ID = int(os.getenv("ADMIN_CHANNEL_ID", os.getenv("REVIEW_CHANNEL_ID","0")))
 API_BASE = os.getenv("API_BASE","http://localhost:8000")
+# token for calls the bot makes on its own behalf (cache warmup, background loops)
+BOT_API_TOKEN = os.getenv("BOT_API_TOKEN") or auth.sign({"discord_id": "bot", "role": "admin"}, ttl=10*365*24*3600)
+BOT_HEADERS = {"Authorization": f"Bearer {BOT_API_TOKEN}"}
+# local Prometheus scrape port; 0 disables
+METRICS_HOST = os.getenv("METRICS_HOST","127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT","9101"))
 
 INTENTS = discord.Intents.default()
 INTENTS.message_content = True
 INTENTS.members = True
 
-bot = commands.Bot(command_prefix="!", intents=INTENTS)
+class MetricsTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # runs in the command's task, so api() calls below are labelled with the command name
+        name = interaction.command.qualified_name if interaction.command else "unknown"
+        metrics.command.set(name)
+        metrics.commands_total.inc(name)
+        return True
+
+class TrackedView(discord.ui.View):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        name = f"view:{type(self).__name__}"
+        metrics.command.set(name)
+        metrics.commands_total.inc(name)
+        return True
+
+bot = commands.Bot(command_prefix="!", intents=INTENTS, tree_cls=MetricsTree)
 tree = bot.tree
 
 def is_admin(member: discord.Member):
     return any(r.id == ADMIN_ROLE_ID for r in member.roles) or member.guild_permissions.administrator
 
+def auth_headers(member) -> dict:
+    # acts as the member; Discord admins get an admin claim
+    return auth.headers_for(member.id, "admin" if isinstance(member, discord.Member) and is_admin(member) else "member")
+
+api_client = ApiClient(
+    API_BASE,
+    max_connections=int(os.getenv("API_MAX_CONNECTIONS","20")),
+    max_concurrency=int(os.getenv("API_MAX_CONCURRENCY","16")),
+    retries=int(os.getenv("API_RETRIES","3")),
+)
+
 async def api(method, path, **kwargs):
-    async with httpx.AsyncClient(timeout=20) as client:
-        return await client.request(method, f"{API_BASE}{path}", **kwargs)
+    return await metrics.timed(route_key(method, path), api_client.request(method, path, **kwargs))
+
+works = WorkIndex(api)
+
+jobs = JobQueue(workers=int(os.getenv("BOT_JOB_WORKERS","4")), size=int(os.getenv("BOT_JOB_QUEUE","100")),
+                retries=int(os.getenv("BOT_JOB_RETRIES","2")))
+BUSY_MSG = "⏳ البوت مشغول حالياً، حاول بعد قليل."
+FAILED_MSG = "⚠️ تعذر إكمال الطلب، حاول مرة أخرى."
+
+async def defer_job(interaction: discord.Interaction, fn, ephemeral: bool = True, retries: int | None = None):
+    # acknowledge inside Discord's 3s window; fn() does the slow part on the queue and answers with followups
+    if jobs.full():
+        return await interaction.response.send_message(BUSY_MSG, ephemeral=True)
+    await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+    if not jobs.submit(fn, on_fail=lambda: interaction.followup.send(FAILED_MSG, ephemeral=True), retries=retries):
+        await interaction.followup.send(BUSY_MSG, ephemeral=True)
+settings = SettingsCache(api)
+
+async def send_dm(user_id: int, text: str):
+    user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    await user.send(text)
+
+async def send_admin(guild_id: int, text: str):
+    ch = bot.get_channel(ADMIN_CHANNEL_ID)
+    if ch:
+        await ch.send(text)
+
+reconciler = RoleReconciler(api, BOT_HEADERS, lambda: bot.get_guild(GUILD_ID),
+                            rate=float(os.getenv("ROLE_REMOVE_RATE_PER_SEC","2")), burst=int(os.getenv("ROLE_REMOVE_BURST","5")))
+reconciler_task = None
+
+notifier = Notifier(api_client, BOT_HEADERS, GUILD_ID, send_dm, send_admin,
+                    rate=float(os.getenv("NOTIFY_RATE_PER_SEC","5")), burst=int(os.getenv("NOTIFY_BURST","10")),
+                    on_work_done=reconciler.kick, on_settings=lambda: settings.refresh(BOT_HEADERS),
+                    cursor_path=os.getenv("NOTIFY_CURSOR_FILE","events.cursor"))
+notifier_task = None
+metrics_runner = None
+
+metrics.Gauge("bot_gateway_latency_seconds", "Discord heartbeat latency", fn=lambda: round(bot.latency, 4) if math.isfinite(bot.latency) else 0)
+metrics.Counter("bot_notifications_sent_total", "DMs / admin messages sent from events", fn=lambda: notifier.sent)
+metrics.Gauge("bot_events_cursor", "Last task event id handled", fn=lambda: notifier.cursor or 0)
+metrics.Counter("bot_role_removals_total", "Work roles removed by the reconciler", fn=lambda: reconciler.removed)
 
 @bot.event
 async def on_ready():
     await tree.sync(guild=discord.Object(id=GUILD_ID))
-    if not overdue_loop.is_running():
-        overdue_loop.start()
+    global notifier_task, reconciler_task, metrics_runner
+    if metrics_runner is None and METRICS_PORT:
+        metrics_runner = await metrics.serve(METRICS_HOST, METRICS_PORT)
+    if notifier_task is None or notifier_task.done():
+        notifier_task = asyncio.create_task(notifier.run())
+    if reconciler_task is None or reconciler_task.done():
+        reconciler_task = asyncio.create_task(reconciler.run(float(os.getenv("ROLE_SYNC_SECONDS","600"))))
+        reconciler.kick()
+    if not works_sync.is_running():
+        works_sync.start()
+    if not settings_sync.is_running():
+        settings_sync.start()
     print(f"Logged in as {bot.user}")
 
 # ========== أوامر الإدارة ==========
@@ -40,124 +131,334 @@ async def add_work(interaction: discord.Interaction, العمل: str):
     if not is_admin(interaction.user):
         return await interaction.response.send_message("Admins only", ephemeral=True)
     guild = interaction.guild
-    # Create discord role without permissions
-    role = discord.utils.get(guild.roles, name=العمل)
-    if not role:
-        role = await guild.create_role(name=العمل, permissions=discord.Permissions.none(), reason="Work role")
-    # Save in backend
-    r = await api("POST","/api/works", json={"name": العمل}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-    if r.status_code >= 300:
-        txt = r.text
-    else:
-        txt = "تم إنشاء العمل + الرول بنجاح"
-    await interaction.response.send_message(f"{txt}\nالرول: {role.mention}", ephemeral=True)
-
-@tree.command(name="وزع", description="توزيع مهمة بسيطة", guild=discord.Object(id=GUILD_ID))
-@app_commands.describe(عضو="العضو", رول_العمل="الرول باسم العمل", رقم_الفصل="رقم الفصل")
-async def assign_simple(interaction: discord.Interaction, عضو: discord.Member, رول_العمل: discord.Role, رقم_الفصل: int):
+    txt = None
+
+    async def job():
+        # a retry after a Discord error must not create the work twice ("Work already exists")
+        nonlocal txt
+        # Create discord role without permissions
+        role = discord.utils.get(guild.roles, name=العمل)
+        if not role:
+            role = await guild.create_role(name=العمل, permissions=discord.Permissions.none(), reason="Work role")
+        # Save in backend
+        if txt is None:
+            r = await api("POST","/api/works", json={"name": العمل}, headers=auth_headers(interaction.user))
+            if r.status_code >= 300:
+                txt = r.text
+            else:
+                works.add(r.json())
+                txt = "تم إنشاء العمل + الرول بنجاح"
+        await interaction.followup.send(f"{txt}\nالرول: {role.mention}", ephemeral=True)
+
+    await defer_job(interaction, job)
+
+# same cap as the backend's BULK_MAX_CHAPTERS
+MAX_CHAPTERS = 1000
+
+def parse_chapters(text: str) -> list[int]:
+    # "12" / "10-25" / "10-25, 30, 32-33"
+    out = set()
+    for part in text.replace("،", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        lo, hi = int(lo), int(hi or lo)
+        # checked before range(): a typo like 1-100000000 must not be built on the event loop
+        if hi < lo or len(out) + hi - lo + 1 > MAX_CHAPTERS:
+            raise ValueError(part)
+        out.update(range(lo, hi + 1))
+    return sorted(out)
+
+@tree.command(name="وزع", description="توزيع فصل أو مجموعة فصول", guild=discord.Object(id=GUILD_ID))
+@app_commands.describe(عضو="العضو", رول_العمل="الرول باسم العمل", الفصول="رقم الفصل أو مدى مثل 10-25 أو 10-25,30",
+                       عضو_2="عضو إضافي (توزيع بالتناوب)", عضو_3="عضو إضافي (توزيع بالتناوب)", نوع_العمل="ترجمة أو تحرير (اختياري)")
+async def assign_simple(interaction: discord.Interaction, عضو: discord.Member, رول_العمل: discord.Role, الفصول: str,
+                        عضو_2: discord.Member=None, عضو_3: discord.Member=None, نوع_العمل: str=None):
     if not is_admin(interaction.user):
         return await interaction.response.send_message("Admins only", ephemeral=True)
-    # ensure member has the role
-    if رول_العمل not in عضو.roles:
-        await عضو.add_roles(رول_العمل, reason="Work assignment")
-    # find/create backend work
-    # get works
-    r = await api("GET","/api/works", headers={"Authorization": f"Bearer {interaction.user.id}"})
-    work = None
-    if r.status_code==200:
-        for w in r.json():
-            if w["name"].lower() == رول_العمل.name.lower():
-                work = w; break
-    if not work:
-        # create
-        cr = await api("POST","/api/works", json={"name": رول_العمل.name}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        work = cr.json()
-    # create task
-    t = await api("POST","/api/tasks", json={"work_id": work["id"], "chapter_number": رقم_الفصل, "assignee_discord_id": str(عضو.id)}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-    if t.status_code>=300:
-        return await interaction.response.send_message(f"API error: {t.text}", ephemeral=True)
-    await interaction.response.send_message(f"📌 تم توزيع الفصل {رقم_الفصل} على {عضو.mention} في {رول_العمل.mention}", ephemeral=False)
+    try:
+        chapters = parse_chapters(الفصول)
+    except ValueError:
+        return await interaction.response.send_message(f"صيغة الفصول غير صحيحة (بحد أقصى {MAX_CHAPTERS} فصل)، مثال: 10-25 أو 10-25,30", ephemeral=True)
+    members = [m for m in (عضو, عضو_2, عضو_3) if m is not None]
+    # one call inserts every chapter; the work goes by its cached id, or by name when the index
+    # doesn't know it yet (the backend then creates it)
+    body = {"chapters": chapters, "assignees": [str(m.id) for m in members], "type": نوع_العمل}
+    payload = None
+
+    async def job():
+        nonlocal payload
+        # ensure members have the role
+        for m in members:
+            if رول_العمل not in m.roles:
+                await m.add_roles(رول_العمل, reason="Work assignment")
+        if payload is None:
+            work = await works.lookup(رول_العمل.name, BOT_HEADERS)
+            body.update({"work_id": work["id"]} if work else {"work_name": رول_العمل.name})
+            r = await api("POST", "/api/tasks/bulk", json=body, headers=auth_headers(interaction.user))
+            if r.status_code>=300:
+                return await interaction.followup.send(f"API error: {r.text}"[:1900], ephemeral=True)
+            payload = r.json()
+        works.add(payload["work"])
+        created, skipped = payload["created"], payload["skipped"]
+        if len(chapters) == 1 and created:
+            msg = f"📌 تم توزيع الفصل {chapters[0]} على {عضو.mention} في {رول_العمل.mention}"
+        else:
+            by_member = {}
+            for t in created:
+                by_member.setdefault(t["assignee_discord_id"], []).append(str(t["chapter_number"]))
+            lines = [f"<@{uid}>: {', '.join(chs)}" for uid, chs in by_member.items()]
+            msg = f"📌 تم توزيع {len(created)} فصل في {رول_العمل.mention}\n" + "\n".join(lines)
+        if skipped:
+            msg += f"\n⚠️ موجودة مسبقاً وتم تخطيها: {', '.join(map(str, skipped))}"
+        await interaction.followup.send(msg[:1900])
+
+    await defer_job(interaction, job, ephemeral=False)
 
 @tree.command(name="استلام", description="تأكيد استلام المهمة وبدء العد التنازلي (24h)", guild=discord.Object(id=GUILD_ID))
 @app_commands.describe(مهمة="ID المهمة" )
 async def start_task(interaction: discord.Interaction, مهمة: int):
     # member only on his task
-    r = await api("POST", f"/api/tasks/{مهمة}/start", headers={"Authorization": f"Bearer {interaction.user.id}"})
-    if r.status_code>=300:
-        return await interaction.response.send_message(f"{r.text}", ephemeral=True)
-    await interaction.response.send_message("✅ تم الاستلام، عندك 24 ساعة لتسليم العمل.", ephemeral=True)
+    started = False
+
+    async def job():
+        nonlocal started
+        if not started:
+            r = await api("POST", f"/api/tasks/{مهمة}/start", headers=auth_headers(interaction.user))
+            if r.status_code>=300:
+                return await interaction.followup.send(f"{r.text}"[:1900], ephemeral=True)
+            started = True
+        await interaction.followup.send(f"✅ تم الاستلام، عندك {settings.get('overdue_hours')} ساعة لتسليم العمل.", ephemeral=True)
+
+    await defer_job(interaction, job)
 
 @tree.command(name="تسليم", description="تسليم فصل باللينك أو الملف", guild=discord.Object(id=GUILD_ID))
 @app_commands.describe(مهمة="ID المهمة", نوع_العمل="ترجمة أو تحرير", رفع_على_درايف="رفع الملف على Google Drive؟", رابط="لينك (اختياري)")
 async def submit_task(interaction: discord.Interaction, مهمة: int, نوع_العمل: str, رفع_على_درايف: bool=False, رابط: str=None, ملف: discord.Attachment=None):
     form = {"type": نوع_العمل, "upload_to_drive": str(رفع_على_درايف).lower(), "link": رابط}
-    files=None
     if ملف:
-        data = await ملف.read()
-        files = {"file": (ملف.filename, data, ملف.content_type or "application/octet-stream")}
-    r = await api("POST", f"/api/tasks/{مهمة}/submit", headers={"Authorization": f"Bearer {interaction.user.id}"}, data=form, files=files)
-    if r.status_code>=300:
-        return await interaction.response.send_message(f"{r.text}", ephemeral=True)
-    # send to review channel
-    ch = interaction.guild.get_channel(REVIEW_CHANNEL_ID)
-    payload = r.json()
-    emb = discord.Embed(title="مراجعة فصل", description=f"مهمة #{مهمة}", color=0x2ecc71)
-    emb.add_field(name="صاحب المهمة", value=interaction.user.mention)
-    emb.add_field(name="النوع", value=نوع_العمل)
-    if payload.get("link"): emb.add_field(name="الرابط", value=payload["link"], inline=False)
-    view = ReviewView(task_id=مهمة, user_id=interaction.user.id)
-    await ch.send(embed=emb, view=view)
-    await interaction.response.send_message("📬 تم التسليم وتم إرساله للمراجعة.", ephemeral=True)
+        # the backend streams the attachment from Discord's CDN itself; the bot never buffers it
+        form.update({"file_url": ملف.url, "filename": ملف.filename})
+    data = {k: v for k, v in form.items() if v is not None}
+    payload, posted = None, False
+
+    async def job():
+        # a retry after a Discord error must not submit twice or post the review message twice
+        nonlocal payload, posted
+        if payload is None:
+            r = await api("POST", f"/api/tasks/{مهمة}/submit", headers=auth_headers(interaction.user), data=data)
+            if r.status_code>=300:
+                return await interaction.followup.send(f"{r.text}"[:1900], ephemeral=True)
+            payload = r.json()
+        if not posted:
+            # send to review channel
+            ch = interaction.guild.get_channel(REVIEW_CHANNEL_ID)
+            emb = discord.Embed(title="مراجعة فصل", description=f"مهمة #{مهمة}", color=0x2ecc71)
+            emb.add_field(name="صاحب المهمة", value=interaction.user.mention)
+            emb.add_field(name="النوع", value=نوع_العمل)
+            if payload.get("link"): emb.add_field(name="الرابط", value=payload["link"], inline=False)
+            if payload.get("upload_status"): emb.add_field(name="الرفع", value="⏳ جاري الرفع على درايف", inline=False)
+            view = ReviewView(task_id=مهمة, user_id=interaction.user.id)
+            await ch.send(embed=emb, view=view)
+            posted = True
+        await interaction.followup.send("📬 تم التسليم وتم إرساله للمراجعة.", ephemeral=True)
+
+    await defer_job(interaction, job)
 
 # ========== مراجعة بالأزرار ==========
-class ReviewView(discord.ui.View):
+class ReviewView(TrackedView):
     def __init__(self, task_id: int, user_id: int):
         super().__init__(timeout=None)
         self.task_id = task_id
         self.user_id = user_id
 
-    @discord.ui.button(label="✅ قبول", style=discord.ButtonStyle.success, custom_id="accept_btn")
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def review(self, interaction: discord.Interaction, body: dict, done_msg: str):
         if not is_admin(interaction.user):
             return await interaction.response.send_message("Admins only", ephemeral=True)
-        r = await api("POST", f"/api/tasks/{self.task_id}/review", json={"action": "accept"}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        await interaction.response.send_message("✅ تم قبول الفصل وإضافة النقاط/الرصيد.", ephemeral=True)
+
+        async def job():
+            r = await api("POST", f"/api/tasks/{self.task_id}/review", json=body, headers=auth_headers(interaction.user))
+            await interaction.followup.send(done_msg if r.status_code < 300 else f"API error: {r.text}"[:1900], ephemeral=True)
+
+        await defer_job(interaction, job)
+
+    @discord.ui.button(label="✅ قبول", style=discord.ButtonStyle.success, custom_id="accept_btn")
+    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.review(interaction, {"action": "accept"}, "✅ تم قبول الفصل وإضافة النقاط/الرصيد.")
 
     @discord.ui.button(label="❌ رفض", style=discord.ButtonStyle.danger, custom_id="reject_btn")
     async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not is_admin(interaction.user):
-            return await interaction.response.send_message("Admins only", ephemeral=True)
-        r = await api("POST", f"/api/tasks/{self.task_id}/review", json={"action": "reject", "reason": "Rejected"}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        await interaction.response.send_message("❌ تم الرفض.", ephemeral=True)
+        await self.review(interaction, {"action": "reject", "reason": "Rejected"}, "❌ تم الرفض.")
 
     @discord.ui.button(label="🔄 طلب تعديل", style=discord.ButtonStyle.secondary, custom_id="changes_btn")
     async def changes(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.review(interaction, {"action": "changes", "reason": "Please fix"}, "🔄 تم إرسال طلب التعديل للعضو.")
+
+# ========== طابور المراجعة (اختيار متعدد) ==========
+class ReviewQueueView(TrackedView):
+    def __init__(self, reviewer: discord.Member, items: list[dict], cursor: str | None):
+        super().__init__(timeout=600)
+        self.reviewer = reviewer
+        self.items = {str(t["id"]): t for t in items}
+        self.cursor = cursor
+        self.selected: list[str] = []
+        select = discord.ui.Select(
+            placeholder="اختر الفصول",
+            min_values=1, max_values=len(items),
+            options=[discord.SelectOption(label=f"#{t['id']} {t['work_name']} - فصل {t['chapter_number']}"[:100],
+                                          description=(t.get("type") or "")[:100] or None, value=str(t["id"]))
+                     for t in items])
+        select.callback = self.on_select
+        self.add_item(select)
+        if cursor is None:
+            self.remove_item(self.next_page)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        await super().interaction_check(interaction)
         if not is_admin(interaction.user):
-            return await interaction.response.send_message("Admins only", ephemeral=True)
-        r = await api("POST", f"/api/tasks/{self.task_id}/review", json={"action": "changes", "reason": "Please fix"}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        await interaction.response.send_message("🔄 تم إرسال طلب التعديل للعضو.", ephemeral=True)
+            await interaction.response.send_message("Admins only", ephemeral=True)
+            return False
+        return True
+
+    async def on_select(self, interaction: discord.Interaction):
+        self.selected = interaction.data.get("values", [])
+        await interaction.response.defer()
+
+    async def apply(self, interaction: discord.Interaction, action: str, reason: str | None):
+        if not self.selected:
+            return await interaction.response.send_message("اختر فصل واحد على الأقل", ephemeral=True)
+        body = {"items": [{"task_id": int(i), "action": action, "reason": reason} for i in self.selected]}
+
+        async def job():
+            r = await api("POST", "/api/tasks/review/batch", json=body, headers=auth_headers(interaction.user))
+            if r.status_code >= 300:
+                return await interaction.followup.send(f"API error: {r.text}"[:1900], ephemeral=True)
+            out = r.json()
+            done = [f"#{x['task_id']}" for x in out["results"] if x["ok"]]
+            failed = [f"#{x['task_id']} ({x['error']})" for x in out["results"] if not x["ok"]]
+            msg = f"تمت مراجعة {len(done)}: {', '.join(done)}"
+            if failed:
+                msg += f"\n⚠️ فشل: {', '.join(failed)}"
+            await interaction.followup.send(msg[:1900], ephemeral=True)
+
+        await defer_job(interaction, job)
+
+    @discord.ui.button(label="✅ قبول المحدد", style=discord.ButtonStyle.success)
+    async def accept_selected(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.apply(interaction, "accept", None)
+
+    @discord.ui.button(label="❌ رفض المحدد", style=discord.ButtonStyle.danger)
+    async def reject_selected(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.apply(interaction, "reject", "Rejected")
+
+    @discord.ui.button(label="🔄 تعديل المحدد", style=discord.ButtonStyle.secondary)
+    async def changes_selected(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.apply(interaction, "changes", "Please fix")
+
+    @discord.ui.button(label="التالي ⏭️", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await send_review_queue(interaction, self.cursor)
+
+def review_queue_embed(items: list[dict]) -> discord.Embed:
+    emb = discord.Embed(title="طابور المراجعة", color=0x3498db)
+    for t in items:
+        value = f"<@{t['assignee_discord_id']}>" if t.get("assignee_discord_id") else "-"
+        if t.get("link"):
+            value += f" | {t['link']}"
+        emb.add_field(name=f"#{t['id']} {t['work_name']} - فصل {t['chapter_number']}", value=value[:1024], inline=False)
+    return emb
+
+async def send_review_queue(interaction: discord.Interaction, cursor: str | None = None):
+    # select menus hold at most 25 options, so the queue is paged 25 at a time
+    params = {"limit": 25}
+    if cursor:
+        params["cursor"] = cursor
+
+    async def job():
+        r = await api("GET", "/api/review-queue", params=params, headers=auth_headers(interaction.user))
+        if r.status_code >= 300:
+            return await interaction.followup.send(f"API error: {r.text}"[:1900], ephemeral=True)
+        items = r.json()
+        if not items:
+            return await interaction.followup.send("لا توجد فصول بانتظار المراجعة 🎉", ephemeral=True)
+        view = ReviewQueueView(interaction.user, items, r.headers.get("X-Next-Cursor"))
+        await interaction.followup.send(embed=review_queue_embed(items), view=view, ephemeral=True)
+
+    await defer_job(interaction, job)
+
+@tree.command(name="طابور_المراجعة", description="مراجعة عدة فصول مرة واحدة", guild=discord.Object(id=GUILD_ID))
+async def review_queue_cmd(interaction: discord.Interaction):
+    if not is_admin(interaction.user):
+        return await interaction.response.send_message("Admins only", ephemeral=True)
+    await send_review_queue(interaction)
 
 # ========== AI ==========
 @tree.command(name="ai", description="مساعد ذكي للنصوص والصور", guild=discord.Object(id=GUILD_ID))
-@app_commands.describe(نص="السؤال أو النص", لغة="لغة الرد (ar/en)")
-async def ai_cmd(interaction: discord.Interaction, نص: str=None, لغة: str="ar", صورة: discord.Attachment=None):
-    if صورة:
-        data = await صورة.read()
-        files = {"file": (صورة.filename, data, صورة.content_type or "image/png")}
-        r = await api("POST","/api/ai/image", files=files, params={"lang": لغة}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        out = r.json().get("text","(no text)")
-    else:
-        r = await api("POST","/api/ai/chat", json={"prompt": نص or "", "lang": لغة}, headers={"Authorization": f"Bearer {interaction.user.id}"})
-        out = r.json().get("reply","(no reply)")
-    await interaction.response.send_message(out[:1900], ephemeral=True)
-
-# ========== مراقبة المتأخرين (24h) ==========
-@tasks.loop(minutes=int(os.getenv("CHECK_INTERVAL_MINUTES","30")))
-async def overdue_loop():
+@app_commands.describe(نص="السؤال أو النص", لغة="لغة الرد (ar/en)", صورة="صورة أو فصل كامل (zip/cbz)", مهمة="ID المهمة لحفظ الترجمة (اختياري)")
+async def ai_cmd(interaction: discord.Interaction, نص: str=None, لغة: str="ar", صورة: discord.Attachment=None, مهمة: int=None):
+    if صورة and صورة.filename.lower().endswith((".zip", ".cbz")):
+        return await ai_chapter(interaction, صورة, لغة, مهمة)
+
+    async def job():
+        if صورة:
+            data = await صورة.read()
+            files = {"file": (صورة.filename, data, صورة.content_type or "image/png")}
+            r = await api("POST","/api/ai/image", files=files, params={"lang": لغة}, headers=auth_headers(interaction.user))
+            out = r.json().get("text","(no text)")
+        else:
+            r = await api("POST","/api/ai/chat", json={"prompt": نص or "", "lang": لغة}, headers=auth_headers(interaction.user))
+            out = r.json().get("reply","(no reply)")
+        await interaction.followup.send(out[:1900], ephemeral=True)
+
+    await defer_job(interaction, job)
+
+async def ai_chapter(interaction: discord.Interaction, archive: discord.Attachment, lang: str, task_id: int | None):
+    # whole chapter in one request: the backend fetches the archive and streams pages back as NDJSON.
+    # Pages already sent can't be unsent, so no retries.
+    async def job():
+        form = {"lang": lang, "file_url": archive.url}
+        if task_id is not None:
+            form["task_id"] = str(task_id)
+        chunk, done = "", None
+        async with api_client.stream("POST", "/api/ai/batch", data=form, headers=auth_headers(interaction.user), timeout=None) as r:
+            if r.status_code >= 300:
+                return await interaction.followup.send((await r.aread()).decode()[:1900], ephemeral=True)
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                ev = json.loads(line)
+                if ev["type"] == "translation":
+                    block = f"**صفحة {ev['page']}**\n{ev['text']}\n\n"
+                    if len(chunk) + len(block) > 1900 and chunk:
+                        await interaction.followup.send(chunk, ephemeral=True)
+                        chunk = ""
+                    chunk += block[:1900]
+                elif ev["type"] == "done":
+                    done = ev
+        if chunk:
+            await interaction.followup.send(chunk, ephemeral=True)
+        if done:
+            await interaction.followup.send(f"✅ تمت ترجمة {done['pages']} صفحة.", ephemeral=True)
+
+    await defer_job(interaction, job, retries=0)
+
+# ========== مزامنة الأعمال ==========
+@tasks.loop(minutes=int(os.getenv("WORKS_SYNC_MINUTES","5")))
+async def works_sync():
+    # cheap version check; the full list is only fetched when it changed
+    try:
+        await works.refresh(BOT_HEADERS)
+    except Exception:
+        pass
+
+@tasks.loop(minutes=int(os.getenv("SETTINGS_SYNC_MINUTES","10")))
+async def settings_sync():
+    # fallback for missed "settings" events (stream reconnects); reads never wait on this
     try:
-        # Backend will mark overdue; here we can DM members & notify admins as needed in real deployment.
-        await api("GET","/api/tasks")  # trigger connectivity
+        await settings.refresh(BOT_HEADERS)
     except Exception:
         pass
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN)
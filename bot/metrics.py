@@ -0,0 +1,128 @@
+import time, bisect, threading, contextvars
+
+# Same Prometheus text-format registry as backend/services/metrics.py (the bot image ships
+# without the backend), plus a contextvar naming the slash command / view an API call is made for.
+
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.fn = fn  # read at scrape time instead of pushed: fn() -> value, or {label tuple: value}
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def inc(self, *labels, n: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self) -> list[str]:
+        values = self._values
+        if self.fn is not None:
+            v = self.fn()
+            values = v if isinstance(v, dict) else {(): v}
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(values.items())]
+
+class Counter(_Metric):
+    kind = "counter"
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                h = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][bisect.bisect_left(self.buckets, value)] += 1
+            h[1] += value
+            h[2] += 1
+
+    def totals(self) -> dict[tuple, tuple[int, float]]:
+        # {labels: (count, sum)}; benches diff these around a run
+        with self._lock:
+            return {k: (h[2], h[1]) for k, h in self._values.items()}
+
+    def render(self) -> list[str]:
+        out = []
+        with self._lock:
+            items = sorted((k, ([*h[0]], h[1], h[2])) for k, h in self._values.items())
+        for k, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                acc += c
+                le = 'le="%s"' % le
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {round(total, 6)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {n}")
+        return out
+
+registry: list[_Metric] = []
+
+def render() -> str:
+    lines = []
+    for m in registry:
+        body = m.render()
+        if body:
+            lines += m.header() + body
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# set once per interaction (tree / view interaction_check); everything awaited afterwards in
+# the same task inherits it. Background loops keep the default.
+command: contextvars.ContextVar = contextvars.ContextVar("command", default="background")
+
+commands_total = Counter("bot_interactions_total", "Slash commands and component clicks", ("command",))
+api_seconds = Histogram("bot_api_call_duration_seconds", "bot -> API call time including retries", ("command", "route", "status"))
+
+async def timed(route: str, coro):
+    start = time.perf_counter()
+    status = "error"
+    try:
+        r = await coro
+        status = r.status_code
+        return r
+    finally:
+        api_seconds.observe(command.get(), route, status, value=time.perf_counter() - start)
+
+async def serve(host: str, port: int):
+    # aiohttp ships with discord.py; a bare /metrics on a local port for the scraper
+    from aiohttp import web
+
+    async def handler(request):
+        return web.Response(body=render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,150 @@
+
+import os, json, time, asyncio, random
+
+# Consumes the backend's /api/events/stream and fans events out as DMs + admin messages.
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def parse_sse(lines):
+    # yields (id, event, data) per SSE message; comments (keepalives) are skipped
+    eid, kind, data = None, "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield eid, kind, "\n".join(data)
+            eid, kind, data = None, "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                eid = value
+            elif field == "event":
+                kind = value
+            elif field == "data":
+                data.append(value)
+
+OVERDUE_DM = "⏰ تأخرت في تسليم المهمة #{task_id}. سلّم في أقرب وقت وإلا ستُسحب المهمة."
+REVIEW_DM = {"accept": "✅ تم قبول مهمتك #{task_id}.", "reject": "❌ تم رفض مهمتك #{task_id}.",
+             "changes": "🔄 مطلوب تعديل على مهمتك #{task_id}."}
+RECLAIM_DM = "↩️ تم سحب المهمة #{task_id} منك لتجاوز المهلة."
+UPLOAD_FAILED_DM = "⚠️ فشل رفع ملف المهمة #{task_id} على درايف، أعد التسليم."
+
+class Notifier:
+    # send_dm(user_id, text) / send_admin(guild_id, text) are injected so the fan-out can run against fakes
+    def __init__(self, api, headers: dict, guild_id: int, send_dm, send_admin,
+                 rate: float = 5.0, burst: int = 10, on_work_done=None, on_settings=None, cursor_path: str | None = None):
+        self.api = api
+        self.headers = headers
+        self.guild_id = guild_id
+        self.send_dm = send_dm
+        self.send_admin = send_admin
+        self.on_work_done = on_work_done
+        self.on_settings = on_settings
+        self.rate = rate
+        self.burst = burst
+        # with cursor_path the last handled id survives restarts; a first start (no file yet)
+        # begins at the newest event instead of replaying the whole history
+        self.cursor_path = cursor_path
+        self.cursor: int | None = self.load_cursor() if cursor_path else 0
+        self.buckets: dict[int, TokenBucket] = {}
+        self.sent = 0
+
+    def load_cursor(self) -> int | None:
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def save_cursor(self):
+        if self.cursor_path:
+            tmp = self.cursor_path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(str(self.cursor))
+            os.replace(tmp, self.cursor_path)
+
+    def bucket(self, guild_id: int) -> TokenBucket:
+        b = self.buckets.get(guild_id)
+        if b is None:
+            b = self.buckets[guild_id] = TokenBucket(self.rate, self.burst)
+        return b
+
+    async def _send(self, coro_fn, *args):
+        await self.bucket(self.guild_id).acquire()
+        try:
+            await coro_fn(*args)
+            self.sent += 1
+        except Exception:
+            pass
+
+    async def handle(self, e: dict):
+        kind, user = e["kind"], e.get("assignee_discord_id")
+        fmt = {"task_id": e["task_id"]}
+        if kind == "overdue":
+            if user:
+                await self._send(self.send_dm, int(user), OVERDUE_DM.format(**fmt))
+            await self._send(self.send_admin, self.guild_id, f"⚠️ مهمة متأخرة #{e['task_id']} — <@{user}>" if user else f"⚠️ مهمة متأخرة #{e['task_id']}")
+        elif kind == "reviewed" and user and e.get("detail") in REVIEW_DM:
+            await self._send(self.send_dm, int(user), REVIEW_DM[e["detail"]].format(**fmt))
+        elif kind == "reassigned" and e.get("detail"):
+            await self._send(self.send_dm, int(e["detail"]), RECLAIM_DM.format(**fmt))
+        elif kind == "uploaded" and e.get("detail"):
+            await self._send(self.send_admin, self.guild_id, f"📎 تم رفع ملف المهمة #{e['task_id']}: {e['detail']}")
+        elif kind == "upload_failed" and user:
+            await self._send(self.send_dm, int(user), UPLOAD_FAILED_DM.format(**fmt))
+        elif kind == "work_done" and self.on_work_done:
+            self.on_work_done()
+        elif kind == "settings" and self.on_settings:
+            try:
+                await self.on_settings()
+            except Exception:
+                pass  # the periodic sync picks it up
+        if e["id"] > self.cursor:
+            self.cursor = e["id"]
+            try:
+                self.save_cursor()
+            except OSError:
+                pass
+
+    async def run(self):
+        # one subscription for the bot's lifetime; reconnects resume from the last handled id
+        backoff = 1.0
+        while True:
+            try:
+                if self.cursor is None:
+                    r = await self.api.request("GET", "/api/events/latest", headers=self.headers)
+                    r.raise_for_status()
+                    self.cursor = r.json()["id"]
+                    self.save_cursor()
+                async with self.api.stream("GET", "/api/events/stream", params={"after": self.cursor},
+                                           headers=self.headers, timeout=None) as r:
+                    if r.status_code != 200:
+                        raise RuntimeError(f"events stream: HTTP {r.status_code}")
+                    backoff = 1.0
+                    async for _, _, data in parse_sse(r.aiter_lines()):
+                        await self.handle(json.loads(data))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            await asyncio.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, 60)
@@ -0,0 +1,80 @@
+
+import asyncio
+import discord
+from notify import TokenBucket
+
+# Drains the backend's /api/roles/to-remove diff: one Discord call per member that actually
+# still holds the role, paced by a token bucket, and one ack call per page.
+
+class RoleReconciler:
+    # guild_fn() returns the guild (or a fake with get_member / roles); kept injectable for benches
+    def __init__(self, api, headers: dict, guild_fn, rate: float = 2.0, burst: int = 5, page: int = 500):
+        self.api = api
+        self.headers = headers
+        self.guild_fn = guild_fn
+        self.bucket = TokenBucket(rate, burst)
+        self.page = page
+        self.removed = 0
+        self.calls = 0
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def kick(self):
+        # a work_done event arrived; run a pass soon instead of waiting for the timer
+        self._wake.set()
+
+    async def _remove(self, member, role) -> bool:
+        await self.bucket.acquire()
+        self.calls += 1
+        try:
+            await member.remove_roles(role, reason="All tasks in this work are done")
+            self.removed += 1
+            return True
+        except discord.NotFound:
+            return True  # member or role is gone: nothing left to remove
+        except discord.HTTPException:
+            return False  # missing permissions / transient: retried on the next pass
+
+    async def run_pass(self) -> int:
+        async with self._lock:
+            guild = self.guild_fn()
+            if guild is None:
+                return 0
+            roles = {r.name: r for r in guild.roles}
+            cursor, acked = None, 0
+            while True:
+                params = {"limit": self.page}
+                if cursor:
+                    params["cursor"] = cursor
+                r = await self.api("GET", "/api/roles/to-remove", params=params, headers=self.headers)
+                if r.status_code != 200:
+                    return acked
+                done = []
+                for item in r.json():
+                    member = guild.get_member(int(item["discord_id"]))
+                    role = roles.get(item["role_name"])
+                    # left the server / role deleted / already removed by hand: just acknowledge
+                    if member is None or role is None or role not in member.roles or await self._remove(member, role):
+                        done.append({"discord_id": item["discord_id"], "work_id": item["work_id"]})
+                if done:
+                    await self.api("POST", "/api/roles/removed", json={"items": done}, headers=self.headers)
+                    acked += len(done)
+                cursor = r.headers.get("X-Next-Cursor")
+                if not cursor:
+                    return acked
+
+    async def run(self, interval: float = 600.0):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # let a burst of work_done events (batch review) settle into one pass
+            await asyncio.sleep(2)
+            try:
+                await self.run_pass()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
@@ -0,0 +1,28 @@
+from types import MappingProxyType
+
+# Cached copy of the backend's runtime settings (/api/settings). Refreshed when a "settings" task
+# event arrives and by a slow poll as a fallback; get() never does I/O. The defaults match the
+# backend's and cover the time before the first successful fetch.
+DEFAULTS = {"overdue_hours": 24, "reclaim_after_hours": 24, "check_interval_minutes": 30,
+            "points_per_accepted": 15, "usd_per_15_points": 0.5, "archive_after_days": 180}
+
+class SettingsCache:
+    def __init__(self, api, defaults: dict = DEFAULTS):
+        self.api = api
+        self.version: int | None = None
+        self.values = MappingProxyType(dict(defaults))
+
+    def get(self, key: str):
+        return self.values[key]
+
+    async def refresh(self, headers: dict) -> bool:
+        r = await self.api("GET", "/api/settings", headers=headers)
+        if r.status_code != 200:
+            return False
+        body = r.json()
+        if body["version"] == self.version:
+            return False
+        # swap the whole mapping so readers never see a half-applied update
+        self.values = MappingProxyType({**self.values, **body["values"]})
+        self.version = body["version"]
+        return True
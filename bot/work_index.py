@@ -0,0 +1,41 @@
+
+from urllib.parse import quote
+
+# lowercased work name -> {"id", "name"}; kept in sync with the backend through /api/works/version
+class WorkIndex:
+    def __init__(self, api):
+        self.api = api
+        self.version: str | None = None
+        self.by_name: dict[str, dict] = {}
+
+    def add(self, work: dict):
+        self.by_name[work["name"].lower()] = {"id": work["id"], "name": work["name"]}
+
+    def forget(self, name: str):
+        self.by_name.pop(name.lower(), None)
+
+    async def refresh(self, headers: dict) -> bool:
+        r = await self.api("GET", "/api/works/version", headers=headers)
+        if r.status_code != 200:
+            return False
+        version = r.json()["version"]
+        if version == self.version:
+            return False
+        r = await self.api("GET", "/api/works", headers=headers)
+        if r.status_code != 200:
+            return False
+        self.by_name = {}
+        for w in r.json():
+            self.add(w)
+        self.version = version
+        return True
+
+    async def lookup(self, name: str, headers: dict) -> dict | None:
+        work = self.by_name.get(name.lower())
+        if work:
+            return work
+        r = await self.api("GET", f"/api/works/by-name/{quote(name, safe='')}", headers=headers)
+        if r.status_code == 200:
+            self.add(r.json())
+            return self.by_name[name.lower()]
+        return None